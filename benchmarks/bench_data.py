@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+"""
+bench_data
+
+Benchmarks of loading the dictionary and ids of ARG 2010 Census.
+"""
+
+from __future__ import unicode_literals
+
+from pyredatam import cpv2010arg, metadata
+
+
+class LoadData(object):
+
+    def setup(self):
+        cpv2010arg.get_variable_dictionary.cache_clear()
+        cpv2010arg.get_geography.cache_clear()
+        metadata._load_ids.cache_clear()
+
+    def time_get_variable_dictionary(self):
+        cpv2010arg.get_variable_dictionary()
+
+    def time_get_geography(self):
+        cpv2010arg.get_geography()
+
+    def time_get_ids(self):
+        cpv2010arg.get_ids()
+
+    def peakmem_get_variable_dictionary(self):
+        cpv2010arg.get_variable_dictionary()
+
+
+class LoadedData(object):
+
+    def setup(self):
+        self.dictionary = cpv2010arg.get_variable_dictionary()
+        self.geography = cpv2010arg.get_geography()
+
+    def time_get_dictionary(self):
+        cpv2010arg.get_dictionary()
+
+    def time_get_ids(self):
+        cpv2010arg.get_ids()
+
+    def time_category_label(self):
+        self.dictionary.label("PERSONA.CONDACT", "3")
+
+    def time_area_children(self):
+        self.geography.children("06")
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+"""
+bench_end_to_end
+
+Benchmarks of whole queries made to a local stub of the RpWebEngine server.
+"""
+
+from __future__ import unicode_literals
+
+import pyredatam
+from pyredatam import cpv2010arg
+from pyredatam.testing import StubWebEngine, arealist_html
+
+
+class MakeQuery(object):
+
+    params = [100, 10000]
+    param_names = ["rows"]
+    timeout = 300
+
+    def setup(self, rows):
+        self.stub = StubWebEngine(arealist_html(rows)).start()
+        self.query = pyredatam.arealist_query("FRAC", "PERSONA.CONDACT",
+                                              {"PROV": "02"})
+
+    def teardown(self, rows):
+        self.stub.stop()
+
+    def time_make_query_http(self, rows):
+        cpv2010arg.make_query(self.query, self.stub.url, cache=False,
+                              backend="http")
+
+    def time_make_arealist_query_http(self, rows):
+        cpv2010arg.make_arealist_query(self.query, cache=False,
+                                       backend="http", url=self.stub.url)
+
+    def peakmem_make_arealist_query_http(self, rows):
+        cpv2010arg.make_arealist_query(self.query, cache=False,
+                                       backend="http", url=self.stub.url)
+
+
+class MakeQueries(object):
+
+    params = [1, 4, 8]
+    param_names = ["max_workers"]
+    timeout = 300
+
+    def setup(self, max_workers):
+        self.stub = StubWebEngine(arealist_html(1000)).start()
+        self.queries = [pyredatam.counter_query("DPTO", "PERSONA",
+                                                {"PROV": prov_code})
+                        for prov_code in cpv2010arg.get_geography().codes(
+                            "PROV")]
+
+    def teardown(self, max_workers):
+        self.stub.stop()
+
+    def time_make_queries_http(self, max_workers):
+        cpv2010arg.make_queries(self.queries, max_workers=max_workers,
+                                cache=False, backend="http",
+                                url=self.stub.url)
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+"""
+bench_parsing
+
+Benchmarks of the parsers of REDATAM results.
+"""
+
+from __future__ import unicode_literals
+import io
+import time
+
+from pyredatam.cpv2010arg import parse_arealist_to_dataframe
+from pyredatam.cpv2010arg import iter_arealist_chunks
+from pyredatam.testing import arealist_html
+
+
+class ParseArealist(object):
+
+    params = [100, 10000, 100000]
+    param_names = ["rows"]
+    timeout = 300
+
+    def setup(self, rows):
+        self.html = arealist_html(rows)
+        self.html_bytes = self.html.encode("utf-8")
+
+    def time_parse_arealist_to_dataframe(self, rows):
+        parse_arealist_to_dataframe(self.html)
+
+    def time_iter_arealist_chunks(self, rows):
+        for chunk in iter_arealist_chunks(io.BytesIO(self.html_bytes)):
+            pass
+
+    def peakmem_parse_arealist_to_dataframe(self, rows):
+        parse_arealist_to_dataframe(self.html)
+
+    def peakmem_iter_arealist_chunks(self, rows):
+        for chunk in iter_arealist_chunks(io.BytesIO(self.html_bytes)):
+            pass
+
+    def track_parse_rows_per_second(self, rows):
+        start = time.time()
+        parse_arealist_to_dataframe(self.html)
+        return rows / (time.time() - start)
+
+    track_parse_rows_per_second.unit = "rows/s"
+
+    def track_bytes_per_row(self, rows):
+        return len(self.html_bytes) / float(rows)
+
+    track_bytes_per_row.unit = "bytes"
+
+    def track_result_bytes_per_row(self, rows):
+        df = parse_arealist_to_dataframe(self.html)
+        return df.memory_usage(deep=True).sum() / float(rows)
+
+    track_result_bytes_per_row.unit = "bytes"
+
+    def track_compact_result_bytes_per_row(self, rows):
+        df = parse_arealist_to_dataframe(self.html, compact=True)
+        return df.memory_usage(deep=True).sum() / float(rows)
+
+    track_compact_result_bytes_per_row.unit = "bytes"
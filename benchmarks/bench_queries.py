@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+"""
+bench_queries
+
+Benchmarks of the REDATAM query builders.
+"""
+
+from __future__ import unicode_literals
+
+import pyredatam
+
+
+class BuildQueries(object):
+
+    def setup(self):
+        self.area_filter = {"PROV": ["02", "06", "10", "14"]}
+
+    def time_arealist_query(self):
+        pyredatam.arealist_query("FRAC", ["PERSONA.CONDACT"],
+                                 self.area_filter, "PERSONA.P03 > 14",
+                                 "Titulo", True)
+
+    def time_counter_query(self):
+        pyredatam.counter_query("DPTO", "PERSONA", self.area_filter,
+                                "PERSONA.P03 > 14", "Titulo", True, True)
+
+    def time_median_query(self):
+        pyredatam.median_query("PERSONA.P03", "PERSONA.CONDACT",
+                               "PERSONA.P02", True, "PROV", self.area_filter)
+
+
+class RenderPreparedQueries(object):
+
+    def setup(self):
+        self.prepared = pyredatam.PreparedQuery(
+            "arealist", area_level="FRAC", variables=["PERSONA.CONDACT"],
+            incl_area_name=True)
+        self.area_filters = [{"DPTO": ["{:05d}".format(code)]}
+                             for code in range(2001, 3001)]
+
+    def time_render_1000_areas(self):
+        for area_filter in self.area_filters:
+            self.prepared.render(area_filter, "PERSONA.P03 > 14", "Titulo")
+
+    def time_build_1000_areas(self):
+        for area_filter in self.area_filters:
+            pyredatam.arealist_query("FRAC", ["PERSONA.CONDACT"], area_filter,
+                                     "PERSONA.P03 > 14", "Titulo", True)
+
+
+class ImportPackage(object):
+
+    def timeraw_import_pyredatam(self):
+        return "import pyredatam"
+
+    def timeraw_import_cpv2010arg(self):
+        return "import pyredatam.cpv2010arg"
+
+    def timeraw_get_geography(self):
+        return "import pyredatam; pyredatam.get_geography()"
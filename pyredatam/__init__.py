@@ -3,5 +3,10 @@
 __author__ = 'Agustín Benassi'
 __email__ = 'agusbenassi@gmail.com'
 
-from pyredatam import *
-import cpv2010arg
+from .pyredatam import *
+from .metadata import get_geography, get_variable_dictionary
+from .utils import LazyModule
+
+# selenium, pandas and the rest of the backends are imported only when a
+# query is made, so generating queries doesn't wait for them
+cpv2010arg = LazyModule(__name__ + ".cpv2010arg")
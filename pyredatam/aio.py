@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+aio.py
+
+Asyncio API to query 2010 Argentina's Census REDATAM database without
+blocking the event loop (Python 3.4+).
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import with_statement
+import weakref
+try:
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    asyncio = None
+
+from . import cpv2010arg
+from .utils import memoize
+
+DEFAULT_MAX_CONCURRENCY = 16
+
+
+# PUBLIC
+class AsyncRedatam(object):
+    """Run blocking queries in a bounded pool of threads and await them.
+
+    Every method returns an awaitable. Queries are limited to max_concurrency
+    in flight and to max_per_server on each server. A query waiting for its
+    server waits in the event loop, without holding a thread. Cancelling a
+    query that is still waiting for its server or a free thread drops it, but
+    a query already running ends in its thread and its result is discarded.
+
+    >>> redatam = AsyncRedatam(32, timeout=600)  # doctest: +SKIP
+    >>> dfs = await asyncio.gather(*[redatam.make_arealist_query(query)
+    ...                              for query in queries])  # doctest: +SKIP
+
+    Args:
+        max_concurrency (int): Maximum number of queries in flight.
+        max_per_server (int): Maximum number of queries in flight to the same
+            server url.
+        timeout (float): Seconds to wait for each call before raising
+            asyncio.TimeoutError. None waits forever.
+        **kwargs: Arguments of cpv2010arg.make_query used by every query (eg.
+            backend, url, cache or pool). Browser queries without a pool
+            share one pool of max_concurrency browsers (see
+            cpv2010arg.shared_pool), so every one of them must be made to
+            the same url.
+    """
+
+    def __init__(self, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 max_per_server=cpv2010arg.MAX_QUERIES_PER_SERVER,
+                 timeout=None, **kwargs):
+        if asyncio is None:
+            raise ImportError("pyredatam.aio needs Python 3.4+ (asyncio)")
+
+        self.timeout = timeout
+        self.max_per_server = max_per_server
+        self.kwargs = kwargs
+        self._executor = ThreadPoolExecutor(max_concurrency)
+        self._pool = cpv2010arg.shared_pool(max_concurrency, **kwargs)
+        self.kwargs["pool"] = self._pool.__enter__()
+        # asyncio semaphores can only be used in the loop of their first use
+        self._servers = weakref.WeakKeyDictionary()
+
+    def make_query(self, query, timeout=None, **kwargs):
+        """Await cpv2010arg.make_query.
+
+        Args:
+            query (str): REDATAM query.
+            timeout (float): Seconds to wait instead of the default timeout.
+            **kwargs: Arguments of cpv2010arg.make_query for this query.
+
+        Returns:
+            awaitable: Data result from query in html format.
+        """
+        return self._run_query(cpv2010arg.make_query, query, timeout, kwargs)
+
+    def make_arealist_query(self, query, timeout=None, **kwargs):
+        """Await cpv2010arg.make_arealist_query.
+
+        Returns:
+            awaitable: pandas.DataFrame with the data result from query.
+        """
+        return self._run_query(cpv2010arg.make_arealist_query, query, timeout,
+                               kwargs)
+
+    make_counter_query = make_arealist_query
+
+    def scrape_dictionary(self, timeout=None):
+        """Await cpv2010arg.scrape_dictionary.
+
+        Returns:
+            awaitable: Tuple of the dictionary and the lists of geographic and
+                data entities.
+        """
+        return self._run(cpv2010arg.scrape_dictionary, timeout)
+
+    def close(self, wait=True):
+        """Shut down the threads (running queries end if wait is True)."""
+        self._executor.shutdown(wait)
+        self._pool.__exit__(None, None, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _run_query(self, func, query, timeout, kwargs):
+        query_kwargs = dict(self.kwargs)
+        query_kwargs.update(kwargs)
+        server = query_kwargs.get("url", cpv2010arg.BASE_URL)
+
+        def run():
+            return func(query, **query_kwargs)
+
+        return self._run(run, timeout, server)
+
+    def _run(self, func, timeout, server=None):
+        loop = asyncio.get_event_loop()
+        if server is None or not self.max_per_server:
+            future = loop.run_in_executor(self._executor, func)
+        else:
+            future = _run_acquired(loop, self._get_semaphore(loop, server),
+                                   self._executor, func)
+
+        timeout = self.timeout if timeout is None else timeout
+        if timeout is None:
+            return future
+        return asyncio.wait_for(future, timeout)
+
+    def _get_semaphore(self, loop, server):
+        semaphores = self._servers.setdefault(loop, {})
+        if server not in semaphores:
+            semaphores[server] = asyncio.Semaphore(self.max_per_server)
+        return semaphores[server]
+
+
+def make_query(query, timeout=None, **kwargs):
+    """Await cpv2010arg.make_query using the shared AsyncRedatam."""
+    return _get_default().make_query(query, timeout, **kwargs)
+
+
+def make_arealist_query(query, timeout=None, **kwargs):
+    """Await cpv2010arg.make_arealist_query using the shared AsyncRedatam."""
+    return _get_default().make_arealist_query(query, timeout, **kwargs)
+
+
+make_counter_query = make_arealist_query
+
+
+def scrape_dictionary(timeout=None):
+    """Await cpv2010arg.scrape_dictionary using the shared AsyncRedatam."""
+    return _get_default().scrape_dictionary(timeout)
+
+
+# PRIVATE
+@memoize
+def _get_default():
+    return AsyncRedatam()
+
+
+def _run_acquired(loop, semaphore, executor, func):
+    """Run func in executor once semaphore is acquired, without awaiting.
+
+    Returns a future of the result. Cancelling it before func starts stops
+    waiting for the semaphore or for a free thread.
+    """
+    result = loop.create_future()
+    acquiring = loop.create_task(semaphore.acquire())
+    running = []
+
+    def on_acquired(_):
+        if acquiring.cancelled():
+            return
+        if result.cancelled():
+            semaphore.release()
+            return
+        running.append(loop.run_in_executor(executor, func))
+        running[0].add_done_callback(on_done)
+
+    def on_done(future):
+        semaphore.release()
+        if result.cancelled():
+            return
+        if future.cancelled():
+            result.cancel()
+        elif future.exception() is not None:
+            result.set_exception(future.exception())
+        else:
+            result.set_result(future.result())
+
+    def on_result(_):
+        if result.cancelled():
+            acquiring.cancel()
+            for future in running:
+                future.cancel()
+
+    acquiring.add_done_callback(on_acquired)
+    result.add_done_callback(on_result)
+    return result
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+cache.py
+
+On-disk, content-addressed cache of REDATAM query results.
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import with_statement
+import os
+import io
+import time
+import hashlib
+import tempfile
+
+from .utils import makedirs, remove_file, replace_file
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".pyredatam",
+                                 "cache")
+DEFAULT_TTL = 30 * 24 * 60 * 60
+DEFAULT_MAX_SIZE = 500 * 1024 * 1024
+
+ENTRY_EXT = ".html"
+
+
+_default_cache = None
+
+
+# PUBLIC
+class QueryCache(object):
+    """Store query results in a directory, one file per query.
+
+    Entries are keyed by a hash of the normalized query text and the url of
+    the REDATAM server. Files are written to a temporary name and atomically
+    renamed, so several processes can share the same directory without
+    locking. The modification time of each file is used both for expiration
+    (ttl) and as the "last used" mark for LRU eviction once the directory
+    grows over max_size bytes.
+
+    Args:
+        cache_dir (str): Directory where results are stored.
+        ttl (int): Seconds an entry is valid. None to never expire.
+        max_size (int): Max bytes used by the cache. None for no limit.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL,
+                 max_size=DEFAULT_MAX_SIZE):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_size = max_size
+        makedirs(self.cache_dir)
+
+    def key(self, query, url):
+        """Return the content-address of a query made to an url."""
+        return make_key(query, url)
+
+    def get(self, query, url):
+        """Return the cached result of a query, or None if missing/expired."""
+        path = self._path(self.key(query, url))
+
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+
+        if self.ttl is not None and time.time() - mtime > self.ttl:
+            remove_file(path)
+            return None
+
+        try:
+            with io.open(path, "r", encoding="utf-8") as f:
+                result = f.read()
+        except (IOError, OSError):
+            return None
+
+        # LRU: reading an entry marks it as recently used
+        _touch(path)
+
+        return result
+
+    def set(self, query, url, result):
+        """Store the result of a query and evict old entries if needed."""
+        path = self._path(self.key(query, url))
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with io.open(fd, "w", encoding="utf-8") as f:
+                f.write(result)
+            replace_file(tmp_path, path)
+        except Exception:
+            remove_file(tmp_path)
+            raise
+
+        if self.max_size is not None:
+            self.evict()
+
+    def delete(self, query, url):
+        """Remove the cached result of a query, if any."""
+        remove_file(self._path(self.key(query, url)))
+
+    def clear(self):
+        """Remove every entry of the cache."""
+        for path, _, _ in self._entries():
+            remove_file(path)
+
+    def evict(self):
+        """Remove expired entries and least recently used ones over max_size.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        total_size = sum(size for _, _, size in entries)
+        now = time.time()
+
+        removed = 0
+        for path, mtime, size in entries:
+            expired = self.ttl is not None and now - mtime > self.ttl
+            oversized = (self.max_size is not None and
+                         total_size > self.max_size)
+            if not expired and not oversized:
+                continue
+
+            remove_file(path)
+            total_size -= size
+            removed += 1
+
+        return removed
+
+    def size(self):
+        """Return the bytes used by the entries of the cache."""
+        return sum(size for _, _, size in self._entries())
+
+    def __len__(self):
+        return len(list(self._entries()))
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ENTRY_EXT)
+
+    def _entries(self):
+        try:
+            filenames = os.listdir(self.cache_dir)
+        except OSError:
+            return
+
+        for filename in filenames:
+            if not filename.endswith(ENTRY_EXT):
+                continue
+            path = os.path.join(self.cache_dir, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # another process may have just evicted it
+                continue
+            yield path, stat.st_mtime, stat.st_size
+
+
+def get_default_cache():
+    """Return the cache shared by every query that doesn't specify one."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = QueryCache()
+    return _default_cache
+
+
+def normalize_query(query):
+    """Normalize a REDATAM query so equivalent queries share a cache entry.
+
+    Line endings are unified, trailing whitespace is removed from every line
+    and leading or trailing blank lines are dropped.
+
+    >>> print(normalize_query("\\r\\nRUNDEF Job  \\r\\n\\nTABLE TABLE1\\n\\n"))
+    RUNDEF Job
+    <BLANKLINE>
+    TABLE TABLE1
+    """
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "ignore")
+
+    lines = [line.rstrip() for line in query.splitlines()]
+    return "\n".join(lines).strip("\n")
+
+
+def make_key(query, url):
+    """Hash a normalized query and the url of the server it is made to."""
+    content = url + "\n" + normalize_query(query)
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+# PRIVATE
+def _touch(path):
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+cli.py
+
+Command line tool running a file of queries to ARG 2010 Census and writing
+their results to CSV or Parquet files.
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import with_statement
+import os
+import io
+import sys
+import json
+import time
+import argparse
+from collections import namedtuple, OrderedDict
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+from .pyredatam import PreparedQuery, TABLE_TYPES
+from .metadata import get_geography
+from .utils import safe_filename
+from .instrumentation import trace
+from .executor import run_concurrently
+
+FORMATS = {"csv": ".csv", "parquet": ".parquet"}
+ARGUMENTS = ["area_filter", "universe_filter", "title"]
+AREALIST_TYPES = ["arealist", "counter"]
+
+QueryResult = namedtuple("QueryResult", ["name", "rows", "seconds",
+                                         "stages", "path", "error"])
+
+
+# PUBLIC
+def main(argv=None):
+    """Run the queries of a spec file (see load_spec) from the command line.
+
+    Returns:
+        int: 0 if every query succeeded, 1 otherwise.
+    """
+    args = _get_parser().parse_args(argv)
+    queries = render_queries(load_spec(args.spec), get_geography())
+
+    if args.dry_run:
+        for (name, _), query in queries.items():
+            print("# {}\n{}\n".format(name, query))
+        return 0
+
+    kwargs = {"backend": args.backend, "cache": not args.no_cache,
+              "refresh": args.refresh}
+    if args.url:
+        kwargs["url"] = args.url
+
+    start = time.time()
+    results = []
+    for result in run_queries(queries, args.output_dir, args.format,
+                              args.max_workers, args.retries, **kwargs):
+        print(format_result(result))
+        results.append(result)
+
+    print(format_summary(results, time.time() - start))
+
+    return 1 if any(result.error for result in results) else 0
+
+
+def load_spec(path):
+    """Load a JSON or YAML (needs PyYAML) file describing queries.
+
+    The file has a list of "queries", each one with a "name", a "type" (one
+    of pyredatam.TABLE_TYPES) and the arguments of the function generating
+    that type of query. Arguments in "defaults" are used by every query
+    that doesn't set them.
+
+        {"defaults": {"area_filter": {"PROV": "02"}},
+         "queries": [{"name": "condact", "type": "arealist",
+                      "area_level": "DPTO", "variables": "PERSONA.CONDACT"},
+                     {"name": "hogares", "type": "counter",
+                      "area_level": "DPTO", "entity_count": "HOGAR"}]}
+
+    Returns:
+        list: Dict with the arguments of each query, defaults included.
+    """
+    with io.open(path, "r", encoding="utf-8") as f:
+        if os.path.splitext(path)[1].lower() in (".yaml", ".yml"):
+            if yaml is None:
+                raise ImportError("Reading YAML specs needs PyYAML installed")
+            spec = yaml.safe_load(f)
+        else:
+            spec = json.load(f, object_pairs_hook=OrderedDict)
+
+    if isinstance(spec, list):
+        spec = {"queries": spec}
+
+    queries = []
+    for number, query_spec in enumerate(spec.get("queries", []), 1):
+        query = dict(spec.get("defaults", {}))
+        query.update(query_spec)
+        query.setdefault("name", "query{}".format(number))
+        queries.append(query)
+
+    return queries
+
+
+def render_queries(queries, geography=None):
+    """Generate the REDATAM query of each query spec.
+
+    Args:
+        queries (list): Dicts with the "name", "type" and arguments of each
+            query (see load_spec).
+        geography (GeographyIndex): Index used to expand area names and
+            parent areas of the area filters and check their codes.
+
+    Returns:
+        OrderedDict: (name, type) of each query and its REDATAM query.
+    """
+    rendered = OrderedDict()
+    for query in queries:
+        query = dict(query)
+        name, query_type = query.pop("name"), query.pop("type", None)
+        if query_type not in TABLE_TYPES:
+            raise ValueError("Query {} has no type, use one of {}".format(
+                name, TABLE_TYPES))
+        if name in [key[0] for key in rendered]:
+            raise ValueError("There are many queries named {}".format(name))
+
+        arguments = [query.pop(argument, None) for argument in ARGUMENTS]
+        rendered[name, query_type] = PreparedQuery(
+            query_type, geography=geography, **query)(*arguments)
+
+    return rendered
+
+
+def run_queries(queries, output_dir=".", file_format="csv", max_workers=4,
+                retries=2, **kwargs):
+    """Make queries concurrently, writing each result as soon as it arrives.
+
+    Args:
+        queries (dict): REDATAM query of each (name, type) (see
+            render_queries).
+        output_dir (str): Directory where results are written as name.csv or
+            name.parquet.
+        file_format (str): "csv" or "parquet" (needs pyarrow).
+        max_workers (int): Queries made at the same time.
+        retries (int): Times a failed query is retried.
+        **kwargs: Arguments of cpv2010arg.make_query (eg. backend or cache).
+
+    Yields:
+        QueryResult: Name, rows, seconds, seconds of each stage, path of the
+            result and error (None if it succeeded) of each query, in the
+            order they finish.
+    """
+    from . import cpv2010arg
+
+    if file_format not in FORMATS:
+        raise ValueError("{} is not a format, use one of {}".format(
+            file_format, sorted(FORMATS)))
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+
+    items = list(queries.items())
+
+    def make_one(item):
+        (name, query_type), query = item
+        with trace() as query_trace:
+            start = time.time()
+            if query_type in AREALIST_TYPES:
+                df = cpv2010arg.make_arealist_query(query, **kwargs)
+            else:
+                df = cpv2010arg.make_crosstab_query(query, **kwargs)
+        return df, time.time() - start, query_trace.durations()
+
+    with cpv2010arg.shared_pool(max_workers, **kwargs) as pool:
+        kwargs["pool"] = pool
+        for index, result in run_concurrently(
+                make_one, items, max_workers=max_workers, ordered=False,
+                retries=retries, return_exceptions=True):
+            name = items[index][0][0]
+            if isinstance(result, Exception):
+                yield QueryResult(name, None, None, None, None, result)
+                continue
+
+            df, seconds, stages = result
+            path = os.path.join(output_dir, safe_filename(name) + FORMATS[
+                file_format])
+            write_result(df, path, file_format)
+            yield QueryResult(name, len(df), seconds, stages, path, None)
+
+
+def write_result(df, path, file_format="csv"):
+    """Write a result DataFrame, with its index only if it has labels."""
+    if df.index.names == [None]:
+        df = df.reset_index(drop=True)
+    else:
+        df = df.reset_index()
+
+    if file_format == "parquet":
+        df.to_parquet(path)
+    else:
+        df.to_csv(path, index=False, encoding="utf-8")
+
+
+def format_result(result):
+    """Return a line with the rows and timing of a query (or its error)."""
+    if result.error is not None:
+        return "{:<24} FAILED  {}".format(result.name, result.error)
+
+    return "{:<24} {:>8} rows {:>8.2f} s  {}".format(
+        result.name, result.rows, result.seconds,
+        ", ".join("{} {:.2f} s".format(stage, seconds)
+                  for stage, seconds in result.stages.items()))
+
+
+def format_summary(results, seconds):
+    """Return a line with the queries and rows made per second."""
+    rows = sum(result.rows for result in results if result.error is None)
+    failed = sum(1 for result in results if result.error is not None)
+
+    return ("{} queries ({} failed), {} rows in {:.2f} s: "
+            "{:.2f} queries/s, {:.0f} rows/s").format(
+                len(results), failed, rows, seconds,
+                len(results) / seconds if seconds else 0,
+                rows / seconds if seconds else 0)
+
+
+# PRIVATE
+def _get_parser():
+    parser = argparse.ArgumentParser(
+        prog="pyredatam",
+        description="Run the queries of a JSON or YAML file on the REDATAM "
+        "database of ARG 2010 Census, writing each result to a file.")
+    parser.add_argument("spec", help="JSON or YAML file with the queries")
+    parser.add_argument("-o", "--output-dir", default=".",
+                        help="directory where results are written")
+    parser.add_argument("-f", "--format", choices=sorted(FORMATS),
+                        default="csv", help="format of the result files")
+    parser.add_argument("-j", "--max-workers", type=int, default=4,
+                        help="queries made at the same time")
+    parser.add_argument("-b", "--backend", choices=["selenium", "http"],
+                        default="selenium",
+                        help="how queries are made: selenium uses Firefox, "
+                        "http (experimental) posts the processor form")
+    parser.add_argument("--url", help="url of the REDATAM server")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="times a failed query is retried")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="don't use the cache of results")
+    parser.add_argument("--refresh", action="store_true",
+                        help="make the queries again, updating the cache")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="print the queries without making them")
+    return parser
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,31 +7,79 @@ cpv2010arg.py
 Make a query to 2010 Argentina's Census REDATAM database.
 """
 
+from __future__ import absolute_import
 from __future__ import unicode_literals
 from __future__ import print_function
 from __future__ import with_statement
 import os
-from selenium import webdriver
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from pyvirtualdisplay import Display
+import io
+import codecs
+import tempfile
 import pandas as pd
-from bs4 import BeautifulSoup
-import requests
+import numpy as np
+import lxml.html
+import lxml.etree
 from collections import OrderedDict
 import json
 import time
-
-from utils import get_data_dir
+import re
+from contextlib import contextmanager
+
+from .utils import get_data_dir, memoize, remove_file, replace_file
+from .metadata import AREA_LEVELS, get_dictionary, get_variable_dictionary, \
+    get_ids, get_geography
+from .dictionary import diff_dictionaries
+from .cache import QueryCache, get_default_cache, make_key
+from .pool import WebDriverPool, firefox
+from .executor import run_concurrently
+from .sharding import plan_shards, merge_arealist_results, TOTAL_LABEL
+from .instrumentation import stage
+from .waits import WaitStrategy, StageTimeoutError
+from .offline import OfflineEngine
+from .jobs import JobManifest
+from .validation import QueryValidator, QueryValidationError
+from .pyredatam import arealist_query, counter_query
 
 BASE_URL = "http://200.51.91.245/argbin/RpWebEngine.exe/PortalAction?BASE=CPV2010B"
 URL_DICTIONARY = "http://200.51.91.245/argbin/RpWebEngine.exe/Dictionary?&BASE=CPV2010B&ITEM=DICALL&MAIN=WebServerMain.inl"
 URL_CATEGORIES = "http://200.51.91.245/argbin/RpWebEngine.exe/Dictionary"
 
+BACKENDS = ["selenium", "http"]
+MAX_QUERIES_PER_SERVER = 4
+DICTIONARY_BATCH_SIZE = 25
+
+# bytes read to tell the format, encoding and separator of exported results
+EXPORT_SNIFF_SIZE = 64 * 1024
+EXCEL_SIGNATURES = (b"\xd0\xcf\x11\xe0", b"PK\x03\x04")
+EXPORT_SEPARATORS = ["\t", ";", ","]
+
+# approximate number of areas of each level in the whole country
+AREA_COUNTS = {"PROV": 24, "DPTO": 527, "FRAC": 5400, "RADIO": 52400}
+
+DEFAULT_WAIT = WaitStrategy()
+
+AREA_BREAK = re.compile(r"AREA\s*#\s*(\d+)")
+# results have a table of at least two rows (see parse_arealist_to_dataframe)
+RESULT_ROWS = re.compile(r"<tr[\s>].*?<tr[\s>]", re.IGNORECASE | re.DOTALL)
+
+_http_clients = {}
+
 
 # PUBLIC
-def make_arealist_query(query):
+class ResultError(ValueError):
+    """The server returned a page without a result table."""
+
+    def __init__(self, html):
+        text = " ".join(_parse_html(html).text_content().split()) if \
+            html.strip() else ""
+        super(ResultError, self).__init__(
+            "The result has no table, the server said: {}".format(
+                text[:300] or "nothing"))
+
+
+def make_arealist_query(query, cache=True, refresh=False, pool=None,
+                        backend="selenium", url=BASE_URL, wait=None,
+                        validate=False, download=False, compact=False):
     """Query ARG REDATAM 2010 Census for an Area List.
 
     A Firefox visible instance will be opened to make the query simulating user
@@ -40,113 +88,880 @@ def make_arealist_query(query):
 
     Args:
         query (str): REDATAM Area List query.
+        cache (bool or QueryCache): Cache to use (see make_query).
+        refresh (bool): True to bypass a cached result (see make_query).
+        pool (WebDriverPool): Pool of browsers to use (see make_query).
+        backend (str): How the query is made (see make_query).
+        url (str): Url of the REDATAM server.
+        wait (WaitStrategy): How to wait for the browser (see make_query).
+        validate (bool or QueryValidator): Check the query before sending it
+            (see make_query).
+        download (bool): True to download the result through its export link
+            and read it with read_export_to_dataframe, instead of parsing the
+            html of the result. Downloaded results are not cached.
+        compact (bool): True to return the result with less memory (see
+            compact_arealist_dataframe).
 
     Returns:
         pandas.DataFrame: Data result from query.
     """
-    return parse_arealist_to_dataframe(make_query(query))
+    if download:
+        fd, path = tempfile.mkstemp(suffix=".xls")
+        os.close(fd)
+        try:
+            df = read_export_to_dataframe(make_export_query(
+                query, path, url, pool=pool, backend=backend, wait=wait,
+                validate=validate))
+        finally:
+            remove_file(path)
+    else:
+        df = parse_arealist_to_dataframe(
+            make_query(query, url, cache=cache, refresh=refresh, pool=pool,
+                       backend=backend, wait=wait, validate=validate))
+
+    return compact_arealist_dataframe(df) if compact else df
 
 
 make_counter_query = make_arealist_query
 
 
-def parse_arealist_to_dataframe(html):
+def parse_arealist_to_dataframe(html, compact=False):
     """Parse an html result of a query to REDATAM, into a DataFrame.
 
+    Cells of every row are extracted in one pass with lxml and the DataFrame
+    is built once, converting the values columns to integers at once.
+
     Args:
         html (str): Result of a REDATAM query.
+        compact (bool): True to return the result with less memory (see
+            compact_arealist_dataframe).
 
     Returns:
         pandas.DataFrame: Data result from query.
+
+    Raises:
+        ResultError: If the html has no result table (eg. an error page).
+    """
+    with stage("parse") as record:
+        record.bytes = len(html)
+        rows = _parse_html(html).xpath("//tr")
+        if len(rows) < 2:
+            raise ResultError(html)
+
+        columns = _get_cells_text(rows[1])
+        cells = [_get_cells_text(row) for row in rows[2:-1]]
+        record.rows = len(cells)
+
+        df = _build_arealist_dataframe(columns, cells)
+        return compact_arealist_dataframe(df) if compact else df
+
+
+def compact_arealist_dataframe(df, geography=None):
+    """Store an Area List result in less memory.
+
+    Area codes of a level with known areas in the geography become a
+    Categorical, kept as int16 or int32 codes of the categories, and the
+    categories are every area of the level, so results of different queries
+    of the same level share them. Codes of other levels (eg. FRAC or RADIO)
+    appear once each, so categories would not save memory: they become int32
+    numbers instead, without their leading zeros (see pad_area_codes).
+    Integer columns are downcast to the smallest type holding their values.
+
+    >>> df = compact_arealist_dataframe(pd.DataFrame(
+    ...     {"Código": ["02007", "94014"], "Casos": [2500, 15]},
+    ...     columns=["Código", "Casos"]))
+    >>> print(df["Código"].dtype, len(df["Código"].cat.categories))
+    category 527
+    >>> print(df["Casos"].dtype)
+    int16
+    >>> df = compact_arealist_dataframe(pd.DataFrame(
+    ...     {"Código": ["020010101"], "Casos": [15]},
+    ...     columns=["Código", "Casos"]))
+    >>> print(df["Código"].dtype, df["Código"][0])
+    int32 20010101
+
+    Args:
+        df (pandas.DataFrame): Result with the area codes in its first
+            column (eg. from parse_arealist_to_dataframe).
+        geography (GeographyIndex): Index with the known areas. By default,
+            get_geography().
+
+    Returns:
+        pandas.DataFrame: Compacted copy of df.
     """
-    bs = BeautifulSoup(html, "html5lib")
-    rows = bs.find_all("tr")
-    df = pd.DataFrame(columns=[td.get_text() for td in rows[1].find_all("td")])
-    for row in rows[2:-1]:
-        text_values = [td.get_text() for td in row.find_all("td")]
-        area_code = text_values[0]
-        values = [int(text.replace(".", "")) for text in text_values[1:]]
-        values.insert(0, area_code)
-        df.loc[len(df)] = values
+    geography = geography or get_geography()
+    df = df.copy()
+
+    codes = df[df.columns[0]]
+    categories = _get_area_categories(codes, geography)
+    if categories:
+        df[df.columns[0]] = pd.Categorical(codes, categories=categories)
+    elif _get_codes_level(codes, geography):
+        # 9 digits, the longest codes (RADIO), always fit in int32
+        df[df.columns[0]] = codes.astype("int32")
+
+    for column in df.columns[1:]:
+        if df[column].dtype.kind == "i":
+            df[column] = pd.to_numeric(df[column], downcast="integer")
 
     return df
 
 
-def make_query(query, url=BASE_URL):
+def pad_area_codes(codes, area_level, geography=None):
+    """Restore the leading zeros of area codes compacted to integers.
+
+    >>> codes = pad_area_codes(pd.Series([20010101, 940140203]), "RADIO")
+    >>> print(", ".join(codes))
+    020010101, 940140203
+
+    Args:
+        codes (pandas.Series): Area codes (see compact_arealist_dataframe).
+            Other values (eg. the total row label) are left as they are.
+        area_level (str): Level of the areas, whose codes have a fixed
+            length.
+        geography (GeographyIndex): Index with the length of the codes of
+            each level. By default, get_geography().
+
+    Returns:
+        pandas.Series: Area codes as strings.
+    """
+    code_length = (geography or get_geography()).code_lengths[area_level]
+
+    def pad(code):
+        text = "{}".format(code)
+        return text.zfill(code_length) if text.isdigit() else code
+
+    return codes.astype(object).map(pad)
+
+
+def make_export_query(query, path, url=BASE_URL, pool=None,
+                      backend="selenium", wait=None, validate=False):
+    """Query ARG REDATAM 2010 Census and download the file of its result.
+
+    The file of the "Descargar en formato Excel" link of the result is
+    streamed to path, so the html of the result, much bigger, is never read
+    as a whole.
+
+    Args:
+        query (str): REDATAM query.
+        path (str): Path where the result file is written.
+        (see make_query for the other arguments)
+
+    Returns:
+        str: The path.
+    """
+    _check_query(query, backend, validate)
+
+    if backend == "http":
+        return _get_http_client(url).export_program(query, path)
+    return _make_browser_query(query, url, pool, wait, export_path=path)
+
+
+def read_export_to_dataframe(path, encoding=None):
+    """Read the file of the export link of an Area List result.
+
+    Text files (separated by tabs, semicolons or commas) are read with the C
+    parser of pandas and Excel files with pandas.read_excel (which needs
+    xlrd). Area codes stored as numbers in an Excel file get back their
+    leading zeros. Files with the html table are parsed as html results.
+
+    Args:
+        path (str): Path of a file downloaded by make_export_query.
+        encoding (str): Encoding of a text file. By default, utf-8 if the
+            file is valid utf-8, otherwise latin-1.
+
+    Returns:
+        pandas.DataFrame: Data result from query, with the same columns and
+            types than parse_arealist_to_dataframe.
+    """
+    with open(path, "rb") as f:
+        head = f.read(EXPORT_SNIFF_SIZE)
+
+    if head.lstrip().startswith(b"<"):
+        with open(path, "rb") as f:
+            return parse_arealist_to_dataframe(f.read())
+
+    with stage("parse") as record:
+        record.bytes = os.path.getsize(path)
+        is_excel = head.startswith(EXCEL_SIGNATURES)
+        if is_excel:
+            raw = pd.read_excel(path, header=None, dtype=object)
+            cells = [[_to_cell_text(value) for value in row]
+                     for row in raw.values]
+        else:
+            cells = _read_export_text(path, head, encoding)
+
+        # the title is the only line before the header and the text after
+        # the table has no values
+        header = next(i for i, row in enumerate(cells)
+                      if sum(1 for cell in row if cell) > 1)
+        rows = [row for row in cells[header + 1:] if any(row[1:])]
+        record.rows = len(rows)
+
+        df = _build_arealist_dataframe(cells[header], rows)
+        if is_excel:
+            codes = df[df.columns[0]]
+            area_level = _get_stripped_codes_level(codes)
+            if area_level:
+                df[df.columns[0]] = pad_area_codes(codes, area_level)
+
+        return df
+
+
+def make_crosstab_query(query, incl_total=False, cache=True, refresh=False,
+                        pool=None, backend="selenium", url=BASE_URL,
+                        wait=None, validate=False):
+    """Query ARG REDATAM 2010 Census for a table of categories.
+
+    Crosstabs, frequencies, means, medians and statistics queries are
+    aggregated by the server and parsed with parse_crosstab_to_dataframe.
+
+    Args:
+        query (str): REDATAM query (eg. from pyredatam.cross_query).
+        incl_total (bool): True to keep the total rows of the result.
+        cache (bool or QueryCache): Cache to use (see make_query).
+        refresh (bool): True to bypass a cached result (see make_query).
+        pool (WebDriverPool): Pool of browsers to use (see make_query).
+        backend (str): How the query is made (see make_query).
+        url (str): Url of the REDATAM server.
+        wait (WaitStrategy): How to wait for the browser (see make_query).
+        validate (bool or QueryValidator): Check the query before sending it
+            (see make_query).
+
+    Returns:
+        pandas.DataFrame: Data result from query.
+    """
+    return parse_crosstab_to_dataframe(
+        make_query(query, url, cache=cache, refresh=refresh, pool=pool,
+                   backend=backend, wait=wait, validate=validate), incl_total)
+
+
+make_cross_query = make_crosstab_query
+make_frequencies_query = make_crosstab_query
+make_mean_query = make_crosstab_query
+make_median_query = make_crosstab_query
+make_stats_query = make_crosstab_query
+
+
+def parse_crosstab_to_dataframe(html, incl_total=False):
+    """Parse an html result of a table of categories into a DataFrame.
+
+    Rows are indexed by their category or, if the result is broken by areas
+    (AREABREAK), by a MultiIndex of the area code and the category. Cells are
+    converted to numbers column by column at once.
+
+    Args:
+        html (str): Result of a REDATAM crosstabs, frequencies, mean, median
+            or statistics query.
+        incl_total (bool): True to keep the total rows of each area.
+
+    Returns:
+        pandas.DataFrame: Data result from query.
+
+    Raises:
+        ResultError: If the html has no result table (eg. an error page).
+    """
+    with stage("parse") as record:
+        record.bytes = len(html)
+        areas, labels, cells = [], [], []
+        area = columns = None
+
+        for row in _parse_html(html).xpath("//tr"):
+            texts = _get_cells_text(row)
+
+            # titles, area breaks and footers span the whole table
+            if len(texts) == 1:
+                area_break = AREA_BREAK.search(texts[0])
+                if area_break:
+                    area = area_break.group(1)
+                continue
+
+            if columns is None:
+                columns = texts
+            elif texts == columns:
+                continue
+            elif incl_total or texts[0].strip() != TOTAL_LABEL:
+                areas.append(area)
+                labels.append(texts[0].strip())
+                cells.append(texts[1:])
+
+        record.rows = len(cells)
+
+        if columns is None:
+            raise ResultError(html)
+
+        if any(area is not None for area in areas):
+            index = pd.MultiIndex.from_arrays([areas, labels],
+                                              names=["Código", columns[0]])
+        else:
+            index = pd.Index(labels, name=columns[0])
+
+        if not cells:
+            return pd.DataFrame(columns=columns[1:], index=index)
+
+        cells = np.array(cells, dtype="U")
+        return pd.DataFrame(OrderedDict(
+            (column, _to_number_column(cells[:, i]))
+            for i, column in enumerate(columns[1:])), index=index,
+            columns=columns[1:])
+
+
+def make_program_query(program, parsers=None, **kwargs):
+    """Query ARG REDATAM 2010 Census for every table of a program.
+
+    Programs with many tables (see pyredatam.program_query) are submitted
+    once and their result is split in one DataFrame per table.
+
+    Args:
+        program (str): REDATAM program.
+        parsers (callable or list): Parser of the html of each table (see
+            parse_program_to_dataframes).
+        **kwargs: Arguments of make_query (eg. backend, url, cache or pool).
+
+    Returns:
+        list: pandas.DataFrame of each table, in the order of the program.
+    """
+    return parse_program_to_dataframes(make_query(program, **kwargs), parsers)
+
+
+def split_result_tables(html):
+    """Split the html result of a program in one html for each table."""
+    tables = _parse_html(html).xpath("//table[not(ancestor::table)]")
+    return [lxml.html.tostring(table, encoding="unicode") for table in tables]
+
+
+def parse_program_to_dataframes(html, parsers=None):
+    """Parse the html result of a program with many tables into DataFrames.
+
+    Args:
+        html (str): Result of a REDATAM program.
+        parsers (callable or list): Function parsing the html of a table, or a
+            list with the function of each table. By default, every table is
+            parsed with parse_arealist_to_dataframe.
+
+    Returns:
+        list: pandas.DataFrame of each table, in the order of the program.
+    """
+    tables = split_result_tables(html)
+
+    parsers = parsers or parse_arealist_to_dataframe
+    if callable(parsers):
+        parsers = [parsers] * len(tables)
+    elif len(parsers) != len(tables):
+        raise ValueError("{} parsers for {} tables in the result".format(
+            len(parsers), len(tables)))
+
+    return [parser(table) for parser, table in zip(parsers, tables)]
+
+
+def iter_arealist_rows(source):
+    """Parse an html result of a query to REDATAM, yielding one row at a time.
+
+    The html is parsed incrementally, discarding each row once it is yielded,
+    so memory doesn't grow with the size of the result.
+
+    Args:
+        source (str or file): Path or binary file-like object with the result
+            of a REDATAM query.
+
+    Yields:
+        OrderedDict: Values of an area by column name, with the same columns
+            and types than parse_arealist_to_dataframe.
+    """
+    columns = None
+    for cells in _iter_arealist_cells(source):
+        if columns is None:
+            columns = cells
+            continue
+        values = [cells[0]] + [_to_int_or_text(text) for text in cells[1:]]
+        yield OrderedDict(zip(columns, values))
+
+
+def iter_arealist_chunks(source, chunksize=10000):
+    """Parse an html result of a query to REDATAM, into DataFrame chunks.
+
+    Args:
+        source (str or file): Path or binary file-like object with the result
+            of a REDATAM query.
+        chunksize (int): Max number of rows of each DataFrame.
+
+    Yields:
+        pandas.DataFrame: Consecutive chunks of the result, each one as
+            parse_arealist_to_dataframe would have returned it.
+    """
+    columns = None
+    chunk = []
+    chunks_count = 0
+    for cells in _iter_arealist_cells(source):
+        if columns is None:
+            columns = cells
+            continue
+
+        chunk.append(cells)
+        if len(chunk) == chunksize:
+            yield _build_arealist_dataframe(columns, chunk)
+            chunks_count += 1
+            chunk = []
+
+    # an empty result still yields one (empty) DataFrame
+    if chunk or chunks_count == 0:
+        yield _build_arealist_dataframe(columns or [], chunk)
+
+
+def make_query(query, url=BASE_URL, cache=True, refresh=False, pool=None,
+               backend="selenium", wait=None, validate=False):
     """Query ARG REDATAM 2010 Census.
 
-    A Firefox visible instance will be opened to make the query simulating user
-    input. If Xephyr, Xvfb or Xvnc backends are installed, the instance will be
-    hidden. You MUST have Firefox installed to use this method.
+    With the "selenium" backend a Firefox visible instance will be opened to
+    make the query simulating user input. If Xephyr, Xvfb or Xvnc backends are
+    installed, the instance will be hidden. You MUST have Firefox installed to
+    use this backend. The "http" backend posts the query to the processor with
+    plain HTTP requests instead, which is much faster and doesn't need a
+    browser.
+
+    Results are kept in an on-disk cache, so repeating a query doesn't open the
+    browser again. Pages without a result table (eg. error pages) are not
+    cached.
 
     Args:
         query (str): REDATAM query.
+        url (str): Url of the REDATAM server.
+        cache (bool or QueryCache): True to use the default cache, False to not
+            use any cache or a QueryCache instance to use that one.
+        refresh (bool): True to ignore a cached result, make the query again
+            and update the cache with the new result.
+        pool (WebDriverPool): Pool of browsers parked on the processor of url
+            (see make_pool). If None, a new browser is opened for this query.
+            Only used by the "selenium" backend.
+        backend (str): "selenium" or "http".
+        wait (WaitStrategy): Timeouts of each stage of a browser query and
+            how often the pages are checked. By default, DEFAULT_WAIT, whose
+            timeouts grow with the rows expected in the result.
+        validate (bool or QueryValidator): True to check variables,
+            categories and areas of the query with get_validator before
+            sending it, or a validator to check it with.
 
     Returns:
         str: Data result from query in html format.
+
+    Raises:
+        QueryValidationError: If the query is validated and it is invalid.
+        StageTimeoutError: If a stage of a browser query doesn't finish in
+            time.
+        ValueError: If the browsers of pool are parked on another url.
     """
 
-    with Display(visible=False):
+    _check_query(query, backend, validate)
 
-        driver = webdriver.Firefox()
-        driver.get(url)
+    query_cache = _get_cache(cache)
 
-        driver.switch_to.frame("Index")
-        info_gral = _get_clickable_by_id(driver, "ui-accordion-root-header-4")
-        info_gral.click()
+    if query_cache is not None and not refresh:
+        with stage("cache") as record:
+            html = query_cache.get(query, url)
+            record.bytes = len(html) if html is not None else None
+        if html is not None:
+            return html
 
-        id_progr_redatam = "ui-accordion-ui-accordion-root-panel-4-header-1"
-        progr_redatam = _get_clickable_by_id(driver, id_progr_redatam)
-        progr_redatam.click()
+    if backend == "http":
+        html = _make_http_query(query, url)
+    else:
+        html = _make_browser_query(query, url, pool, wait)
 
-        id_redatam_panel = "ui-accordion-ui-accordion-root-panel-4-panel-1"
-        progr_redatam_panel = _get_clickable_by_id(driver, id_redatam_panel)
-        procesador = progr_redatam_panel.find_element_by_tag_name("a")
-        procesador.click()
+    # error pages (eg. a busy server) are not cached, the next try may work
+    if query_cache is not None and RESULT_ROWS.search(html):
+        query_cache.set(query, url, html)
 
-        driver.switch_to.default_content()
-        # driver.switch_to.frame("Output")
-        _switch_to_loaded_frame(driver, "Output")
+    return html
 
-        query_input = driver.find_element_by_tag_name("textarea")
-        query_input.send_keys(query.decode("utf-8", "ignore"))
 
-        submit = driver.find_element_by_name("SUBMIT")
-        submit.click()
+def make_queries(queries, max_workers=4, ordered=True, retries=2, backoff=1.0,
+                 max_per_server=MAX_QUERIES_PER_SERVER, parser=None,
+                 return_exceptions=False, **kwargs):
+    """Make many queries concurrently.
 
-        driver.switch_to.default_content()
-        # driver.switch_to.frame("Output")
-        _switch_to_loaded_frame(driver, "Output")
-        # driver.switch_to.frame("grid")
-        _switch_to_loaded_frame(driver, "grid")
+    Queries are run on a pool of threads, each one through make_query. A
+    failed query is retried waiting backoff seconds (doubled on every retry)
+    and no more than max_per_server queries are sent to the same server at
+    the same time.
 
-        _wait_until_text(driver, "body > p > a:nth-child(1)",
-                         "Descargar en formato Excel")
+    >>> dfs = make_queries([query1, query2], max_workers=8, backend="http",
+    ...                    parser=parse_arealist_to_dataframe) # doctest: +SKIP
 
-        html = driver.page_source
+    Args:
+        queries (list): REDATAM queries. Each one may also be a dict with the
+            arguments of make_query for that query (eg. {"query": query,
+            "url": url}).
+        max_workers (int): Max number of queries made at the same time.
+        ordered (bool): True to return a list of results in the order of
+            queries, False to return a generator of (index, result) tuples
+            yielded as queries are completed.
+        retries (int): Times a failed query is retried.
+        backoff (float): Seconds to wait before the first retry.
+        max_per_server (int): Max number of queries made to the same server
+            at the same time.
+        parser (callable): Function applied to each html result (eg.
+            parse_arealist_to_dataframe). If None, html results are returned.
+        return_exceptions (bool): True to return the exception of a query
+            that failed after every retry in place of its result, instead of
+            raising it.
+        **kwargs: Arguments of make_query shared by every query (eg. backend,
+            url, cache or pool). Browser queries without a pool share one
+            pool of max_workers browsers (see shared_pool), so every one of
+            them must be made to the same url.
 
-        driver.close()
+    Returns:
+        list or generator: Results of the queries.
+    """
 
-    return html
+    def make_one(query):
+        query_kwargs = dict(kwargs)
+        if isinstance(query, dict):
+            query_kwargs.update(query)
+        else:
+            query_kwargs["query"] = query
+
+        html = make_query(**query_kwargs)
+        return parser(html) if parser else html
+
+    def get_server(query):
+        if isinstance(query, dict) and "url" in query:
+            return query["url"]
+        return kwargs.get("url", BASE_URL)
+
+    def make_all():
+        with shared_pool(max_workers, **kwargs) as pool:
+            kwargs["pool"] = pool
+            for result in run_concurrently(
+                    make_one, queries, max_workers=max_workers,
+                    ordered=ordered, retries=retries, backoff=backoff,
+                    limit_key=get_server, max_per_key=max_per_server,
+                    return_exceptions=return_exceptions):
+                yield result
+
+    results = make_all()
+    if ordered:
+        return [result for _, result in results]
+    return results
+
+
+def make_sharded_arealist_query(area_level, variables, area_filter=None,
+                                universe_filter=None, title=None,
+                                incl_area_name=False, shard_level="PROV",
+                                shard_size=1, **kwargs):
+    """Make an Area List query split in smaller queries over fewer areas.
+
+    The arguments of pyredatam.arealist_query are used to build one query for
+    each shard of areas (see plan_area_shards). Shards are queried through
+    make_queries and their results are concatenated.
+
+    Args:
+        shard_level (str): Level of the areas used to split the query. It
+            can't be finer than area_level, or an area would be split in
+            many shards.
+        shard_size (int): Number of shard_level areas in each query.
+        **kwargs: Arguments of make_queries (eg. max_workers or backend).
+
+    Returns:
+        pandas.DataFrame: Data result from all the shards.
+
+    Raises:
+        ValueError: If shard_level is finer than area_level.
+    """
+    _check_shard_level(area_level, shard_level)
+    shard_queries = [
+        arealist_query(area_level, variables, shard_filter, universe_filter,
+                       title, incl_area_name)
+        for shard_filter in plan_area_shards(area_filter, shard_level,
+                                             shard_size)]
+
+    return merge_arealist_results(make_queries(
+        shard_queries, parser=parse_arealist_to_dataframe, **kwargs))
+
+
+def make_stored_arealist_query(store, dataset, area_level, variables,
+                               area_filter=None, universe_filter=None,
+                               incl_area_name=False, shard_level="PROV",
+                               force=False, max_workers=4, **kwargs):
+    """Read an Area List query from a local store, fetching missing areas.
+
+    The result is stored in one partition for each shard_level area (see
+    plan_area_shards), with the key of its query. Only the areas not stored
+    yet, or stale, are queried, so once a dataset is stored it is read
+    without the network. Changing the query of a dataset (eg. its variables
+    or universe) makes its stored partitions stale.
+
+    Args:
+        store (ResultStore): Store of the results (see store.ResultStore).
+        dataset (str): Name of the dataset in the store.
+        shard_level (str): Level of the areas of each partition.
+        force (bool): True to query every area again.
+        max_workers (int): Areas queried at the same time.
+        **kwargs: Arguments of make_arealist_query (eg. backend or cache).
+
+    Returns:
+        pandas.DataFrame: Data result from all the areas.
+
+    Raises:
+        ValueError: If shard_level is finer than area_level.
+    """
+    _check_shard_level(area_level, shard_level)
+    code_length = get_geography().code_lengths[shard_level]
+    shard_queries = OrderedDict(
+        (list(shard.values())[0][0][:code_length],
+         arealist_query(area_level, variables, shard, universe_filter, None,
+                        incl_area_name))
+        for shard in plan_area_shards(area_filter, shard_level))
+    url = kwargs.get("url", BASE_URL)
+    keys = {area_code: make_key(query, url)
+            for area_code, query in shard_queries.items()}
+
+    def fetch(area_code):
+        return make_arealist_query(shard_queries[area_code], **kwargs)
+
+    with shared_pool(max_workers, **kwargs) as pool:
+        kwargs["pool"] = pool
+        return store.refresh(dataset, shard_level, list(shard_queries), fetch,
+                             force=force, max_workers=max_workers, keys=keys)
+
+
+def make_job_arealist_query(manifest, area_level, variables,
+                            area_filter=None, universe_filter=None,
+                            title=None, incl_area_name=False,
+                            shard_level="PROV", shard_size=1, max_workers=4,
+                            retries=2, **kwargs):
+    """Make a sharded Area List query recorded in a job manifest.
+
+    Like make_sharded_arealist_query, but the query, status and result of
+    each shard are kept in the manifest. Calling it again with the same
+    manifest only queries the shards that failed, whose result is missing or
+    whose query changed, and the result is assembled from the stored ones.
+
+    >>> df = make_job_arealist_query("condact_dpto.json", "DPTO",
+    ...                              ["PERSONA.CONDACT"], shard_level="DPTO",
+    ...                              shard_size=20)  # doctest: +SKIP
+
+    Args:
+        manifest (str or JobManifest): Manifest of the job, or the path of
+            its json file.
+        shard_level (str): Level of the areas used to split the query.
+        shard_size (int): Number of shard_level areas in each query.
+        max_workers (int): Shards queried at the same time.
+        retries (int): Times a failed shard is retried before the job fails.
+        **kwargs: Arguments of make_arealist_query (eg. backend or cache).
+
+    Returns:
+        pandas.DataFrame: Data result from all the shards.
+
+    Raises:
+        JobError: If some shards failed. Calling it again resumes the job.
+        ValueError: If shard_level is finer than area_level.
+    """
+    _check_shard_level(area_level, shard_level)
+    if not isinstance(manifest, JobManifest):
+        manifest = JobManifest(manifest, kwargs.get("url", BASE_URL))
+
+    shard_queries = OrderedDict()
+    for shard_filter in plan_area_shards(area_filter, shard_level,
+                                         shard_size):
+        level, area_codes = list(shard_filter.items())[0]
+        shard_id = "{}_{}-{}".format(level, area_codes[0], area_codes[-1])
+        shard_queries[shard_id] = arealist_query(
+            area_level, variables, shard_filter, universe_filter, title,
+            incl_area_name)
+
+    manifest.plan(shard_queries)
+    with shared_pool(max_workers, **kwargs) as pool:
+        kwargs["pool"] = pool
+        manifest.run(lambda query: make_arealist_query(query, **kwargs),
+                     max_workers=max_workers, retries=retries)
+
+    return merge_arealist_results(manifest.read())
+
+
+def make_sharded_counter_query(area_level, entity_count, area_filter=None,
+                               universe_filter=None, title=None,
+                               incl_area_name=False, incl_total=False,
+                               shard_level="PROV", shard_size=1, **kwargs):
+    """Make a counter query split in smaller queries over fewer areas.
+
+    Like make_sharded_arealist_query, with the arguments of
+    pyredatam.counter_query. If incl_total is True the total row is computed
+    adding up the results of every shard.
+
+    Returns:
+        pandas.DataFrame: Data result from all the shards.
+
+    Raises:
+        ValueError: If shard_level is finer than area_level.
+    """
+    _check_shard_level(area_level, shard_level)
+    shard_queries = [
+        counter_query(area_level, entity_count, shard_filter,
+                      universe_filter, title, incl_area_name)
+        for shard_filter in plan_area_shards(area_filter, shard_level,
+                                             shard_size)]
+
+    return merge_arealist_results(make_queries(
+        shard_queries, parser=parse_arealist_to_dataframe, **kwargs),
+        incl_total)
+
+
+def plan_area_shards(area_filter=None, shard_level="PROV", shard_size=1):
+    """Split an area filter into smaller area filters.
+
+    If shard_level is finer than the level of area_filter, its areas are
+    expanded into their shard_level children. If it is coarser, the areas of
+    area_filter are grouped by their shard_level parent.
+
+    >>> for shard in plan_area_shards({"PROV": ["02", "94"]}, "DPTO", 6):
+    ...     print(", ".join(shard["DPTO"]))
+    02001, 02002, 02003, 02004, 02005, 02006
+    02007, 02008, 02009, 02010, 02011, 02012
+    02013, 02014, 02015, 94007, 94014, 94021
+    94028
+
+    Args:
+        area_filter (dict): Geographical area/s where results are asked (as in
+            pyredatam.arealist_query, names or parent areas are expanded with
+            get_geography). None for the whole country.
+        shard_level (str): "PROV" or "DPTO".
+        shard_size (int): Number of shard_level areas in each shard.
+
+    Returns:
+        list: Area filters, one for each shard.
+    """
+    geography = get_geography()
+
+    if area_filter:
+        area_filter = geography.expand_area_filter(area_filter)
+        filter_level, area_codes = list(area_filter.items())[0]
+    else:
+        filter_level, area_codes = "PROV", geography.codes("PROV")
+
+    shard_depth = geography.levels.index(shard_level)
+    filter_depth = geography.levels.index(filter_level)
+
+    group_key = None
+    if shard_depth > filter_depth:
+        area_codes = [child for area_code in area_codes
+                      for child in geography.children(area_code, shard_level)]
+        filter_level = shard_level
+    elif shard_depth < filter_depth:
+        code_length = geography.code_lengths[shard_level]
 
+        def group_key(area_code):
+            return area_code[:code_length]
 
-def get_dictionary(dict_filename="cpv2010arg_diccionario.json"):
-    with open(os.path.join(get_data_dir(), dict_filename), "r") as f:
-        return json.load(f)
+    return [{filter_level: shard}
+            for shard in plan_shards(area_codes, shard_size, group_key)]
 
 
-def get_ids(ids_filename="cpv2010arg_ids.json"):
-    with open(os.path.join(get_data_dir(), ids_filename), "r") as f:
-        return json.load(f)
+def make_offline_engine(data_dir, **kwargs):
+    """Make an engine running queries over microdata in Parquet files.
+
+    Area names and category labels are taken from get_geography and
+    get_variable_dictionary (see offline.OfflineEngine).
+
+    Args:
+        data_dir (str): Directory with a ENTITY.parquet file for each entity
+            (eg. PERSONA.parquet), with a RADIO column with area codes.
+        **kwargs: Arguments of offline.OfflineEngine.
+
+    Returns:
+        OfflineEngine: Engine whose run(query) returns the same DataFrame as
+            make_arealist_query(query).
+    """
+    kwargs.setdefault("geography", get_geography())
+    kwargs.setdefault("dictionary", get_variable_dictionary())
+    return OfflineEngine.from_parquet(data_dir, AREA_LEVELS, **kwargs)
+
+
+def make_pool(size=2, max_uses=50, url=BASE_URL, visible=False):
+    """Create a pool of browsers parked on the REDATAM processor.
+
+    Opening Firefox and navigating to the processor takes longer than most
+    queries, so browsers of the pool are reused between queries.
+
+    >>> pool = make_pool(size=4)
+    >>> html = make_query(query, pool=pool)  # doctest: +SKIP
+    >>> pool.close()
+
+    Args:
+        size (int): Max number of browsers open at the same time.
+        max_uses (int): Times a browser is used before being recycled.
+        url (str): Url of the REDATAM server.
+        visible (bool): False to open browsers inside a virtual display.
+
+    Returns:
+        WebDriverPool: Pool to be passed to make_query.
+    """
+    return WebDriverPool(url, _go_to_processor, size=size, max_uses=max_uses,
+                         visible=visible)
+
+
+@contextmanager
+def shared_pool(size, backend="selenium", pool=None, url=BASE_URL, **kwargs):
+    """Share a pool of browsers among queries made at the same time.
+
+    A browser query without a pool starts its own virtual display, which
+    changes the DISPLAY of the whole process, so concurrent ones break each
+    other's browsers. If size queries may run at the same time with the
+    "selenium" backend and no pool, one pool for url is made and closed at
+    exit.
+
+    >>> with shared_pool(4, **kwargs) as pool:  # doctest: +SKIP
+    ...     kwargs["pool"] = pool
+    ...     results = run_concurrently(make_one, queries, max_workers=4)
+
+    Args:
+        size (int): Max number of queries made at the same time.
+        backend (str): Backend of the queries.
+        pool (WebDriverPool): Pool given to the queries, if any.
+        url (str): Url of the REDATAM server.
+        **kwargs: Other arguments of make_query, ignored.
+
+    Yields:
+        WebDriverPool: Pool to pass to make_query. The given pool, a shared
+            one or None if the queries don't need one.
+    """
+    if backend != "selenium" or pool is not None or size <= 1:
+        yield pool
+        return
+
+    pool = make_pool(size=size, url=url)
+    try:
+        yield pool
+    finally:
+        pool.close()
+
+
+@memoize
+def get_validator(dict_filename="cpv2010arg_diccionario.json",
+                  ids_filename="cpv2010arg_ids.json"):
+    """Return a QueryValidator with the 2010 Census dictionary and areas."""
+    return QueryValidator(get_variable_dictionary(dict_filename),
+                          get_geography(ids_filename))
 
 
 def scrape_dictionary(url_dictionary=URL_DICTIONARY,
-                      url_categories=URL_CATEGORIES):
+                      url_categories=URL_CATEGORIES, checkpoint_path=None,
+                      batch_size=DICTIONARY_BATCH_SIZE, max_workers=4,
+                      **kwargs):
     """Build an entities and variables dictionary of ARG 2010 Census.
 
+    Categories are requested in batches of variables of the same entity,
+    several batches at the same time over one session. If checkpoint_path is
+    given, the categories of each batch are saved there as soon as they
+    arrive and the variables already saved are not requested again, so a
+    failed scrape is resumed calling it again with the same checkpoint.
+
     Args:
         url_dictionary (str): Url where dictionary is.
         url_categories (str): Request url to get the categories of variables.
+        checkpoint_path (str): Json file with the categories scraped so far.
+        batch_size (int): Max variables requested in each request.
+        max_workers (int): Requests made at the same time.
+        **kwargs: Arguments of executor.run_concurrently (eg. retries).
 
     Returns:
         (dict, list, list): A dictionary of entities and variables, a list of
@@ -159,44 +974,456 @@ def scrape_dictionary(url_dictionary=URL_DICTIONARY,
 
     dictionary, geo_entities, data_entities = _parse_df_to_dict(df)
 
-    variables = [data_entity + "." + variable for data_entity in data_entities
-                 for variable in dictionary[data_entity].keys()]
+    scrape_categories(dictionary, data_entities, url_categories,
+                      checkpoint_path, batch_size, max_workers, **kwargs)
 
-    data = {
-        "MAIN": "WebServerMain.inl",
-        "BASE": "CPV2010B",
-        "CODIGO": "xxUsuarioxx",
-        "ITEM": "DICCATVIV",
-        "MODE": "LISTVAR",
-        "DICTIONARY": "HTML",
-        "VARIABLE": variables,
-        "SUBMIT": "Ejecutar"
-    }
+    return dictionary, geo_entities, data_entities
 
-    r = requests.post(url_categories, data=data)
 
-    bs = BeautifulSoup(r.content, "html5lib")
-    text = bs.select("#redInput")[0].get_text()
+def scrape_categories(dictionary, entities, url_categories=URL_CATEGORIES,
+                      checkpoint_path=None, batch_size=DICTIONARY_BATCH_SIZE,
+                      max_workers=4, **kwargs):
+    """Request the categories of the variables of some entities.
 
-    _parse_categories(dictionary, text)
+    Args:
+        dictionary (dict): Entities and variables dictionary.
+        entities (list): Entities whose variables categories are requested.
+        (see scrape_dictionary for the other arguments)
 
-    return dictionary, geo_entities, data_entities
+    Side effects:
+        Populate lists of categories in each variable of the entities.
+    """
+    categories = _load_checkpoint(checkpoint_path)
+
+    batches = []
+    for entity in entities:
+        variables = [entity + "." + variable for variable in dictionary[entity]
+                     if entity + "." + variable not in categories]
+        batches.extend(variables[i:i + batch_size]
+                       for i in range(0, len(variables), batch_size))
+
+    import requests
+    import requests.adapters
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=max_workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    def fetch(variables):
+        return _request_categories(session, url_categories, variables)
+
+    try:
+        for _, batch_categories in run_concurrently(
+                fetch, batches, max_workers=max_workers, ordered=False,
+                **kwargs):
+            categories.update(batch_categories)
+            if checkpoint_path:
+                _save_json(categories, checkpoint_path)
+    finally:
+        session.close()
+
+    for entity in entities:
+        for variable in dictionary[entity]:
+            dictionary[entity][variable] = [
+                tuple(category)
+                for category in categories[entity + "." + variable]]
+
+
+def update_dictionary(dict_filename="cpv2010arg_diccionario.json", **kwargs):
+    """Scrape the dictionary again and replace its json in the data dir.
+
+    Categories are checkpointed next to the json (as dict_filename +
+    ".partial"), so calling it again after a failure resumes the scrape. The
+    checkpoint is removed once the json is replaced.
+
+    >>> changes = update_dictionary()  # doctest: +SKIP
+    >>> changes["changed"]  # doctest: +SKIP
+    ['PERSONA.P05']
+
+    Args:
+        dict_filename (str): Name of the json dictionary in the data dir.
+        **kwargs: Arguments of scrape_dictionary.
+
+    Returns:
+        dict: Variables "added", "removed" and "changed" compared with the
+            previous json (see dictionary.diff_dictionaries).
+    """
+    json_path = os.path.join(get_data_dir(), dict_filename)
+    checkpoint_path = json_path + ".partial"
+    dictionary = scrape_dictionary(checkpoint_path=checkpoint_path,
+                                   **kwargs)[0]
+
+    try:
+        with io.open(json_path, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+    except IOError:
+        previous = {}
+
+    _save_json(dictionary, json_path)
+    remove_file(checkpoint_path)
+    get_variable_dictionary.cache_clear()
+    get_validator.cache_clear()
+
+    return diff_dictionaries(previous, dictionary)
 
 
 # PRIVATE
-def _get_clickable_by_id(driver, element_id):
-    return WebDriverWait(driver, 20).until(
-        EC.element_to_be_clickable((By.ID, element_id)))
+def _get_cache(cache):
+    if cache is True:
+        return get_default_cache()
+    elif isinstance(cache, QueryCache):
+        return cache
+    return None
+
+
+def _check_shard_level(area_level, shard_level):
+    levels = get_geography().levels
+    if levels.index(shard_level) > levels.index(area_level):
+        raise ValueError(
+            "Results by {} can't be split in {} shards, each shard would "
+            "have part of an area.".format(area_level, shard_level))
+
+
+def _check_query(query, backend, validate):
+    if backend not in BACKENDS:
+        raise ValueError("{} is not a backend, use one of {}".format(
+            backend, BACKENDS))
+
+    if validate:
+        validator = get_validator() if validate is True else validate
+        validator.validate(query)
+
+
+def _get_http_client(url):
+    from .webengine import WebEngineClient
+
+    # clients are shared so connections to each server are kept alive
+    if url not in _http_clients:
+        _http_clients[url] = WebEngineClient(url)
+    return _http_clients[url]
+
+
+def _make_http_query(query, url):
+    return _get_http_client(url).run_program(query)
+
+
+def _make_browser_query(query, url, pool=None, wait=None, export_path=None):
+    expected_rows = _estimate_rows(query)
+
+    if pool is not None:
+        if pool.url != url:
+            raise ValueError(
+                "The pool browsers are parked on {}, not on {}. Use a pool "
+                "for that url (see make_pool).".format(pool.url, url))
+        with pool.driver() as driver:
+            return _submit_to_processor(driver, query, wait, expected_rows,
+                                        export_path)
+
+    from pyvirtualdisplay import Display
+
+    with stage("display"):
+        display = Display(visible=False)
+        display.start()
+
+    try:
+        with stage("browser"):
+            driver = firefox()
+        # quit on timeouts too, or every failed query leaves a Firefox open
+        try:
+            with stage("navigation"):
+                _go_to_processor(driver, url, wait)
+            html = _submit_to_processor(driver, query, wait, expected_rows,
+                                        export_path)
+        finally:
+            driver.quit()
+
+    finally:
+        display.stop()
+
+    return html
+
+
+def _go_to_processor(driver, url, wait=None):
+    """Navigate to the REDATAM processor and leave the driver on its frame."""
+    from selenium.webdriver.common.by import By
+
+    wait = wait or DEFAULT_WAIT
+
+    driver.get(url)
+
+    driver.switch_to.frame("Index")
+    info_gral = _get_clickable_by_id(driver, "ui-accordion-root-header-4",
+                                     wait)
+    info_gral.click()
+
+    id_progr_redatam = "ui-accordion-ui-accordion-root-panel-4-header-1"
+    progr_redatam = _get_clickable_by_id(driver, id_progr_redatam, wait)
+    progr_redatam.click()
+
+    id_redatam_panel = "ui-accordion-ui-accordion-root-panel-4-panel-1"
+    progr_redatam_panel = _get_clickable_by_id(driver, id_redatam_panel, wait)
+    procesador = progr_redatam_panel.find_element(By.TAG_NAME, "a")
+    procesador.click()
+
+    driver.switch_to.default_content()
+    # driver.switch_to.frame("Output")
+    _switch_to_loaded_frame(driver, "Output", wait)
+
+    # the textarea must be ready before the driver is considered parked
+    driver.find_element(By.TAG_NAME, "textarea")
 
 
-def _switch_to_loaded_frame(driver, frame_id):
-    return WebDriverWait(driver, 20).until(
-        EC.frame_to_be_available_and_switch_to_it((By.NAME, frame_id)))
+def _submit_to_processor(driver, query, wait=None, expected_rows=None,
+                         export_path=None):
+    """Submit a query from the processor frame and return the html result.
 
+    If export_path is given, the file of the export link of the result is
+    downloaded there and export_path is returned instead.
+    """
+    from selenium.webdriver.common.by import By
+    from .webengine import EXPORT_LINK_TEXT
+
+    wait = wait or DEFAULT_WAIT
+
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "ignore")
+
+    with stage("server") as record:
+        query_input = driver.find_element(By.TAG_NAME, "textarea")
+        query_input.send_keys(query)
+
+        submit = driver.find_element(By.NAME, "SUBMIT")
+        submit.click()
+
+        driver.switch_to.default_content()
+        # driver.switch_to.frame("Output")
+        _switch_to_loaded_frame(driver, "Output", wait, expected_rows)
+        # driver.switch_to.frame("grid")
+        _switch_to_loaded_frame(driver, "grid", wait, expected_rows)
+
+        wait.until_text("result", driver, "body > p > a:nth-child(1)",
+                        EXPORT_LINK_TEXT, expected_rows)
+
+        if export_path:
+            return _download_export(driver, export_path)
+
+        html = driver.page_source
+        record.bytes = len(html)
+
+    return html
+
+
+def _download_export(driver, path):
+    """Download the file of the export link with the cookies of the browser."""
+    import requests
+    from selenium.webdriver.common.by import By
+    from .webengine import EXPORT_LINK_TEXT, download
+
+    href = driver.find_element(By.LINK_TEXT, EXPORT_LINK_TEXT).get_attribute(
+        "href")
+
+    session = requests.Session()
+    for cookie in driver.get_cookies():
+        session.cookies.set(cookie["name"], cookie["value"])
+    try:
+        return download(session, href, path)
+    finally:
+        session.close()
+
+
+def _get_clickable_by_id(driver, element_id, wait):
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.common.exceptions import NoSuchElementException
+
+    condition = EC.element_to_be_clickable((By.ID, element_id))
+    return wait.until("navigation", lambda: condition(driver),
+                      ignored_exceptions=(NoSuchElementException,))
+
+
+def _switch_to_loaded_frame(driver, frame_id, wait, expected_rows=None):
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.common.exceptions import NoSuchElementException
+
+    condition = EC.frame_to_be_available_and_switch_to_it((By.NAME, frame_id))
+    return wait.until("frame", lambda: condition(driver), expected_rows,
+                      ignored_exceptions=(NoSuchElementException,))
+
+
+def _estimate_rows(query):
+    """Estimate the rows of the result of an Area List or Counter query."""
+    output_level = re.search(r"\bOF\s+(\w+)", query)
+    if not output_level or output_level.group(1) not in AREA_COUNTS:
+        return None
+    rows = AREA_COUNTS[output_level.group(1)]
+
+    selection = re.search(r"SELECTION INLINE,\s+(\w+) (.+)", query)
+    if selection and selection.group(1) in AREA_COUNTS:
+        selected = len(selection.group(2).split(","))
+        rows = max(rows * selected // AREA_COUNTS[selection.group(1)], 1)
+
+    return rows
+
+
+def _parse_html(html):
+    try:
+        return lxml.html.fromstring(html)
+    except ValueError:
+        # unicode strings with an encoding declaration must be parsed as bytes
+        return lxml.html.fromstring(html.encode("utf-8"))
+
+
+def _get_cells_text(row):
+    return ["".join(td.itertext()) for td in row.iterchildren("td")]
+
+
+def _iter_arealist_cells(source):
+    """Yield the text of the cells of the header and then of each data row.
+
+    As in parse_arealist_to_dataframe, the first row is the title of the
+    table, the second one the header and the last one is not data.
+    """
+    rows = lxml.etree.iterparse(source, events=("end",), tag="tr", html=True)
+
+    previous_cells = None
+    for index, (_, row) in enumerate(rows):
+        cells = _get_cells_text(row)
+
+        # free the memory of the rows already parsed
+        row.clear()
+        while row.getprevious() is not None:
+            del row.getparent()[0]
+
+        if index == 1:
+            yield cells
+        elif index > 2:
+            yield previous_cells
+        previous_cells = cells
 
-def _wait_until_text(driver, css_selector, text):
-    WebDriverWait(driver, 20).until(EC.text_to_be_present_in_element(
-        (By.CSS_SELECTOR, css_selector), text))
+
+def _build_arealist_dataframe(columns, cells):
+    """Build an Area List DataFrame from the text of its cells.
+
+    The first column has the area codes and the rest have integers with "."
+    as thousands separator, except for text columns like area names.
+    """
+    if not cells:
+        return pd.DataFrame(columns=columns)
+
+    cells = np.array(cells, dtype="U")
+    try:
+        values = np.char.replace(cells[:, 1:], ".", "").astype(np.int64)
+        df = pd.DataFrame(values, columns=columns[1:])
+    except ValueError:
+        df = pd.DataFrame(OrderedDict(
+            (column, _to_int_column(cells[:, i + 1]))
+            for i, column in enumerate(columns[1:])), columns=columns[1:])
+
+    df.insert(0, columns[0], cells[:, 0].astype(object))
+
+    return df
+
+
+def _to_int_column(texts):
+    try:
+        return np.char.replace(texts, ".", "").astype(np.int64)
+    except ValueError:
+        return texts.astype(object)
+
+
+def _to_number_column(texts):
+    """Convert texts like "1.234", "12,5" or "12,5 %" to numbers, if any."""
+    try:
+        return np.char.replace(texts, ".", "").astype(np.int64)
+    except ValueError:
+        pass
+
+    numbers = np.char.replace(np.char.replace(texts, ".", ""), ",", ".")
+    try:
+        return np.char.strip(np.char.rstrip(numbers, "% ")).astype(np.float64)
+    except ValueError:
+        return texts.astype(object)
+
+
+def _read_export_text(path, head, encoding=None):
+    """Read the cells of a text file exported by REDATAM as strings."""
+    if encoding is None:
+        try:
+            # a character may be cut at the end of the head
+            codecs.getincrementaldecoder("utf-8")().decode(head)
+            encoding = "utf-8"
+        except UnicodeDecodeError:
+            encoding = "latin-1"
+
+    lines = head.decode(encoding, "ignore").splitlines()
+    sep = max(EXPORT_SEPARATORS, key="\n".join(lines[:20]).count)
+
+    # the C parser needs the first line read to have every field
+    skiprows = next((i for i, line in enumerate(lines)
+                     if len(line.split(sep)) > 1), 0)
+    raw = pd.read_csv(path, sep=sep, skiprows=skiprows, header=None,
+                      dtype=object, encoding=encoding, keep_default_na=False)
+    return raw.fillna("").values.tolist()
+
+
+def _to_cell_text(value):
+    """Format a cell read from Excel like the text of an html cell."""
+    if isinstance(value, float) and value.is_integer():
+        return "{}".format(int(value))
+    if isinstance(value, float) and np.isnan(value):
+        return ""
+    return "{}".format(value)
+
+
+def _get_area_categories(codes, geography):
+    """Return every code of the level of codes, if they are all known."""
+    unique_codes = codes.unique()
+    try:
+        known_codes = geography.codes(geography.level(unique_codes[0]))
+    except (KeyError, IndexError):
+        return None
+
+    if known_codes and set(unique_codes).issubset(known_codes):
+        return known_codes
+    return None
+
+
+def _get_codes_level(codes, geography):
+    """Return the level of codes, if they are all codes of one level."""
+    unique_codes = codes.unique()
+    try:
+        levels = set(geography.level(code) for code in unique_codes)
+    except (KeyError, TypeError, AttributeError):
+        return None
+
+    return levels.pop() if len(levels) == 1 else None
+
+
+def _get_stripped_codes_level(codes):
+    """Return the level of area codes that may have lost their leading zero.
+
+    Only the first digit of a code can be a zero (eg. "02" or "06"
+    provinces), and code lengths of different levels differ in more than
+    one digit, so the level is the first one whose codes are at least as
+    long as the longest of codes.
+    """
+    lengths = [len(code) for code in codes if code.isdigit()]
+    if not lengths:
+        return None
+
+    for area_level, code_length in get_geography().code_lengths.items():
+        if code_length >= max(lengths):
+            return area_level
+    return None
+
+
+def _to_int_or_text(text):
+    try:
+        return int(text.replace(".", ""))
+    except ValueError:
+        return text
 
 
 def _parse_df_to_dict(df):
@@ -208,7 +1435,7 @@ def _parse_df_to_dict(df):
     last_entity = "0"
     entity_name = ""
     for row in df.iterrows():
-        entity, variable = unicode(row[1]["#"]).split(".")
+        entity, variable = "{}".format(row[1]["#"]).split(".")
 
         if entity != last_entity:
             # if the entity didn't have any "C" variables, is not geographical
@@ -260,3 +1487,57 @@ def _parse_categories(dictionary, text):
 
             dictionary[entity][variable].append(
                 (id_category.strip(), category.strip()))
+
+
+def _request_categories(session, url_categories, variables):
+    """Request the categories of some variables of the same entity.
+
+    Returns:
+        dict: Categories of each variable, by its full name.
+    """
+    data = {
+        "MAIN": "WebServerMain.inl",
+        "BASE": "CPV2010B",
+        "CODIGO": "xxUsuarioxx",
+        "ITEM": "DICCATVIV",
+        "MODE": "LISTVAR",
+        "DICTIONARY": "HTML",
+        "VARIABLE": variables,
+        "SUBMIT": "Ejecutar"
+    }
+
+    with stage("server") as record:
+        r = session.post(url_categories, data=data)
+        r.raise_for_status()
+        record.bytes = len(r.content)
+
+    from bs4 import BeautifulSoup
+
+    bs = BeautifulSoup(r.content, "html5lib")
+    text = bs.select("#redInput")[0].get_text()
+
+    entity = variables[0].split(".")[0]
+    dictionary = {entity: OrderedDict(
+        (variable.split(".", 1)[1], []) for variable in variables)}
+    _parse_categories(dictionary, text)
+
+    return {entity + "." + variable: categories
+            for variable, categories in dictionary[entity].items()}
+
+
+def _load_checkpoint(checkpoint_path):
+    if not checkpoint_path:
+        return {}
+    try:
+        with io.open(checkpoint_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+
+def _save_json(obj, path):
+    """Write a json file atomically, so a failure keeps the previous one."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(obj, f)
+    replace_file(tmp_path, path)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+dictionary.py
+
+Entities, variables and categories of a REDATAM database.
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import with_statement
+import os
+import io
+import json
+import pickle
+from collections import OrderedDict
+
+from .utils import replace_file
+
+SNAPSHOT_PROTOCOL = 2
+
+
+# PUBLIC
+class VariableDictionary(object):
+    """Lookups of entities, variables and categories of a database.
+
+    Categories of each variable are indexed by code when the dictionary is
+    created, so decoding a category is a dict lookup.
+
+    Args:
+        dictionary (dict): Categories of each variable of each entity, as
+            [code, label] pairs, like {"PERSONA": {"P02": [["1", "Varón"],
+            ["2", "Mujer"]], ...}, ...}.
+    """
+
+    def __init__(self, dictionary):
+        self.raw = dictionary
+        self._categories = OrderedDict()
+
+        for entity, variables in dictionary.items():
+            for variable, categories in variables.items():
+                self._categories[entity + "." + variable] = OrderedDict(
+                    (code, label) for code, label in categories)
+
+    @classmethod
+    def from_json(cls, json_path, snapshot_path=None):
+        """Load a dictionary from a json file.
+
+        Args:
+            json_path (str): Path of a json dictionary.
+            snapshot_path (str): Path of a pickle snapshot of the dictionary.
+                If it is older than the json it is (re)built, otherwise the
+                dictionary is loaded from it, which is faster.
+
+        Returns:
+            VariableDictionary: The dictionary.
+        """
+        if snapshot_path and _is_newer(snapshot_path, json_path):
+            try:
+                return cls.from_snapshot(snapshot_path)
+            except Exception:
+                pass
+
+        with io.open(json_path, "r", encoding="utf-8") as f:
+            variable_dictionary = cls(json.load(f))
+
+        if snapshot_path:
+            variable_dictionary.to_snapshot(snapshot_path)
+
+        return variable_dictionary
+
+    @classmethod
+    def from_snapshot(cls, snapshot_path):
+        with open(snapshot_path, "rb") as f:
+            return pickle.load(f)
+
+    def to_snapshot(self, snapshot_path):
+        """Save a pickle snapshot of the dictionary (see from_json)."""
+        tmp_path = snapshot_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(self, f, SNAPSHOT_PROTOCOL)
+        replace_file(tmp_path, snapshot_path)
+
+    def entities(self):
+        """Return the names of the entities."""
+        return list(self.raw.keys())
+
+    def variables(self, entity):
+        """Return the full names ("ENTITY.VARIABLE") of an entity variables."""
+        return [entity + "." + variable for variable in self.raw[entity]]
+
+    def categories(self, variable):
+        """Return the labels of the categories of a variable by code.
+
+        Args:
+            variable (str): Full name of a variable, like "PERSONA.P02".
+
+        Returns:
+            OrderedDict: Labels by category code.
+        """
+        return self._categories[variable]
+
+    def label(self, variable, code):
+        """Return the label of a category of a variable."""
+        return self._categories[variable][_to_code(code)]
+
+    def decode_categories(self, df, variable, column=None,
+                          categorical=False):
+        """Replace category codes of a DataFrame column by their labels.
+
+        >>> import pandas as pd
+        >>> dictionary = VariableDictionary(
+        ...     {"PERSONA": {"P02": [["1", "Varón"], ["2", "Mujer"]]}})
+        >>> df = pd.DataFrame({"P02": [2, 1, 2]})
+        >>> print(", ".join(dictionary.decode_categories(df, "PERSONA.P02")
+        ...                 ["P02"]))
+        Mujer, Varón, Mujer
+
+        Args:
+            df (pandas.DataFrame): Data with a column of category codes.
+            variable (str): Full name of the variable, like "PERSONA.P02".
+            column (str): Column to decode. By default, the one named as the
+                variable (with or without its entity).
+            categorical (bool): True to decode the column as a Categorical:
+                each label is kept once and the cells keep small integer
+                codes of the labels, instead of a string each.
+
+        Returns:
+            pandas.DataFrame: Copy of df with the column decoded. Codes
+                without a category are left as they are.
+        """
+        if column is None and variable in df.columns:
+            column = variable
+        elif column is None:
+            column = variable.split(".", 1)[-1]
+
+        categories = self._categories[variable]
+
+        df = df.copy()
+
+        # only distinct values are looked up, then mapped all at once
+        values = df[column]
+        if categorical:
+            values = values.astype("category")
+            df[column] = values.cat.rename_categories(
+                [categories.get(_to_code(value), value)
+                 for value in values.cat.categories])
+        else:
+            labels = {value: categories.get(_to_code(value), value)
+                      for value in values.unique()}
+            df[column] = values.map(labels)
+
+        return df
+
+    def __contains__(self, variable):
+        return variable in self._categories
+
+
+def diff_dictionaries(old, new):
+    """Compare the variables and categories of two raw dictionaries.
+
+    >>> changes = diff_dictionaries(
+    ...     {"PERSONA": {"P02": [["1", "Varón"], ["2", "Mujer"]]}},
+    ...     {"PERSONA": {"P02": [["1", "Varón"], ["2", "Mujeres"]],
+    ...                  "P03": []}})
+    >>> print(changes["added"][0], changes["changed"][0],
+    ...       len(changes["removed"]))
+    PERSONA.P03 PERSONA.P02 0
+
+    Args:
+        old (dict): Categories of each variable of each entity (see
+            VariableDictionary).
+        new (dict): Dictionary compared with old.
+
+    Returns:
+        dict: Full names of the variables "added" to new, "removed" from old
+            and whose categories "changed", each list sorted.
+    """
+    old_variables, new_variables = _flatten(old), _flatten(new)
+
+    return {
+        "added": sorted(set(new_variables) - set(old_variables)),
+        "removed": sorted(set(old_variables) - set(new_variables)),
+        "changed": sorted(variable for variable in new_variables
+                          if variable in old_variables and
+                          new_variables[variable] != old_variables[variable])
+    }
+
+
+# PRIVATE
+def _flatten(dictionary):
+    """Return the categories of each variable as a list of (code, label)."""
+    return {entity + "." + variable: [tuple(category)
+                                      for category in categories]
+            for entity, variables in dictionary.items()
+            for variable, categories in variables.items()}
+
+
+def _to_code(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return "{}".format(value)
+
+
+def _is_newer(path, other_path):
+    try:
+        return os.path.getmtime(path) >= os.path.getmtime(other_path)
+    except OSError:
+        return False
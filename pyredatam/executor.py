@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+executor.py
+
+Run many calls concurrently with bounded parallelism and retries.
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import with_statement
+import time
+import threading
+from multiprocessing.pool import ThreadPool
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 1.0
+
+
+# PUBLIC
+def run_concurrently(func, items, max_workers=DEFAULT_MAX_WORKERS,
+                     ordered=True, retries=DEFAULT_RETRIES,
+                     backoff=DEFAULT_BACKOFF, limit_key=None, max_per_key=None,
+                     return_exceptions=False):
+    """Call func on every item using a pool of threads.
+
+    Args:
+        func (callable): Function called as func(item).
+        items (iterable): Arguments for each call.
+        max_workers (int): Max number of calls running at the same time.
+        ordered (bool): True to yield results in the order of items, False to
+            yield them as soon as they are completed.
+        retries (int): Times a failed call is retried.
+        backoff (float): Seconds to wait before the first retry. The wait is
+            doubled on each following retry.
+        limit_key (callable): Function called as limit_key(item) returning the
+            group of the call (eg. a server), to limit concurrency per group.
+        max_per_key (int): Max number of calls of the same group running at
+            the same time.
+        return_exceptions (bool): True to yield the exception of a call that
+            failed after every retry instead of raising it.
+
+    Yields:
+        (int, object): Index of the item and result of its call.
+    """
+    semaphores = None
+    if limit_key and max_per_key:
+        semaphores = KeyedSemaphores(max_per_key)
+
+    def call_limited(item):
+        # the semaphore is not held while waiting to retry
+        with semaphores.get(limit_key(item)):
+            return func(item)
+
+    def call(indexed_item):
+        index, item = indexed_item
+        try:
+            result = call_with_retries(call_limited if semaphores else func,
+                                       item, retries, backoff)
+            return index, result, None
+        except Exception as e:
+            return index, None, e
+
+    pool = ThreadPool(max_workers)
+    try:
+        imap = pool.imap if ordered else pool.imap_unordered
+        for index, result, error in imap(call, enumerate(items)):
+            if error is not None and not return_exceptions:
+                raise error
+            yield index, error if error is not None else result
+    finally:
+        pool.terminate()
+
+
+def call_with_retries(func, item, retries=DEFAULT_RETRIES,
+                      backoff=DEFAULT_BACKOFF):
+    """Call func(item), retrying it with exponential backoff if it fails."""
+
+    for attempt in range(retries + 1):
+        try:
+            return func(item)
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+
+class KeyedSemaphores(object):
+    """Bounded semaphores, one for each key, created when first used."""
+
+    def __init__(self, value):
+        self.value = value
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._semaphores:
+                self._semaphores[key] = threading.BoundedSemaphore(self.value)
+            return self._semaphores[key]
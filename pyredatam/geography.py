@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+geography.py
+
+Index of the geographical areas of a REDATAM database.
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import with_statement
+import difflib
+import unicodedata
+from collections import OrderedDict
+
+NAME_SEPARATOR = " - "
+
+
+# PUBLIC
+class GeographyIndex(object):
+    """Lookups of areas by code, name and position in the hierarchy.
+
+    Area codes are hierarchical: the code of an area starts with the code of
+    its parent. Every lookup is done on dicts built once, when the index is
+    created.
+
+    Args:
+        ids (dict): Names of the areas of each level by code, like
+            {"PROV": {"02": "Ciudad Autónoma de Buenos Aires", ...}, ...}.
+        levels (list): (area level, code length) tuples, from the coarsest to
+            the finest level. Levels not in ids have no known areas, but their
+            codes are still recognized by their length.
+    """
+
+    def __init__(self, ids, levels):
+        self.levels = [level for level, _ in levels]
+        self.code_lengths = OrderedDict(levels)
+
+        self._names = {}
+        self._levels = {}
+        self._children = {}
+        self._codes_by_level = OrderedDict()
+        self._codes_by_name = {}
+
+        for level in self.levels:
+            codes = sorted(ids.get(level, {}).keys())
+            self._codes_by_level[level] = codes
+
+            for code in codes:
+                name = ids[level][code]
+                self._names[code] = name
+                self._levels[code] = level
+                self._children[code] = []
+
+                for key in _name_keys(name):
+                    self._codes_by_name.setdefault(key, []).append(code)
+
+                parent = self.parent(code)
+                if parent in self._children:
+                    self._children[parent].append(code)
+
+    def name(self, code):
+        """Return the name of an area."""
+        return self._names[code]
+
+    def code(self, name, level=None):
+        """Return the code of an area by its name (case and accents ignored).
+
+        Args:
+            name (str): Name of the area. Departments may be named by their
+                own name or as "Province - Department".
+            level (str): Level of the area, to solve ambiguous names.
+
+        Returns:
+            str: Code of the area.
+        """
+        named_codes = self._codes_by_name.get(_normalize(name), [])
+        codes = [code for code in named_codes
+                 if level is None or self._levels[code] == level]
+
+        if not codes:
+            raise KeyError("No area is named {}".format(name))
+        if len(codes) > 1:
+            raise KeyError("{} is the name of many areas: {}".format(
+                name, ", ".join(codes)))
+
+        return codes[0]
+
+    def level(self, code):
+        """Return the level of an area code."""
+        if code in self._levels:
+            return self._levels[code]
+
+        for level, code_length in self.code_lengths.items():
+            if len(code) == code_length and code.isdigit():
+                return level
+
+        raise KeyError("{} is not an area code".format(code))
+
+    def parent(self, code):
+        """Return the code of the parent of an area (None for the top one)."""
+        depth = self.levels.index(self.level(code))
+        if depth == 0:
+            return None
+        return code[:self.code_lengths[self.levels[depth - 1]]]
+
+    def children(self, code, level=None):
+        """Return the codes of the areas inside an area.
+
+        Args:
+            code (str): Code of an area.
+            level (str): Level of the areas returned. By default, the level
+                next to the level of the area.
+
+        Returns:
+            list: Codes of the areas, sorted.
+        """
+        depth = self.levels.index(self.level(code))
+        level = level or self.levels[depth + 1]
+
+        if self.levels.index(level) <= depth:
+            raise ValueError("{} areas are not inside {} areas".format(
+                level, self.level(code)))
+
+        codes = [code]
+        for child_level in self.levels[depth + 1:]:
+            if not self._codes_by_level[child_level]:
+                raise ValueError(
+                    "Codes of {} areas are not known.".format(child_level))
+            codes = [child for parent in codes
+                     for child in self._children[parent]]
+            if child_level == level:
+                return codes
+
+    def codes(self, level):
+        """Return the codes of every known area of a level, sorted."""
+        return list(self._codes_by_level[level])
+
+    def search(self, text, level=None, fuzzy=False, limit=10):
+        """Find areas whose name starts with text, or is similar to it.
+
+        Args:
+            text (str): Beginning of the name (case and accents ignored).
+            level (str): Only return areas of this level.
+            fuzzy (bool): True to return the areas with the closest names
+                instead of the ones starting with text.
+            limit (int): Max number of areas returned.
+
+        Returns:
+            list: Codes of the areas found.
+        """
+        text = _normalize(text)
+
+        if fuzzy:
+            keys = difflib.get_close_matches(
+                text, self._codes_by_name.keys(), n=limit, cutoff=0.6)
+        else:
+            keys = sorted(key for key in self._codes_by_name
+                          if key.startswith(text))
+
+        codes = []
+        for key in keys:
+            for code in self._codes_by_name[key]:
+                if code not in codes and (level is None or
+                                          self._levels[code] == level):
+                    codes.append(code)
+
+        return codes[:limit]
+
+    def expand_area_filter(self, area_filter):
+        """Replace names and parent codes of an area filter by area codes.
+
+        Args:
+            area_filter (dict): Geographical area/s where results are asked,
+                like {"DPTO": ["Córdoba", "06007"]}. Areas may be codes or
+                names of areas of the filter level or of coarser levels, which
+                are expanded into their children.
+
+        Returns:
+            dict: Area filter with only codes of the filter level.
+
+        >>> index = GeographyIndex({"PROV": {"02": "Capital"},
+        ...                         "DPTO": {"02001": "Capital - Comuna 1",
+        ...                                  "02002": "Capital - Comuna 2"}},
+        ...                        [("PROV", 2), ("DPTO", 5)])
+        >>> area_filter = index.expand_area_filter({"DPTO": "capital"})
+        >>> print(", ".join(area_filter["DPTO"]))
+        02001, 02002
+        """
+        if not area_filter:
+            return area_filter
+
+        level, areas = list(area_filter.items())[0]
+        if not isinstance(areas, list):
+            areas = [areas]
+
+        codes = []
+        for area in areas:
+            code = area if self._is_code(area) else self.code(area)
+            area_level = self.level(code)
+            if area_level == level:
+                codes.append(code)
+            else:
+                codes.extend(self.children(code, level))
+
+        return {level: codes}
+
+    def __contains__(self, code):
+        return code in self._names
+
+    def _is_code(self, area):
+        try:
+            self.level(area)
+            return True
+        except KeyError:
+            return False
+
+
+# PRIVATE
+def _normalize(name):
+    if isinstance(name, bytes):
+        name = name.decode("utf-8")
+    decomposed = unicodedata.normalize("NFKD", name)
+    return "".join(char for char in decomposed
+                   if not unicodedata.combining(char)).lower().strip()
+
+
+def _name_keys(name):
+    """Normalized names an area can be found by."""
+    keys = [_normalize(name)]
+    if NAME_SEPARATOR in name:
+        keys.append(_normalize(name.split(NAME_SEPARATOR, 1)[1]))
+    return keys
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+instrumentation.py
+
+Timing of the stages of a query (browser launch, server processing, parsing,
+etc.) reported to listeners and traces.
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import with_statement
+import time
+import logging
+import threading
+from collections import namedtuple, OrderedDict
+from contextlib import contextmanager
+
+StageEvent = namedtuple("StageEvent",
+                        ["stage", "duration", "bytes", "rows", "failed"])
+
+_listeners = []
+_local = threading.local()
+
+
+# PUBLIC
+def add_listener(listener):
+    """Call listener(event) with the StageEvent of every stage completed.
+
+    Listeners are called from the thread that ran the stage.
+    """
+    _listeners.append(listener)
+
+
+def remove_listener(listener):
+    _listeners.remove(listener)
+
+
+@contextmanager
+def stage(name):
+    """Time a stage of a query and report it.
+
+    The yielded record may be given the bytes and rows handled by the stage.
+
+    >>> with trace() as query_trace:
+    ...     with stage("parse") as record:
+    ...         record.rows = 10
+    >>> print(query_trace.events[0].stage, query_trace.events[0].rows)
+    parse 10
+    """
+    record = _StageRecord()
+    start = time.time()
+    failed = False
+    try:
+        yield record
+    except Exception:
+        failed = True
+        raise
+    finally:
+        if _listeners or _get_traces():
+            _emit(StageEvent(name, time.time() - start, record.bytes,
+                             record.rows, failed))
+
+
+@contextmanager
+def trace():
+    """Collect the events of the stages run by the current thread.
+
+    >>> with trace() as query_trace:  # doctest: +SKIP
+    ...     make_arealist_query(query)
+    >>> query_trace.durations()  # doctest: +SKIP
+    OrderedDict([('display', 0.2), ('browser', 4.1), ('navigation', 3.5),
+                 ('server', 12.0), ('parse', 0.1)])
+
+    Yields:
+        Trace: Events collected until the block exits.
+    """
+    query_trace = Trace()
+    traces = _get_traces()
+    traces.append(query_trace)
+    try:
+        yield query_trace
+    finally:
+        traces.remove(query_trace)
+
+
+class Trace(object):
+    """Events of the stages run inside a trace block."""
+
+    def __init__(self):
+        self.events = []
+
+    def durations(self):
+        """Return the seconds spent in each stage (added up if repeated)."""
+        durations = OrderedDict()
+        for event in self.events:
+            durations[event.stage] = (durations.get(event.stage, 0) +
+                                      event.duration)
+        return durations
+
+    def total(self):
+        return sum(event.duration for event in self.events)
+
+    def slowest(self):
+        """Return the event of the stage that took longer."""
+        return max(self.events, key=lambda event: event.duration)
+
+
+class LoggingListener(object):
+    """Log every stage event.
+
+    Args:
+        logger (logging.Logger): Logger used. By default, "pyredatam".
+        level (int): Logging level of the messages.
+    """
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger or logging.getLogger("pyredatam")
+        self.level = level
+
+    def __call__(self, event):
+        self.logger.log(
+            self.level, "stage=%s duration=%.3fs bytes=%s rows=%s failed=%s",
+            event.stage, event.duration, event.bytes, event.rows, event.failed)
+
+
+class Counters(object):
+    """Accumulate calls, seconds, bytes, rows and failures of each stage.
+
+    >>> counters = Counters()
+    >>> add_listener(counters)
+    >>> with stage("server") as record:
+    ...     record.bytes = 2048
+    >>> remove_listener(counters)
+    >>> print(counters.render().splitlines()[8])
+    pyredatam_stage_bytes_total{stage="server"} 2048
+    """
+
+    METRICS = [("calls", "Times each stage was run."),
+               ("seconds", "Seconds spent in each stage."),
+               ("bytes", "Bytes received or parsed in each stage."),
+               ("rows", "Rows parsed in each stage."),
+               ("failures", "Times each stage failed.")]
+
+    def __init__(self, prefix="pyredatam_stage"):
+        self.prefix = prefix
+        self.values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            values = self.values.setdefault(
+                event.stage, OrderedDict((metric, 0)
+                                         for metric, _ in self.METRICS))
+            values["calls"] += 1
+            values["seconds"] += event.duration
+            values["bytes"] += event.bytes or 0
+            values["rows"] += event.rows or 0
+            values["failures"] += 1 if event.failed else 0
+
+    def render(self):
+        """Return the counters in Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for metric, description in self.METRICS:
+                name = "{}_{}_total".format(self.prefix, metric)
+                lines.append("# HELP {} {}".format(name, description))
+                lines.append("# TYPE {} counter".format(name))
+                for stage_name, values in self.values.items():
+                    lines.append('{}{{stage="{}"}} {}'.format(
+                        name, stage_name, values[metric]))
+
+        return "\n".join(lines)
+
+
+# PRIVATE
+class _StageRecord(object):
+
+    def __init__(self):
+        self.bytes = None
+        self.rows = None
+
+
+def _get_traces():
+    if not hasattr(_local, "traces"):
+        _local.traces = []
+    return _local.traces
+
+
+def _emit(event):
+    for query_trace in _get_traces():
+        query_trace.events.append(event)
+
+    for listener in list(_listeners):
+        try:
+            listener(event)
+        except Exception:
+            logging.getLogger("pyredatam").exception(
+                "Listener %r failed", listener)
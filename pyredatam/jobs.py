@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+jobs.py
+
+Manifests of jobs made of many queries, to resume them re-running only the
+queries that failed, are missing or changed.
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import with_statement
+import os
+import io
+import json
+import time
+from collections import OrderedDict
+import pandas as pd
+
+from .cache import make_key
+from .utils import makedirs, remove_file, replace_file, safe_filename
+from .executor import run_concurrently
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+
+# PUBLIC
+class JobError(Exception):
+    """Some queries of a job failed (the rest are kept in its manifest)."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super(JobError, self).__init__(
+            "{} queries of the job failed: {}".format(
+                len(errors), "; ".join("{}: {}".format(shard_id, error)
+                                       for shard_id, error in
+                                       errors.items())))
+
+
+class JobManifest(object):
+    """Record of the queries of a job, their status and their results.
+
+    Each query of the job is a shard with an id (eg. the areas it asks for).
+    The manifest keeps the hash of its query, its status ("pending", "done"
+    or "failed") and the file where its result is, and is saved as a json
+    file after every change. Results are pickled DataFrames in a directory
+    next to the manifest, named after their shard id and query hash.
+
+    A shard has to be run if it is not done, if its result file is missing
+    or if its query changed since it was run, so a job interrupted or with
+    failed queries is finished running only those shards again.
+
+    Args:
+        path (str): Path of the json manifest. It is loaded if it exists.
+        url (str): Url of the server, part of the hash of the queries.
+    """
+
+    def __init__(self, path, url=""):
+        self.path = path
+        self.url = url
+        self.results_dir = os.path.splitext(path)[0] + "_results"
+        self.shards = OrderedDict()
+
+        try:
+            with io.open(path, "r", encoding="utf-8") as f:
+                self.shards = json.load(f, object_pairs_hook=OrderedDict)
+        except IOError:
+            pass
+
+    def plan(self, queries):
+        """Set the queries of the job, keeping the results still valid.
+
+        Shards whose query changed are set as pending and shards not in
+        queries are removed with their results.
+
+        Args:
+            queries (dict): Query of each shard id. An OrderedDict keeps the
+                order of the shards in the result of read.
+
+        Returns:
+            list: Ids of the shards that have to be run (see pending).
+        """
+        for shard_id in list(self.shards):
+            if shard_id not in queries:
+                self._remove_result(shard_id)
+                del self.shards[shard_id]
+
+        shards = OrderedDict()
+        for shard_id, query in queries.items():
+            query_hash = make_key(query, self.url)
+            shard = self.shards.get(shard_id)
+            if shard is None or shard["hash"] != query_hash:
+                if shard is not None:
+                    self._remove_result(shard_id)
+                shard = {"hash": query_hash, "query": query,
+                         "status": PENDING, "result": None, "error": None,
+                         "updated": time.time()}
+            shards[shard_id] = shard
+
+        self.shards = shards
+        self.save()
+
+        return self.pending()
+
+    def pending(self):
+        """Return the ids of the shards not done or whose result is missing."""
+        return [shard_id for shard_id, shard in self.shards.items()
+                if shard["status"] != DONE or
+                not os.path.exists(self._result_path(shard))]
+
+    def failed(self):
+        """Return the ids of the shards whose last run failed."""
+        return [shard_id for shard_id, shard in self.shards.items()
+                if shard["status"] == FAILED]
+
+    def invalidate(self, shard_ids=None):
+        """Set shards as pending, so they are run again (by default, all)."""
+        for shard_id in shard_ids or list(self.shards):
+            self._remove_result(shard_id)
+            self.shards[shard_id].update(status=PENDING, result=None,
+                                         updated=time.time())
+        self.save()
+
+    def set_done(self, shard_id, df):
+        """Store the result of a shard and set it as done."""
+        shard = self.shards[shard_id]
+        makedirs(self.results_dir)
+
+        # shards may have the same query, so the id is part of the name
+        filename = "{}-{}.pickle".format(safe_filename(shard_id),
+                                         shard["hash"])
+        tmp_path = os.path.join(self.results_dir, filename + ".tmp")
+        df.to_pickle(tmp_path)
+        replace_file(tmp_path, os.path.join(self.results_dir, filename))
+
+        shard.update(status=DONE, result=filename, error=None,
+                     updated=time.time())
+        self.save()
+
+    def set_failed(self, shard_id, error):
+        self.shards[shard_id].update(status=FAILED, error="{}".format(error),
+                                     updated=time.time())
+        self.save()
+
+    def read(self, shard_ids=None):
+        """Return the results of shards (by default, all) in their order.
+
+        Raises:
+            ValueError: If any of the shards has to be run.
+        """
+        shard_ids = list(self.shards) if shard_ids is None else shard_ids
+        not_done = set(self.pending()) & set(shard_ids)
+        if not_done:
+            raise ValueError("Shards {} are not done".format(
+                ", ".join(sorted(not_done))))
+
+        return [pd.read_pickle(self._result_path(self.shards[shard_id]))
+                for shard_id in shard_ids]
+
+    def run(self, fetch, max_workers=4, **kwargs):
+        """Run the shards that have to be run, recording their status.
+
+        Args:
+            fetch (callable): Called as fetch(query) returning the DataFrame
+                result of a shard.
+            max_workers (int): Shards run at the same time.
+            **kwargs: Arguments of executor.run_concurrently (eg. retries).
+
+        Returns:
+            list: Ids of the shards run.
+
+        Raises:
+            JobError: If any shard failed after its retries. Every other
+                shard run is recorded as done.
+        """
+        to_run = self.pending()
+        queries = [self.shards[shard_id]["query"] for shard_id in to_run]
+
+        errors = OrderedDict()
+        for index, result in run_concurrently(
+                fetch, queries, max_workers=max_workers, ordered=False,
+                return_exceptions=True, **kwargs):
+            if isinstance(result, Exception):
+                self.set_failed(to_run[index], result)
+                errors[to_run[index]] = result
+            else:
+                self.set_done(to_run[index], result)
+
+        if errors:
+            raise JobError(errors)
+
+        return to_run
+
+    def save(self):
+        """Write the manifest atomically, so a crash keeps the previous one."""
+        makedirs(os.path.dirname(os.path.abspath(self.path)))
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.shards, f, indent=1)
+        replace_file(tmp_path, self.path)
+
+    def __len__(self):
+        return len(self.shards)
+
+    def _result_path(self, shard):
+        return os.path.join(self.results_dir, shard["result"] or "")
+
+    def _remove_result(self, shard_id):
+        if self.shards[shard_id]["result"]:
+            remove_file(self._result_path(self.shards[shard_id]))
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+metadata.py
+
+Areas and dictionary of 2010 Argentina's Census. Loading them needs neither
+pandas nor the query backends, so query builders can use them cheaply.
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import with_statement
+import os
+import json
+
+from .utils import get_data_dir, memoize
+from .geography import GeographyIndex
+from .dictionary import VariableDictionary
+
+AREA_LEVELS = [("PROV", 2), ("DPTO", 5), ("FRAC", 7), ("RADIO", 9)]
+
+
+# PUBLIC
+def get_dictionary(dict_filename="cpv2010arg_diccionario.json"):
+    """Return a copy of the raw dictionary, safe to modify."""
+    raw = get_variable_dictionary(dict_filename).raw
+    return {entity: {variable: [list(category) for category in categories]
+                     for variable, categories in variables.items()}
+            for entity, variables in raw.items()}
+
+
+@memoize
+def get_variable_dictionary(dict_filename="cpv2010arg_diccionario.json",
+                            snapshot_path=None):
+    """Return the entities, variables and categories of ARG 2010 Census.
+
+    The dictionary is loaded the first time and shared by every later call.
+
+    >>> dictionary = get_variable_dictionary()
+    >>> print(dictionary.label("PERSONA.CONDACT", 1))
+    Ocupado
+
+    Args:
+        dict_filename (str): Name of the json dictionary in the data dir.
+        snapshot_path (str): Path of a pickle snapshot to load the dictionary
+            faster (see VariableDictionary.from_json).
+
+    Returns:
+        VariableDictionary: Lookups of variables and categories.
+    """
+    return VariableDictionary.from_json(
+        os.path.join(get_data_dir(), dict_filename), snapshot_path)
+
+
+def get_ids(ids_filename="cpv2010arg_ids.json"):
+    return {level: dict(names)
+            for level, names in _load_ids(ids_filename).items()}
+
+
+@memoize
+def get_geography(ids_filename="cpv2010arg_ids.json"):
+    """Return an index of the geographical areas of ARG 2010 Census.
+
+    The index is built the first time and shared by every later call.
+
+    >>> geography = get_geography()
+    >>> print(geography.name(geography.code("Tulumba")))
+    Córdoba - Tulumba
+    >>> len(geography.children("14"))
+    26
+
+    Returns:
+        GeographyIndex: Lookups of areas by code, name and hierarchy.
+    """
+    return GeographyIndex(_load_ids(ids_filename), AREA_LEVELS)
+
+
+# PRIVATE
+@memoize
+def _load_ids(ids_filename):
+    with open(os.path.join(get_data_dir(), ids_filename), "r") as f:
+        return json.load(f)
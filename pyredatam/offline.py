@@ -0,0 +1,424 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+offline.py
+
+Run the REDATAM queries generated by pyredatam over local microdata, without
+a REDATAM server.
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import with_statement
+import os
+import re
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+from .sharding import merge_arealist_results
+
+CODE_COLUMN = "Código"
+NAME_COLUMN = "Nombre"
+MEDIAN_COLUMN = "Mediana"
+MEAN_COLUMN = "Media"
+
+_TOKENS = re.compile(r"""\s*(?:
+    (?P<number>\d+(?:\.\d+)?) |
+    (?P<string>"[^"]*"|'[^']*') |
+    (?P<op><>|<=|>=|=|<|>) |
+    (?P<paren>[()]) |
+    (?P<name>[A-Za-z_][\w.]*)
+)""", re.VERBOSE)
+
+_COMPARISONS = {
+    "=": lambda a, b: a == b,
+    "<>": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    ">": lambda a, b: a > b,
+    "<=": lambda a, b: a <= b,
+    ">=": lambda a, b: a >= b
+}
+
+
+# PUBLIC
+class OfflineEngine(object):
+    """Evaluate REDATAM programs over microdata of entities in DataFrames.
+
+    Each entity (eg. "VIVIENDA", "HOGAR", "PERSONA") is a DataFrame with one
+    row by instance, a column with the code of the smallest area where it is
+    (area_column) and a column by variable, named as the variable without the
+    entity (eg. "CONDACT" for "PERSONA.CONDACT"). Variables of a parent entity
+    are reached through a column named as the parent entity, holding the
+    value of the column with that name of the parent DataFrame (eg. the
+    "HOGAR" column of PERSONA and HOGAR).
+
+    The subset of REDATAM generated by pyredatam is supported: SELECTION
+    INLINE, UNIVERSE comparisons joined with AND, OR and NOT, DEFINE ... AS
+    COUNT, AREALIST tables (with area names and TOTAL) and MEDIAN and
+    AVERAGE tables (with BY, COMPLETENAME and AREABREAK).
+
+    Args:
+        entities (dict): DataFrame of each entity, by entity name.
+        levels (list): Tuples with the name and the code length of each area
+            level, from the largest to the smallest.
+        area_column (str): Column of every entity with area codes of the
+            smallest level. By default, the name of the smallest level.
+        geography (GeographyIndex): Index used for area names.
+        dictionary (VariableDictionary): Dictionary used for category labels.
+    """
+
+    def __init__(self, entities, levels, area_column=None, geography=None,
+                 dictionary=None):
+        self.entities = entities
+        self.code_lengths = OrderedDict(levels)
+        self.area_column = area_column or levels[-1][0]
+        self.geography = geography
+        self.dictionary = dictionary
+
+    @classmethod
+    def from_parquet(cls, data_dir, levels, **kwargs):
+        """Load the entities from ENTITY.parquet files of a directory."""
+        entities = {}
+        for filename in sorted(os.listdir(data_dir)):
+            entity, ext = os.path.splitext(filename)
+            if ext == ".parquet":
+                entities[entity.upper()] = pd.read_parquet(
+                    os.path.join(data_dir, filename))
+
+        return cls(entities, levels, **kwargs)
+
+    def run(self, query):
+        """Run a REDATAM query and return the result of its first table.
+
+        Returns:
+            pandas.DataFrame: Result with the same layout as the one parsed
+                from the REDATAM server (see
+                cpv2010arg.parse_arealist_to_dataframe).
+        """
+        return self.run_program(query)[0]
+
+    def run_program(self, program):
+        """Run a REDATAM program and return the result of each table.
+
+        Returns:
+            list: pandas.DataFrame of each table, in the order of the program.
+        """
+        parsed = parse_program(program)
+        results = []
+
+        for table in parsed["tables"]:
+            if table["type"] == "AREALIST":
+                results.append(self._run_arealist(table, parsed))
+            elif table["type"] == "MEDIAN":
+                results.append(self._run_summary(table, parsed, "median",
+                                                 MEDIAN_COLUMN))
+            elif table["type"] == "AVERAGE":
+                results.append(self._run_summary(table, parsed, "mean",
+                                                 MEAN_COLUMN))
+            else:
+                raise ValueError("{} tables are not supported offline".format(
+                    table["type"]))
+
+        return results
+
+    def _run_arealist(self, table, parsed):
+        area_level = table["of"][0]
+        columns = OrderedDict()
+        areas = None
+
+        for variable in table["of"][1:]:
+            if variable == "{0}.NOM{0}".format(area_level):
+                continue
+
+            if variable in parsed["defines"]:
+                counted = parsed["defines"][variable]
+                counts = self._count(counted, area_level, parsed)
+                columns[variable] = counts
+            else:
+                entity, name = variable.split(".", 1)
+                df = self._select(entity, parsed)
+                counts = pd.crosstab(self._area_codes(df, area_level),
+                                     df[name])
+                for value in counts.columns:
+                    columns[self._label(variable, value)] = counts[value]
+
+            areas = counts.index if areas is None else areas.union(
+                counts.index)
+
+        if areas is None:
+            areas = pd.Index([], dtype=object)
+
+        df = pd.DataFrame(OrderedDict(
+            (column, values.reindex(areas).fillna(0).astype(np.int64))
+            for column, values in columns.items()), index=areas)
+        df.index.name = CODE_COLUMN
+        df = df.reset_index()
+
+        if "{0}.NOM{0}".format(area_level) in table["of"]:
+            df.insert(1, NAME_COLUMN, [self._area_name(code)
+                                       for code in df[CODE_COLUMN]])
+
+        return merge_arealist_results([df], incl_total=table["total"])
+
+    def _run_summary(self, table, parsed, function, column):
+        entity, name = table["of"][0].split(".", 1)
+        df = self._select(entity, parsed)
+
+        keys = []
+        if table["areabreak"]:
+            keys.append(self._area_codes(df, table["areabreak"]).rename(
+                CODE_COLUMN))
+        for variable in table["by"]:
+            values = self._values(df, entity, variable)
+            if table["completename"]:
+                values = values.map(lambda value, variable=variable:
+                                    self._label(variable, value))
+            keys.append(values.rename(variable))
+
+        if not keys:
+            return pd.DataFrame({column: [df[name].agg(function)]},
+                                index=pd.Index(["Total"], name=CODE_COLUMN))
+
+        return df[name].groupby(keys).agg(function).to_frame(column)
+
+    def _count(self, counted, area_level, parsed):
+        """Count instances of an entity, or smaller areas, by area."""
+        if counted in self.code_lengths:
+            # areas are counted if any instance is there, whatever the universe
+            areas = pd.concat([
+                self._area_codes(self._select(entity, parsed, False), counted)
+                for entity in self.entities], ignore_index=True)
+            areas = areas.drop_duplicates()
+            return areas.groupby(
+                areas.str[:self.code_lengths[area_level]]).size()
+
+        df = self._select(counted, parsed)
+        return self._area_codes(df, area_level).value_counts().sort_index()
+
+    def _select(self, entity, parsed, universe=True):
+        """Return the instances of an entity in the selection and universe."""
+        df = self.entities[entity]
+
+        if parsed["selection"]:
+            level, codes = parsed["selection"]
+            df = df[self._area_codes(df, level).isin(codes)]
+
+        if universe and parsed["universe"]:
+            mask = evaluate_universe(parsed["universe"],
+                                     lambda variable: self._values(
+                                         df, entity, variable))
+            if isinstance(mask, bool):
+                df = df if mask else df.iloc[0:0]
+            else:
+                df = df[mask]
+
+        return df
+
+    def _values(self, df, entity, variable):
+        """Return the values of a variable for each instance of an entity."""
+        variable_entity, name = variable.split(".", 1)
+        if variable_entity == entity:
+            return df[name]
+
+        if variable_entity not in df.columns:
+            raise ValueError("{} is not reachable from {}".format(
+                variable, entity))
+
+        parent = self.entities[variable_entity].set_index(variable_entity)
+        return df[variable_entity].map(parent[name])
+
+    def _area_codes(self, df, level):
+        codes = df[self.area_column].astype(str)
+        return codes.str[:self.code_lengths[level]]
+
+    def _label(self, variable, value):
+        if self.dictionary is not None:
+            try:
+                return self.dictionary.label(variable, value)
+            except KeyError:
+                pass
+        return "{}".format(value)
+
+    def _area_name(self, code):
+        if self.geography is None:
+            raise ValueError("A geography is needed to get area names")
+        return self.geography.name(code)
+
+
+def parse_program(program):
+    """Parse the REDATAM program sections generated by pyredatam.
+
+    Returns:
+        dict: "selection" (tuple of area level and codes, or None),
+            "universe" (expression or None), "defines" (counted entity by
+            variable) and "tables" (list of dicts describing each table).
+    """
+    parsed = {"selection": None, "universe": None, "defines": OrderedDict(),
+              "tables": []}
+    lines = [line.strip() for line in program.splitlines()]
+    define = table = None
+
+    for index, line in enumerate(lines):
+        words = line.split()
+        if not words:
+            continue
+        keyword = words[0].upper()
+
+        if keyword == "SELECTION":
+            level, codes = lines[index + 1].split(None, 1)
+            parsed["selection"] = (level, [code.strip()
+                                           for code in codes.split(",")])
+        elif keyword == "UNIVERSE":
+            parsed["universe"] = line.split(None, 1)[1]
+        elif keyword == "DEFINE":
+            define, table = words[1], None
+        elif keyword == "TABLE":
+            table = {"name": words[1], "title": None, "type": None, "of": [],
+                     "by": [], "completename": False, "areabreak": None,
+                     "total": False}
+            parsed["tables"].append(table)
+            define = None
+        elif keyword == "AS" and define and words[1].upper() == "COUNT":
+            parsed["defines"][define] = words[2]
+        elif keyword == "AS" and table:
+            table["type"] = words[1].upper()
+        elif keyword == "TITLE" and table:
+            table["title"] = line.split(None, 1)[1].strip('"')
+        elif keyword == "OF" and table:
+            table["of"] = [word.strip() for word in
+                           line.split(None, 1)[1].split(",")]
+        elif keyword == "BY" and table:
+            table["by"].append(words[1])
+        elif keyword == "COMPLETENAME" and table:
+            table["completename"] = True
+        elif keyword == "AREABREAK" and table:
+            table["areabreak"] = words[1]
+        elif keyword == "TOTAL" and table:
+            table["total"] = True
+
+    return parsed
+
+
+def evaluate_universe(expression, get_values):
+    """Evaluate a REDATAM filter expression.
+
+    Comparisons (=, <>, <, >, <=, >=) between variables, numbers and strings
+    can be joined with AND, OR, NOT and parentheses.
+
+    >>> print(evaluate_universe("1 = 1 AND NOT 2 < 1", None))
+    True
+    >>> ages = pd.Series([10, 30, 70])
+    >>> mask = evaluate_universe("PERSONA.P03 >= 14 AND PERSONA.P03 < 65",
+    ...                          lambda variable: ages)
+    >>> print(list(mask))
+    [False, True, False]
+
+    Args:
+        expression (str): REDATAM filter expression.
+        get_values (callable): Called with the full name of a variable,
+            returns its values (eg. a pandas.Series).
+
+    Returns:
+        bool or pandas.Series: Result of the expression.
+    """
+    tokens = tokenize(expression)
+    value, position = _parse_or(tokens, 0, get_values)
+    if position != len(tokens):
+        raise ValueError("Unexpected {} in universe {}".format(
+            tokens[position][1], expression))
+    return value
+
+
+def tokenize(expression):
+    """Split a REDATAM filter expression into (kind, text) tokens.
+
+    >>> for kind, text in tokenize("PERSONA.P03 >= 14 and HOGAR.H05 = 1"):
+    ...     print(kind, text)
+    name PERSONA.P03
+    op >=
+    number 14
+    logic AND
+    name HOGAR.H05
+    op =
+    number 1
+    """
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+
+    while position < len(expression):
+        match = _TOKENS.match(expression, position)
+        if not match or match.end() == position:
+            raise ValueError("Can't parse universe {} at {}".format(
+                expression, position))
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == "name" and text.upper() in ("AND", "OR", "NOT"):
+            kind, text = "logic", text.upper()
+        tokens.append((kind, text))
+        position = match.end()
+
+    return tokens
+
+
+# PRIVATE
+def _parse_or(tokens, position, get_values):
+    value, position = _parse_and(tokens, position, get_values)
+    while _is(tokens, position, "logic", "OR"):
+        other, position = _parse_and(tokens, position + 1, get_values)
+        value = value | other
+    return value, position
+
+
+def _parse_and(tokens, position, get_values):
+    value, position = _parse_not(tokens, position, get_values)
+    while _is(tokens, position, "logic", "AND"):
+        other, position = _parse_not(tokens, position + 1, get_values)
+        value = value & other
+    return value, position
+
+
+def _parse_not(tokens, position, get_values):
+    if _is(tokens, position, "logic", "NOT"):
+        value, position = _parse_not(tokens, position + 1, get_values)
+        return (not value) if isinstance(value, bool) else ~value, position
+    return _parse_comparison(tokens, position, get_values)
+
+
+def _parse_comparison(tokens, position, get_values):
+    if _is(tokens, position, "paren", "("):
+        value, position = _parse_or(tokens, position + 1, get_values)
+        if not _is(tokens, position, "paren", ")"):
+            raise ValueError("Missing ) in universe")
+        return value, position + 1
+
+    left, position = _parse_operand(tokens, position, get_values)
+    if position >= len(tokens) or tokens[position][0] != "op":
+        raise ValueError("Expected a comparison in universe")
+    operator = tokens[position][1]
+    right, position = _parse_operand(tokens, position + 1, get_values)
+
+    value = _COMPARISONS[operator](left, right)
+    return (bool(value) if np.isscalar(value) else value), position
+
+
+def _parse_operand(tokens, position, get_values):
+    if position >= len(tokens):
+        raise ValueError("Unexpected end of universe")
+
+    kind, text = tokens[position]
+    if kind == "number":
+        return (float(text) if "." in text else int(text)), position + 1
+    if kind == "string":
+        return text[1:-1], position + 1
+    if kind == "name":
+        return get_values(text), position + 1
+
+    raise ValueError("Unexpected {} in universe".format(text))
+
+
+def _is(tokens, position, kind, text):
+    return position < len(tokens) and tokens[position] == (kind, text)
@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+pool.py
+
+Pool of warm, reusable WebDriver sessions.
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import with_statement
+import threading
+from contextlib import contextmanager
+try:
+    from Queue import Queue, Empty
+except ImportError:
+    from queue import Queue, Empty
+
+
+# PUBLIC
+class PoolTimeoutError(Exception):
+    pass
+
+
+class WebDriverPool(object):
+    """Keep a number of browsers open and parked on a page, ready to be used.
+
+    Browsers are started lazily (or all at once calling warm) and handed to
+    callers one at a time. A browser given back is parked again calling
+    prepare when it is next acquired, so the caller releasing it doesn't
+    wait for the navigation. Browsers used max_uses times or that failed are
+    closed instead, and a new one takes their place.
+
+    Args:
+        url (str): Url where browsers are parked.
+        prepare (callable): Function called as prepare(driver, url) to park a
+            browser, after it is started and before it is reused.
+        size (int): Max number of browsers open at the same time.
+        max_uses (int): Times a browser is used before being recycled. None to
+            never recycle a healthy browser.
+        driver_factory (callable): Function returning a new WebDriver. By
+            default a selenium Firefox driver.
+        visible (bool): False to open browsers inside a virtual display.
+    """
+
+    def __init__(self, url, prepare=None, size=2, max_uses=50,
+                 driver_factory=None, visible=False):
+        self.url = url
+        self.prepare = prepare
+        self.size = size
+        self.max_uses = max_uses
+        self.driver_factory = driver_factory or firefox
+        self.visible = visible
+
+        self._idle = Queue()
+        self._uses = {}
+        self._used = set()
+        self._count = 0
+        self._lock = threading.Lock()
+        self._display = None
+        self._closed = False
+
+    def acquire(self, timeout=None):
+        """Take a healthy, parked browser from the pool.
+
+        Args:
+            timeout (float): Seconds to wait for a browser to be free. None to
+                wait forever.
+
+        Returns:
+            selenium.webdriver.remote.webdriver.WebDriver: A parked browser.
+        """
+        if self._closed:
+            raise ValueError("The pool is closed.")
+
+        while True:
+            driver = self._get_idle_or_new(timeout)
+            if not self._is_healthy(driver):
+                self._discard(driver)
+                continue
+
+            if id(driver) in self._used:
+                try:
+                    self._park(driver)
+                except Exception:
+                    self._discard(driver)
+                    continue
+                self._used.discard(id(driver))
+
+            return driver
+
+    def release(self, driver, broken=False):
+        """Give back a browser to the pool.
+
+        Args:
+            driver (WebDriver): A browser taken with acquire.
+            broken (bool): True if the browser failed while being used.
+        """
+        self._uses[id(driver)] = self._uses.get(id(driver), 0) + 1
+        worn_out = (self.max_uses is not None and
+                    self._uses[id(driver)] >= self.max_uses)
+
+        if broken or worn_out or self._closed:
+            self._discard(driver)
+            return
+
+        # parked when acquired again, the page it was left on is unknown
+        self._used.add(id(driver))
+        self._idle.put(driver)
+
+    @contextmanager
+    def driver(self, timeout=None):
+        """Context manager that acquires a browser and releases it at exit."""
+        driver = self.acquire(timeout)
+        try:
+            yield driver
+        except Exception:
+            self.release(driver, broken=True)
+            raise
+        else:
+            self.release(driver)
+
+    def warm(self):
+        """Start and park browsers until the pool is full."""
+        drivers = []
+        while self._count < self.size:
+            drivers.append(self.acquire())
+        for driver in drivers:
+            self._idle.put(driver)
+
+    def close(self):
+        """Close every idle browser and the virtual display, if any."""
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except Empty:
+                break
+
+        if self._display is not None:
+            self._display.stop()
+            self._display = None
+
+    def __len__(self):
+        return self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _get_idle_or_new(self, timeout):
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+
+        with self._lock:
+            can_start = self._count < self.size
+            if can_start:
+                # reserve the slot before starting the (slow) browser
+                self._count += 1
+
+        if can_start:
+            return self._start()
+
+        try:
+            return self._idle.get(timeout=timeout)
+        except Empty:
+            raise PoolTimeoutError(
+                "No browser was released in {} seconds.".format(timeout))
+
+    def _start(self):
+        try:
+            self._start_display()
+            driver = self.driver_factory()
+        except Exception:
+            with self._lock:
+                self._count -= 1
+            raise
+
+        self._uses[id(driver)] = 0
+        try:
+            self._park(driver)
+        except Exception:
+            self._discard(driver)
+            raise
+        return driver
+
+    def _start_display(self):
+        with self._lock:
+            if self.visible or self._display is not None:
+                return
+            from pyvirtualdisplay import Display
+            self._display = Display(visible=False)
+            self._display.start()
+
+    def _park(self, driver):
+        if self.prepare:
+            self.prepare(driver, self.url)
+        else:
+            driver.get(self.url)
+
+    def _is_healthy(self, driver):
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, driver):
+        with self._lock:
+            self._uses.pop(id(driver), None)
+            self._used.discard(id(driver))
+            self._count -= 1
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+
+def firefox():
+    """Start a selenium Firefox driver, the default of WebDriverPool."""
+    from selenium import webdriver
+    return webdriver.Firefox()
@@ -7,14 +7,19 @@ pyredatam.py
 Redatam object created from a .dic file that generate queries.
 """
 
+from __future__ import absolute_import
 from __future__ import unicode_literals
 from __future__ import print_function
 from __future__ import with_statement
 
+TABLE_TYPES = ["arealist", "counter", "median", "mean", "cross",
+               "frequencies", "stats"]
+
 
 # PUBLIC
 def arealist_query(area_level, variables, area_filter=None,
-                   universe_filter=None, title=None, incl_area_name=False):
+                   universe_filter=None, title=None, incl_area_name=False,
+                   geography=None):
     """Generate an Area List REDATAM query.
 
     Args:
@@ -23,6 +28,8 @@ def arealist_query(area_level, variables, area_filter=None,
         area_filter (str or list): Geographical area/s where results are asked.
         universe_filter (str): REDATAM filter exrpession.
         title (str): Title of the results table.
+        geography (GeographyIndex): Index used to expand area names and parent
+            areas in area_filter (eg. pyredatam.get_geography()).
 
     Returns:
         str: REDATAM query ready to paste in a processor.
@@ -39,20 +46,18 @@ def arealist_query(area_level, variables, area_filter=None,
     """
 
     # RUNDEF section
-    lines = _build_rundef_section(area_filter, universe_filter)
+    lines = _build_rundef_section(area_filter, universe_filter, geography)
 
     # TABLE section
-    lines.append("TABLE TABLE1")
-    lines.extend(_build_title(title))
-    lines.append("    AS AREALIST")
-    lines.append(_build_of_variables(area_level, variables, incl_area_name))
+    lines.extend(_build_arealist_table("TABLE1", area_level, variables, title,
+                                       incl_area_name))
 
     return "\n".join(lines)
 
 
 def counter_query(area_level, entity_count, area_filter=None,
                   universe_filter=None, title=None, incl_area_name=False,
-                  incl_total=False):
+                  incl_total=False, geography=None):
     """Generate an Area List REDATAM query where entities are counted.
 
     Args:
@@ -63,36 +68,27 @@ def counter_query(area_level, entity_count, area_filter=None,
         title (str): Title of the results table.
         incl_area_name (bool): True to include area level name besides code.
         incl_total (bool): True to include a total at the end of the table.
+        geography (GeographyIndex): Index used to expand area names and parent
+            areas in area_filter (eg. pyredatam.get_geography()).
 
     Returns:
         str: REDATAM query ready to paste in a processor.
     """
 
     # RUNDEF section
-    lines = _build_rundef_section(area_filter, universe_filter)
-
-    # DEFINE section
-    new_variable = area_level + ".COUNTER"
-    lines.append("DEFINE " + new_variable)
-    lines.append("    AS COUNT " + entity_count)
-    lines.append("    TYPE INTEGER")
-    lines.append("")
+    lines = _build_rundef_section(area_filter, universe_filter, geography)
 
-    # TABLE section
-    lines.append("TABLE TABLE1")
-    lines.extend(_build_title(title))
-    lines.append("    AS AREALIST")
-    lines.append(_build_of_variables(area_level, [new_variable],
-                                     incl_area_name))
-
-    lines.extend(["    TOTAL"] if incl_total else [])
+    # DEFINE and TABLE sections
+    lines.extend(_build_counter_table("TABLE1", area_level + ".COUNTER",
+                                      area_level, entity_count, title,
+                                      incl_area_name, incl_total))
 
     return "\n".join(lines)
 
 
 def median_query(variable, by_var1=None, by_var2=None, incl_name=None,
                  area_break=None, area_filter=None, universe_filter=None,
-                 title=None):
+                 title=None, geography=None):
     """Generate a median of a variable REDATAM query.
 
     Args:
@@ -104,45 +100,381 @@ def median_query(variable, by_var1=None, by_var2=None, incl_name=None,
         area_filter (str or list): Geographical area/s where results are asked.
         universe_filter (str): REDATAM filter exrpession.
         title (str): Title of the results table.
+        geography (GeographyIndex): Index used to expand area names and parent
+            areas in area_filter (eg. pyredatam.get_geography()).
 
     Returns:
         str: REDATAM query ready to paste in a processor.
     """
 
     # RUNDEF section
-    lines = _build_rundef_section(area_filter, universe_filter)
+    lines = _build_rundef_section(area_filter, universe_filter, geography)
 
     # TABLE section
-    lines.append("TABLE TABLE1")
-    lines.extend(_build_title(title))
-    lines.append("    AS MEDIAN")
-    lines.append("    OF " + variable)
-    lines.extend(["        BY " + by_var1] if by_var1 else [])
-    lines.extend(["        BY " + by_var2] if by_var2 else [])
-    lines.extend(["        COMPLETENAME"] if incl_name else [])
-    lines.extend(_build_area_break(area_break))
+    lines.extend(_build_median_table("TABLE1", variable, by_var1, by_var2,
+                                     incl_name, area_break, title))
+
+    return "\n".join(lines)
+
+
+def program_query(tables, area_filter=None, universe_filter=None,
+                  geography=None):
+    """Generate a REDATAM program with many tables over the same areas.
+
+    Each table is described by a dict with its "type" (one of TABLE_TYPES)
+    and the arguments of the function generating that type of
+    query, except area_filter, universe_filter and geography, which are
+    shared by every table. Tables are named TABLE1, TABLE2, etc. in order and
+    counters of the same area level get different names.
+
+    Args:
+        tables (list): Dicts describing the tables of the program.
+        area_filter (str or list): Geographical area/s where results are asked.
+        universe_filter (str): REDATAM filter exrpession.
+        geography (GeographyIndex): Index used to expand area names and parent
+            areas in area_filter (eg. pyredatam.get_geography()).
+
+    Returns:
+        str: REDATAM program ready to paste in a processor.
+
+    >>> print(program_query([
+    ...     {"type": "arealist", "area_level": "DPTO",
+    ...      "variables": "PERSONA.CONDACT"},
+    ...     {"type": "counter", "area_level": "DPTO", "entity_count": "HOGAR"},
+    ...     {"type": "counter", "area_level": "DPTO",
+    ...      "entity_count": "PERSONA"}], {"PROV": "02"}))
+    RUNDEF Job
+        SELECTION INLINE,
+         PROV 02
+    <BLANKLINE>
+    TABLE TABLE1
+        AS AREALIST
+        OF DPTO, PERSONA.CONDACT
+    <BLANKLINE>
+    DEFINE DPTO.COUNTER
+        AS COUNT HOGAR
+        TYPE INTEGER
+    <BLANKLINE>
+    TABLE TABLE2
+        AS AREALIST
+        OF DPTO, DPTO.COUNTER
+    <BLANKLINE>
+    DEFINE DPTO.COUNTER2
+        AS COUNT PERSONA
+        TYPE INTEGER
+    <BLANKLINE>
+    TABLE TABLE3
+        AS AREALIST
+        OF DPTO, DPTO.COUNTER2
+    """
+
+    # RUNDEF section
+    lines = _build_rundef_section(area_filter, universe_filter, geography)
+
+    counters = {}
+    for number, table in enumerate(tables, 1):
+        table = dict(table)
+        table_type = table.pop("type")
+        table_name = "TABLE{}".format(number)
+
+        if number > 1:
+            lines.append("")
+
+        if table_type == "counter":
+            area_level = table["area_level"]
+            counters[area_level] = counters.get(area_level, 0) + 1
+            counter_name = area_level + ".COUNTER"
+            if counters[area_level] > 1:
+                counter_name += str(counters[area_level])
+            lines.extend(_build_counter_table(table_name, counter_name,
+                                              **table))
+
+        elif table_type in _TABLE_BUILDERS:
+            lines.extend(_TABLE_BUILDERS[table_type](table_name, **table))
+
+        else:
+            raise ValueError("{} is not a type of table, use one of {}".format(
+                table_type, TABLE_TYPES))
+
+    return "\n".join(lines)
+
+
+def mean_query(variable, by_var1=None, by_var2=None, incl_name=None,
+               area_break=None, area_filter=None, universe_filter=None,
+               title=None, geography=None):
+    """Generate a mean (average) of a variable REDATAM query.
+
+    Args:
+        variable (str): Variable which mean is to be taken.
+        by_var1 (str): Variable to open the result in categories.
+        by_var2 (str): Cross variable to open result again, like a pivot table.
+        incl_name (str): Include descriptions besides codes.
+        area_break (str): Geographical entity to break the result with.
+        area_filter (str or list): Geographical area/s where results are asked.
+        universe_filter (str): REDATAM filter exrpession.
+        title (str): Title of the results table.
+        geography (GeographyIndex): Index used to expand area names and parent
+            areas in area_filter (eg. pyredatam.get_geography()).
+
+    Returns:
+        str: REDATAM query ready to paste in a processor.
+
+    >>> print(mean_query("PERSONA.P03", "PERSONA.P02", area_break="PROV"))
+    RUNDEF Job
+    <BLANKLINE>
+    TABLE TABLE1
+        AS AVERAGE
+        OF PERSONA.P03
+            BY PERSONA.P02
+        AREABREAK PROV
+    """
+
+    # RUNDEF section
+    lines = _build_rundef_section(area_filter, universe_filter, geography)
+
+    # TABLE section
+    lines.extend(_build_mean_table("TABLE1", variable, by_var1, by_var2,
+                                   incl_name, area_break, title))
 
     return "\n".join(lines)
 
 
-def mean_query():
-    pass
+def cross_query(row_var, col_var, incl_name=None, area_break=None,
+                area_filter=None, universe_filter=None, title=None,
+                geography=None):
+    """Generate a cross tabulation of two variables REDATAM query.
 
+    Args:
+        row_var (str): Variable whose categories are the rows of the table.
+        col_var (str): Variable whose categories are the columns of the table.
+        incl_name (str): Include descriptions besides codes.
+        area_break (str): Geographical entity to break the result with.
+        area_filter (str or list): Geographical area/s where results are asked.
+        universe_filter (str): REDATAM filter exrpession.
+        title (str): Title of the results table.
+        geography (GeographyIndex): Index used to expand area names and parent
+            areas in area_filter (eg. pyredatam.get_geography()).
 
-def cross_query():
-    pass
+    Returns:
+        str: REDATAM query ready to paste in a processor.
 
+    >>> print(cross_query("PERSONA.P02", "PERSONA.CONDACT",
+    ...                   area_filter={"PROV": "02"}))
+    RUNDEF Job
+        SELECTION INLINE,
+         PROV 02
+    <BLANKLINE>
+    TABLE TABLE1
+        AS CROSSTABS
+        OF PERSONA.P02
+            BY PERSONA.CONDACT
+    """
+
+    # RUNDEF section
+    lines = _build_rundef_section(area_filter, universe_filter, geography)
 
-def frequencies_query():
-    pass
+    # TABLE section
+    lines.extend(_build_cross_table("TABLE1", row_var, col_var, incl_name,
+                                    area_break, title))
+
+    return "\n".join(lines)
 
 
-def stats_query():
-    pass
+def frequencies_query(variable, incl_name=None, area_break=None,
+                      area_filter=None, universe_filter=None, title=None,
+                      geography=None):
+    """Generate a frequencies of the categories of a variable REDATAM query.
+
+    Args:
+        variable (str): Variable whose categories are counted.
+        incl_name (str): Include descriptions besides codes.
+        area_break (str): Geographical entity to break the result with.
+        area_filter (str or list): Geographical area/s where results are asked.
+        universe_filter (str): REDATAM filter exrpession.
+        title (str): Title of the results table.
+        geography (GeographyIndex): Index used to expand area names and parent
+            areas in area_filter (eg. pyredatam.get_geography()).
+
+    Returns:
+        str: REDATAM query ready to paste in a processor.
+    """
+
+    # RUNDEF section
+    lines = _build_rundef_section(area_filter, universe_filter, geography)
+
+    # TABLE section
+    lines.extend(_build_frequencies_table("TABLE1", variable, incl_name,
+                                          area_break, title))
+
+    return "\n".join(lines)
+
+
+def stats_query(variable, incl_name=None, area_break=None, area_filter=None,
+                universe_filter=None, title=None, geography=None):
+    """Generate a summary statistics of a variable REDATAM query.
+
+    Args:
+        variable (str): Variable whose statistics are taken.
+        incl_name (str): Include descriptions besides codes.
+        area_break (str): Geographical entity to break the result with.
+        area_filter (str or list): Geographical area/s where results are asked.
+        universe_filter (str): REDATAM filter exrpession.
+        title (str): Title of the results table.
+        geography (GeographyIndex): Index used to expand area names and parent
+            areas in area_filter (eg. pyredatam.get_geography()).
+
+    Returns:
+        str: REDATAM query ready to paste in a processor.
+    """
+
+    # RUNDEF section
+    lines = _build_rundef_section(area_filter, universe_filter, geography)
+
+    # TABLE section
+    lines.extend(_build_stats_table("TABLE1", variable, incl_name,
+                                    area_break, title))
+
+    return "\n".join(lines)
+
+
+class PreparedQuery(object):
+    """Query of a fixed table rendered for many areas, universes or titles.
+
+    The table section is built and its variables are checked once, so each
+    render only builds the RUNDEF section. Arguments are never modified.
+
+    >>> prepared = PreparedQuery("counter", area_level="DPTO",
+    ...                          entity_count="PERSONA")
+    >>> for prov in ["02", "06"]:
+    ...     print(prepared.render({"PROV": prov}, title="Personas"))
+    ...     print("")
+    RUNDEF Job
+        SELECTION INLINE,
+         PROV 02
+    <BLANKLINE>
+    DEFINE DPTO.COUNTER
+        AS COUNT PERSONA
+        TYPE INTEGER
+    <BLANKLINE>
+    TABLE TABLE1
+        TITLE "Personas"
+        AS AREALIST
+        OF DPTO, DPTO.COUNTER
+    <BLANKLINE>
+    RUNDEF Job
+        SELECTION INLINE,
+         PROV 06
+    <BLANKLINE>
+    DEFINE DPTO.COUNTER
+        AS COUNT PERSONA
+        TYPE INTEGER
+    <BLANKLINE>
+    TABLE TABLE1
+        TITLE "Personas"
+        AS AREALIST
+        OF DPTO, DPTO.COUNTER
+    <BLANKLINE>
+
+    Args:
+        query_type (str): One of TABLE_TYPES.
+        dictionary (VariableDictionary): If given, variables and entities of
+            the query must be in it.
+        geography (GeographyIndex): If given, area names and parent areas of
+            the area filters are expanded and their codes must be in it.
+        **kwargs: Arguments of the function generating that type of query
+            (eg. area_level and variables for "arealist"), except
+            area_filter, universe_filter, title and geography.
+
+    Raises:
+        ValueError: If a variable or entity is not in the dictionary.
+    """
+
+    def __init__(self, query_type, dictionary=None, geography=None,
+                 **kwargs):
+        if query_type not in TABLE_TYPES:
+            raise ValueError("{} is not a type of table, use one of {}".format(
+                query_type, TABLE_TYPES))
+
+        self.query_type = query_type
+        self.kwargs = kwargs
+        self.geography = geography
+
+        if dictionary is not None:
+            _check_variables(query_type, kwargs, dictionary)
+
+        if query_type == "counter":
+            lines = _build_counter_table(
+                "TABLE1", kwargs["area_level"] + ".COUNTER", **kwargs)
+        else:
+            lines = _TABLE_BUILDERS[query_type]("TABLE1", **kwargs)
+
+        # the title is the line after the table name
+        title_index = [line.split(" ")[0] for line in lines].index("TABLE") + 1
+        self._head = "\n".join(lines[:title_index])
+        self._tail = "\n".join(lines[title_index:])
+
+    def render(self, area_filter=None, universe_filter=None, title=None):
+        """Generate the query for an area filter, universe and title.
+
+        Args:
+            area_filter (dict): Geographical area/s where results are asked.
+            universe_filter (str): REDATAM filter exrpession.
+            title (str): Title of the results table.
+
+        Returns:
+            str: REDATAM query ready to paste in a processor.
+
+        Raises:
+            ValueError: If an area code is not in the geography.
+        """
+        if self.geography is not None and area_filter:
+            area_filter = self.geography.expand_area_filter(area_filter)
+            _check_areas(area_filter, self.geography)
+
+        lines = _build_rundef_section(area_filter, universe_filter)
+        lines.append(self._head)
+        lines.extend(_build_title(title))
+        lines.append(self._tail)
+
+        return "\n".join(lines)
+
+    __call__ = render
 
 
 # PRIVATE
-def _build_rundef_section(area_filter, universe_filter):
+def _check_variables(query_type, kwargs, dictionary):
+    variables = []
+    for key in ["variables", "variable", "by_var1", "by_var2", "row_var",
+                "col_var"]:
+        value = kwargs.get(key)
+        variables.extend(value if isinstance(value, list) else [value])
+
+    for variable in variables:
+        if variable is not None and variable not in dictionary:
+            raise ValueError("{} is not a variable of the dictionary".format(
+                variable))
+
+    entity = kwargs.get("entity_count")
+    if query_type == "counter" and entity not in dictionary.entities():
+        raise ValueError("{} is not an entity of the dictionary".format(
+            entity))
+
+
+def _check_areas(area_filter, geography):
+    level, codes = list(area_filter.items())[0]
+    if not geography.codes(level):
+        return
+
+    for code in codes if isinstance(codes, list) else [codes]:
+        if code not in geography:
+            raise ValueError("{} is not a code of a {} area".format(
+                code, level))
+
+
+def _build_rundef_section(area_filter, universe_filter, geography=None):
+    if geography is not None:
+        area_filter = geography.expand_area_filter(area_filter)
+
     lines = ["RUNDEF Job"]
     lines.extend(_build_area_filter(area_filter))
     lines.extend(_build_universe_filter(universe_filter))
@@ -156,8 +488,7 @@ def _build_area_filter(area_filter):
     if area_filter:
         lines.append("    SELECTION INLINE,")
 
-        area_type = area_filter.keys()[0]
-        areas = area_filter.values()[0]
+        area_type, areas = list(area_filter.items())[0]
         if type(areas) != list:
             areas = [areas]
 
@@ -166,6 +497,75 @@ def _build_area_filter(area_filter):
     return lines
 
 
+def _build_arealist_table(table_name, area_level, variables, title=None,
+                          incl_area_name=False):
+    lines = ["TABLE " + table_name]
+    lines.extend(_build_title(title))
+    lines.append("    AS AREALIST")
+    lines.append(_build_of_variables(area_level, variables, incl_area_name))
+    return lines
+
+
+def _build_counter_table(table_name, counter_name, area_level, entity_count,
+                         title=None, incl_area_name=False, incl_total=False):
+    # DEFINE section
+    lines = ["DEFINE " + counter_name,
+             "    AS COUNT " + entity_count,
+             "    TYPE INTEGER",
+             ""]
+
+    # TABLE section
+    lines.append("TABLE " + table_name)
+    lines.extend(_build_title(title))
+    lines.append("    AS AREALIST")
+    lines.append(_build_of_variables(area_level, [counter_name],
+                                     incl_area_name))
+    lines.extend(["    TOTAL"] if incl_total else [])
+    return lines
+
+
+def _build_median_table(table_name, variable, by_var1=None, by_var2=None,
+                        incl_name=None, area_break=None, title=None):
+    return _build_of_by_table(table_name, "MEDIAN", variable,
+                              [by_var1, by_var2], incl_name, area_break, title)
+
+
+def _build_mean_table(table_name, variable, by_var1=None, by_var2=None,
+                      incl_name=None, area_break=None, title=None):
+    return _build_of_by_table(table_name, "AVERAGE", variable,
+                              [by_var1, by_var2], incl_name, area_break, title)
+
+
+def _build_cross_table(table_name, row_var, col_var, incl_name=None,
+                       area_break=None, title=None):
+    return _build_of_by_table(table_name, "CROSSTABS", row_var, [col_var],
+                              incl_name, area_break, title)
+
+
+def _build_frequencies_table(table_name, variable, incl_name=None,
+                             area_break=None, title=None):
+    return _build_of_by_table(table_name, "FREQUENCY", variable, [],
+                              incl_name, area_break, title)
+
+
+def _build_stats_table(table_name, variable, incl_name=None, area_break=None,
+                       title=None):
+    return _build_of_by_table(table_name, "STATISTICS", variable, [],
+                              incl_name, area_break, title)
+
+
+def _build_of_by_table(table_name, table_type, variable, by_vars, incl_name,
+                       area_break, title):
+    lines = ["TABLE " + table_name]
+    lines.extend(_build_title(title))
+    lines.append("    AS " + table_type)
+    lines.append("    OF " + variable)
+    lines.extend("        BY " + by_var for by_var in by_vars if by_var)
+    lines.extend(["        COMPLETENAME"] if incl_name else [])
+    lines.extend(_build_area_break(area_break))
+    return lines
+
+
 def _build_universe_filter(universe_filter):
     return ["    UNIVERSE " + universe_filter] if universe_filter else []
 
@@ -182,9 +582,20 @@ def _build_of_variables(area_level, variables, incl_area_name):
     if type(variables) != list:
         variables = [variables]
     if incl_area_name:
-        variables.insert(0, area_level + ".NOM" + area_level)
+        variables = [area_level + ".NOM" + area_level] + variables
     return "    OF {}, {}".format(area_level, ", ".join(variables))
 
+
+_TABLE_BUILDERS = {
+    "arealist": _build_arealist_table,
+    "median": _build_median_table,
+    "mean": _build_mean_table,
+    "cross": _build_cross_table,
+    "frequencies": _build_frequencies_table,
+    "stats": _build_stats_table
+}
+
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod()
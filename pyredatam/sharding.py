@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+sharding.py
+
+Split queries over many areas into smaller ones and merge their results.
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import with_statement
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+TOTAL_LABEL = "Total"
+
+
+# PUBLIC
+def plan_shards(area_codes, shard_size=1, group_key=None):
+    """Split a list of area codes into shards.
+
+    Args:
+        area_codes (list): Codes of the areas to split.
+        shard_size (int): Number of groups of areas in each shard.
+        group_key (callable): Function returning the group of an area code
+            (eg. its province). If None, each area is a group by itself.
+
+    Returns:
+        list: Lists of area codes, one for each shard.
+
+    >>> for shard in plan_shards(["02", "06", "10", "14", "18"], 2):
+    ...     print(", ".join(shard))
+    02, 06
+    10, 14
+    18
+    >>> for shard in plan_shards(["02007", "06007", "06014"], 1,
+    ...                          lambda code: code[:2]):
+    ...     print(", ".join(shard))
+    02007
+    06007, 06014
+    """
+    groups = OrderedDict()
+    for area_code in area_codes:
+        key = group_key(area_code) if group_key else area_code
+        groups.setdefault(key, []).append(area_code)
+
+    groups = list(groups.values())
+    return [sum(groups[i:i + shard_size], [])
+            for i in range(0, len(groups), shard_size)]
+
+
+def merge_arealist_results(dfs, incl_total=False):
+    """Concatenate Area List results of several shards into one DataFrame.
+
+    Args:
+        dfs (list): DataFrames with the results of each shard (without total).
+        incl_total (bool): True to add a row with the sum of the numeric
+            columns of all the shards.
+
+    Returns:
+        pandas.DataFrame: Merged result.
+    """
+    df = pd.concat(dfs, ignore_index=True)
+
+    if incl_total:
+        # area codes may be numbers too (see compact_arealist_dataframe)
+        total = df[df.columns[1:]].select_dtypes(include="number").sum()
+        total_row = pd.DataFrame(
+            [[TOTAL_LABEL if column == df.columns[0] else
+              total.get(column, "") for column in df.columns]],
+            columns=df.columns)
+
+        # keep the dtypes of compacted results (see compact_arealist_dataframe)
+        for column in df.columns:
+            if df[column].dtype.name == "category":
+                if TOTAL_LABEL not in df[column].cat.categories:
+                    df[column] = df[column].cat.add_categories([TOTAL_LABEL])
+                total_row[column] = pd.Categorical(
+                    total_row[column], categories=df[column].cat.categories)
+            elif column in total.index:
+                total_row[column] = total_row[column].astype(
+                    np.promote_types(df[column].dtype,
+                                     np.min_scalar_type(total[column])))
+
+        df = pd.concat([df, total_row], ignore_index=True)
+
+    return df
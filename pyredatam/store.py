@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+store.py
+
+Local columnar store (Parquet or Feather) of parsed REDATAM results,
+partitioned by dataset, area level and area code.
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import with_statement
+import os
+import io
+import time
+import tempfile
+import pandas as pd
+try:
+    import pyarrow
+    import pyarrow.parquet
+    import pyarrow.feather
+except ImportError:
+    pyarrow = None
+
+from .utils import makedirs, remove_file, replace_file, safe_filename
+from .executor import run_concurrently
+
+DEFAULT_STORE_DIR = os.path.join(os.path.expanduser("~"), ".pyredatam",
+                                 "store")
+FORMATS = {"parquet": ".parquet", "feather": ".feather"}
+KEY_EXT = ".key"
+
+
+# PUBLIC
+class ResultStore(object):
+    """Keep parsed results as one columnar file per area of a dataset.
+
+    A dataset is a named query (eg. "condact_frac") whose result is stored in
+    partitions, one for each area code of an area level, under
+    store_dir/dataset/area_level/area_code. A partition may keep the key of
+    the query it was fetched with (eg. cache.make_key) in a file next to it,
+    and a partition whose key is not the one of the current query is stale.
+    Partitions are read through memory maps and only the ones missing, older
+    than max_age or stale are fetched again by refresh, so reading a dataset
+    already stored doesn't need the network. Files are written to a
+    temporary name and atomically renamed.
+
+    Args:
+        store_dir (str): Directory where datasets are stored.
+        file_format (str): "parquet" or "feather". Needs pyarrow.
+        max_age (int): Seconds a partition is fresh. None to never expire.
+    """
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR, file_format="parquet",
+                 max_age=None):
+        if pyarrow is None:
+            raise ImportError("ResultStore needs pyarrow installed")
+        if file_format not in FORMATS:
+            raise ValueError("{} is not a format, use one of {}".format(
+                file_format, sorted(FORMATS)))
+
+        self.store_dir = store_dir
+        self.file_format = file_format
+        self.max_age = max_age
+        makedirs(self.store_dir)
+
+    def get(self, dataset, area_level, area_code):
+        """Return a stored partition, or None if it is missing."""
+        try:
+            return self._read(self._path(dataset, area_level, area_code))
+        except (IOError, OSError):
+            return None
+
+    def put(self, dataset, area_level, area_code, df, key=None):
+        """Store the DataFrame of a partition, replacing the previous one.
+
+        Args:
+            key (str): Key of the query of the partition, kept with it.
+        """
+        path = self._path(dataset, area_level, area_code)
+        makedirs(os.path.dirname(path))
+        # without a key until it is written, a crash in between leaves it stale
+        key_path = _key_path(path)
+        remove_file(key_path)
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path),
+                                        suffix=".tmp")
+        os.close(fd)
+        try:
+            self._write(df, tmp_path)
+            replace_file(tmp_path, path)
+        except Exception:
+            remove_file(tmp_path)
+            raise
+
+        if key is not None:
+            with io.open(key_path + ".tmp", "w", encoding="utf-8") as f:
+                f.write("{}".format(key))
+            replace_file(key_path + ".tmp", key_path)
+
+    def delete(self, dataset, area_level=None, area_code=None):
+        """Remove the stored partitions of a dataset matching the arguments.
+
+        Returns:
+            int: Number of partitions removed.
+        """
+        partitions = [(level, code) for level, code in self.partitions(dataset)
+                      if area_level in (None, level) and
+                      area_code in (None, code)]
+        for level, code in partitions:
+            path = self._path(dataset, level, code)
+            remove_file(path)
+            remove_file(_key_path(path))
+
+        return len(partitions)
+
+    def partitions(self, dataset):
+        """Return (area_level, area_code) of every partition of a dataset."""
+        dataset_dir = os.path.join(self.store_dir, safe_filename(dataset))
+        ext = FORMATS[self.file_format]
+
+        partitions = []
+        for area_level in sorted(_listdir(dataset_dir)):
+            for filename in sorted(_listdir(os.path.join(dataset_dir,
+                                                         area_level))):
+                if filename.endswith(ext):
+                    partitions.append((area_level, filename[:-len(ext)]))
+
+        return partitions
+
+    def get_key(self, dataset, area_level, area_code):
+        """Return the query key of a partition, or None if it has none."""
+        key_path = _key_path(self._path(dataset, area_level, area_code))
+        try:
+            with io.open(key_path, encoding="utf-8") as f:
+                return f.read()
+        except (IOError, OSError):
+            return None
+
+    def is_fresh(self, dataset, area_level, area_code, key=None):
+        """Check if a partition is stored and younger than max_age.
+
+        Args:
+            key (str): Query key the partition must be stored with. None to
+                not check it.
+        """
+        try:
+            mtime = os.path.getmtime(self._path(dataset, area_level,
+                                                area_code))
+        except OSError:
+            return False
+
+        if self.max_age is not None and time.time() - mtime > self.max_age:
+            return False
+
+        return key is None or self.get_key(dataset, area_level,
+                                           area_code) == key
+
+    def missing(self, dataset, area_level, area_codes, keys=None):
+        """Return the area codes whose partitions are missing or stale.
+
+        Args:
+            keys (dict): Query key of each area code (see is_fresh).
+        """
+        keys = keys or {}
+        return [area_code for area_code in area_codes
+                if not self.is_fresh(dataset, area_level, area_code,
+                                     keys.get(area_code))]
+
+    def read(self, dataset, area_level=None, area_codes=None):
+        """Read stored partitions of a dataset into one DataFrame.
+
+        Args:
+            dataset (str): Name of the dataset.
+            area_level (str): Level of the partitions. By default, every
+                level stored.
+            area_codes (list): Codes of the partitions read. By default,
+                every partition stored of the level.
+
+        Returns:
+            pandas.DataFrame: Partitions in the order of area_codes (or of
+                their codes), with a default index.
+        """
+        if area_codes is None:
+            partitions = [(level, code)
+                          for level, code in self.partitions(dataset)
+                          if area_level in (None, level)]
+        else:
+            partitions = [(area_level, code) for code in area_codes]
+
+        dfs = [self._read(self._path(dataset, level, code))
+               for level, code in partitions]
+        if not dfs:
+            return pd.DataFrame()
+
+        return pd.concat(dfs, ignore_index=True)
+
+    def refresh(self, dataset, area_level, area_codes, fetch, force=False,
+                max_workers=4, keys=None, **kwargs):
+        """Fetch the partitions missing or stale and read the dataset.
+
+        Args:
+            dataset (str): Name of the dataset.
+            area_level (str): Level of the partitions.
+            area_codes (list): Codes of the partitions of the dataset.
+            fetch (callable): Called as fetch(area_code) to get the DataFrame
+                of a partition.
+            force (bool): True to fetch every partition again.
+            max_workers (int): Partitions fetched at the same time.
+            keys (dict): Key of the query of each area code. Partitions
+                stored with another key are fetched again.
+            **kwargs: Arguments of executor.run_concurrently (eg. retries).
+
+        Returns:
+            pandas.DataFrame: Partitions of area_codes (see read).
+        """
+        if force:
+            to_fetch = list(area_codes)
+        else:
+            to_fetch = self.missing(dataset, area_level, area_codes, keys)
+
+        keys = keys or {}
+        results = run_concurrently(fetch, to_fetch, max_workers=max_workers,
+                                   ordered=False, **kwargs)
+        for index, df in results:
+            self.put(dataset, area_level, to_fetch[index], df,
+                     keys.get(to_fetch[index]))
+
+        return self.read(dataset, area_level, area_codes)
+
+    def _path(self, dataset, area_level, area_code):
+        return os.path.join(self.store_dir, safe_filename(dataset),
+                            safe_filename(area_level),
+                            safe_filename(area_code) +
+                            FORMATS[self.file_format])
+
+    def _write(self, df, path):
+        df = df.reset_index(drop=True)
+        if self.file_format == "parquet":
+            pyarrow.parquet.write_table(
+                pyarrow.Table.from_pandas(df, preserve_index=False), path)
+        else:
+            pyarrow.feather.write_feather(df, path)
+
+    def _read(self, path):
+        source = pyarrow.memory_map(path, "r")
+        try:
+            if self.file_format == "parquet":
+                return pyarrow.parquet.read_table(source).to_pandas()
+            return pyarrow.feather.read_table(source).to_pandas()
+        finally:
+            source.close()
+
+
+# PRIVATE
+def _key_path(path):
+    return os.path.splitext(path)[0] + KEY_EXT
+
+
+def _listdir(path):
+    try:
+        return os.listdir(path)
+    except OSError:
+        return []
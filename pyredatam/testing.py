@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+testing.py
+
+Fixtures to test and benchmark queries without the network: synthetic
+REDATAM results and a local stub of a RpWebEngine server.
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import with_statement
+import threading
+try:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qs
+except ImportError:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs
+
+PORTAL_PATH = "/argbin/RpWebEngine.exe/PortalAction?BASE=CPV2010B"
+INDEX_PATH = "/argbin/index.htm"
+PROCESSOR_PATH = ("/argbin/RpWebEngine.exe/PortalAction?BASE=CPV2010B"
+                  "&ITEM=PROGRED&MAIN=WebServerMain.inl")
+PROGRAM_PATH = "/argbin/RpWebEngine.exe/Program"
+OUTPUT_PATH = "/argbin/output.htm"
+GRID_PATH = "/argbin/grid.htm"
+EXPORT_PATH = "/tmp/result.xls"
+
+FRAMESET = """<html><frameset rows="100%">
+<frame name="Output" src="{}">
+</frameset></html>""".format(OUTPUT_PATH)
+
+PORTAL = """<html><frameset cols="25%,75%">
+<frame name="Index" src="{}">
+<frame name="Output" src="about:blank">
+</frameset></html>""".format(INDEX_PATH)
+
+INDEX = """<html><body><div id="root">
+<h3>Información general</h3>
+<div><h3>Programación REDATAM</h3>
+<div><a href="{}" target="Output">Procesador</a></div></div>
+</div></body></html>""".format(PROCESSOR_PATH.replace("&", "&amp;"))
+
+HTML_START = '<html><head><meta charset="utf-8"></head><body>'
+
+OUTPUT = """<html><body>
+<iframe name="grid" src="{}"></iframe>
+</body></html>""".format(GRID_PATH)
+
+
+def arealist_html(n_rows, columns=("Ocupado", "Desocupado", "Inactivo")):
+    """Build an html REDATAM Area List result with n_rows areas."""
+
+    lines = [HTML_START,
+             '<p><a href="{}">Descargar en formato Excel</a></p>'.format(
+                 EXPORT_PATH),
+             "<table>",
+             '<tr><td colspan="{}">AREA # FRAC</td></tr>'.format(
+                 len(columns) + 1),
+             "<tr><td>Código</td>{}</tr>".format(
+                 "".join("<td>{}</td>".format(col) for col in columns))]
+
+    for i in range(n_rows):
+        values = "".join("<td>{:,}</td>".format(
+            (i * 37 + j * 1009) % 20000).replace(",", ".")
+            for j in range(len(columns)))
+        lines.append("<tr><td>{:09d}</td>{}</tr>".format(20010101 + i,
+                                                         values))
+
+    lines.extend(['<tr><td colspan="{}">Procesado con Redatam+SP</td></tr>'
+                  .format(len(columns) + 1),
+                  "</table>", "</body></html>"])
+
+    return "\n".join(lines)
+
+
+def arealist_export(n_rows, columns=("Ocupado", "Desocupado", "Inactivo"),
+                    sep="\t"):
+    """Build the file of the export link of an Area List result.
+
+    It has the same areas and values than arealist_html(n_rows, columns), as
+    lines of values separated by sep.
+    """
+
+    lines = ["AREA # FRAC", sep.join(["Código"] + list(columns))]
+    for i in range(n_rows):
+        lines.append(sep.join(["{:09d}".format(20010101 + i)] + [
+            "{}".format((i * 37 + j * 1009) % 20000)
+            for j in range(len(columns))]))
+    lines.append("Procesado con Redatam+SP")
+
+    return "\n".join(lines) + "\n"
+
+
+def crosstab_html(rows, columns, areas=None, decimals=False):
+    """Build an html REDATAM result with a table of rows by columns.
+
+    Crosstabs, frequencies, means, medians and statistics are laid out like
+    this, with a block of rows for each area if the result has an area break.
+    The last row and the last column of each block are totals.
+    """
+
+    n_cols = len(columns) + 2
+    lines = [HTML_START,
+             '<p><a href="{}">Descargar en formato Excel</a></p>'.format(
+                 EXPORT_PATH),
+             "<table>",
+             '<tr><td colspan="{}">Cuadro</td></tr>'.format(n_cols)]
+
+    for a, area in enumerate(areas or [None]):
+        if area is not None:
+            lines.append('<tr><td colspan="{}">AREA # {}</td></tr>'.format(
+                n_cols, area))
+        lines.append("<tr><td>Categorías</td>{}<td>Total</td></tr>".format(
+            "".join("<td>{}</td>".format(col) for col in columns)))
+
+        for i, row in enumerate(list(rows) + ["Total"]):
+            values = [(i * 37 + j * 1009 + a * 7) % 20000
+                      for j in range(len(columns))]
+            values.append(sum(values))
+            lines.append("<tr><td>{}</td>{}</tr>".format(row, "".join(
+                "<td>{}</td>".format(_format_number(value, decimals))
+                for value in values)))
+
+    lines.extend(['<tr><td colspan="{}">Procesado con Redatam+SP</td></tr>'
+                  .format(n_cols), "</table>", "</body></html>"])
+
+    return "\n".join(lines)
+
+
+def processor_html(action=PROGRAM_PATH, query_field="CMDSET"):
+    """Build the page of the processor, with the form to post programs."""
+    return """<html><body>
+<form action="{}" method="post">
+<input type="hidden" name="MAIN" value="WebServerMain.inl">
+<input type="hidden" name="BASE" value="CPV2010B">
+<input type="hidden" name="ITEM" value="PROGRED">
+<input type="hidden" name="MODE" value="RUN">
+<textarea name="{}"></textarea>
+<input type="submit" name="SUBMIT" value="Ejecutar">
+</form>
+</body></html>""".format(action, query_field)
+
+
+def program_html(results):
+    """Join the tables of many html results in the result of one program."""
+
+    lines = [HTML_START,
+             '<p><a href="{}">Descargar en formato Excel</a></p>'.format(
+                 EXPORT_PATH)]
+    for html in results:
+        lines.append(html[html.index("<table>"):
+                          html.index("</table>") + len("</table>")])
+    lines.append("</body></html>")
+
+    return "\n".join(lines)
+
+
+class StubWebEngine(object):
+    """Serve a fixed result for every program posted to the processor.
+
+    Args:
+        result_html (str): Html returned by the result grid.
+        result_export (str): File returned by the export link of the grid.
+        program_path (str): Action of the processor form.
+        query_field (str): Name of the textarea of the processor form.
+    """
+
+    def __init__(self, result_html=None, result_export=None,
+                 program_path=PROGRAM_PATH, query_field="CMDSET"):
+        self.result_html = result_html or arealist_html(3)
+        self.result_export = result_export or arealist_export(3)
+        self.program_path = program_path
+        self.query_field = query_field
+        self.programs = []
+        self.server = _ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.stub = self
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+
+    @property
+    def root_url(self):
+        return "http://127.0.0.1:{}".format(self.server.server_address[1])
+
+    @property
+    def url(self):
+        return self.root_url + PORTAL_PATH
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def _format_number(value, decimals=False):
+    """Format a number as REDATAM does, eg. 1.234 or 12,34."""
+    if decimals:
+        return "{:,.2f}".format(value / 100.0).replace(",", " ").replace(
+            ".", ",").replace(" ", ".")
+    return "{:,}".format(value).replace(",", ".")
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        stub = self.server.stub
+        if self.path == PORTAL_PATH:
+            self._respond(PORTAL)
+        elif self.path.startswith(INDEX_PATH):
+            self._respond(INDEX)
+        elif self.path == PROCESSOR_PATH:
+            self._respond(processor_html(stub.program_path, stub.query_field))
+        elif self.path.startswith(OUTPUT_PATH):
+            self._respond(OUTPUT)
+        elif self.path.startswith(GRID_PATH):
+            self._respond(stub.result_html)
+        elif self.path.startswith(EXPORT_PATH):
+            self._respond(stub.result_export,
+                          content_type="application/vnd.ms-excel")
+        else:
+            self._respond("<html></html>")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode("utf-8"))
+
+        stub = self.server.stub
+        if self.path.startswith(stub.program_path) and \
+                form.get("SUBMIT") == ["Ejecutar"]:
+            stub.programs.append(form[stub.query_field][0])
+            self._respond(FRAMESET)
+        else:
+            self._respond("<html></html>", status=404)
+
+    def _respond(self, html, status=200, content_type="text/html"):
+        body = html.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type + "; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
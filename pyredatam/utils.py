@@ -7,11 +7,113 @@ utils.py
 Helper methods.
 """
 
+from __future__ import absolute_import
 from __future__ import unicode_literals
 from __future__ import print_function
 from __future__ import with_statement
 import os
+import re
+import sys
+import errno
+import types
+import inspect
+import importlib
+import threading
+import functools
 
 
 def get_data_dir():
     return os.path.abspath(os.path.join(os.path.dirname(__file__), "data"))
+
+
+def makedirs(path):
+    """Create a directory and its parents, if they don't exist."""
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+
+def remove_file(path):
+    """Remove a file, if it exists."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def replace_file(src, dst):
+    """Rename src to dst, replacing dst if it exists (also on windows)."""
+    try:
+        os.rename(src, dst)
+    except OSError:
+        # windows does not overwrite on rename
+        remove_file(dst)
+        os.rename(src, dst)
+
+
+def safe_filename(name):
+    """Make a name usable as a file name.
+
+    >>> print(safe_filename("PROV 02/DPTO"))
+    PROV_02_DPTO
+    """
+    return re.sub(r"[^\w.-]", "_", name)
+
+
+def memoize(func):
+    """Cache the result of a function for each combination of arguments."""
+    results = {}
+    lock = threading.Lock()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # default values are part of the key: f() and f(default) are the same
+        key = tuple(sorted(inspect.getcallargs(func, *args, **kwargs).items()))
+        with lock:
+            if key not in results:
+                results[key] = func(*args, **kwargs)
+            return results[key]
+
+    wrapper.cache_clear = results.clear
+    return wrapper
+
+
+class LazyModule(types.ModuleType):
+    """Module imported the first time one of its attributes is used.
+
+    Python 2 modules can't define a module level __getattr__, so a package
+    exposes a heavy submodule as a LazyModule until it is used.
+
+    >>> json = LazyModule("json")
+    >>> print(json.dumps([1]))
+    [1]
+
+    Args:
+        name (str): Full name of the module (eg. "pyredatam.cpv2010arg").
+    """
+
+    def __init__(self, name):
+        super(LazyModule, self).__init__(str(name))
+
+    def __getattr__(self, attr):
+        # introspection (eg. doctest looking for __wrapped__) doesn't import
+        if attr.startswith("__") and self.__name__ not in sys.modules:
+            raise AttributeError(attr)
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __delattr__(self, attr):
+        delattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def _load(self):
+        module = sys.modules.get(self.__name__)
+        if module is None or module is self:
+            module = importlib.import_module(self.__name__)
+        return module
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+validation.py
+
+Check REDATAM queries against the dictionary and the areas of a database
+before sending them to the server.
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import with_statement
+
+from .offline import parse_program, tokenize
+
+_EQUALITIES = [("op", "="), ("op", "<>")]
+
+
+# PUBLIC
+class QueryValidationError(ValueError):
+    """A query has variables, categories or areas unknown to the database.
+
+    Attributes:
+        errors (list): Description of each problem found.
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        super(QueryValidationError, self).__init__(
+            "Invalid query: " + "; ".join(errors))
+
+
+class QueryValidator(object):
+    """Check the queries generated by pyredatam without the server.
+
+    Entities and variables of the tables and the universe, category codes
+    compared with a variable in the universe and the area codes of the
+    selection are looked up in the dictionary and geography indexes.
+
+    >>> from pyredatam.dictionary import VariableDictionary
+    >>> from pyredatam.geography import GeographyIndex
+    >>> validator = QueryValidator(
+    ...     VariableDictionary({"PERSONA": {"P02": [["1", "Varón"],
+    ...                                             ["2", "Mujer"]]}}),
+    ...     GeographyIndex({"PROV": {"02": "Capital"}}, [("PROV", 2)]))
+    >>> for error in validator.errors('''RUNDEF Job
+    ...     SELECTION INLINE,
+    ...      PROV 02, 99
+    ...     UNIVERSE PERSONA.P02 = 3
+    ... TABLE TABLE1
+    ...     AS AREALIST
+    ...     OF PROV, PERSONA.P20'''):
+    ...     print(error)
+    99 is not a code of a PROV area
+    3 is not a category of PERSONA.P02
+    PERSONA.P20 is not a variable of the dictionary
+
+    Args:
+        dictionary (VariableDictionary): Variables of the database.
+        geography (GeographyIndex): Areas of the database. If None, areas are
+            not checked.
+    """
+
+    def __init__(self, dictionary, geography=None):
+        self.dictionary = dictionary
+        self.geography = geography
+        self._entities = set(dictionary.entities())
+
+    def validate(self, query):
+        """Raise QueryValidationError if the query has any error."""
+        errors = self.errors(query)
+        if errors:
+            raise QueryValidationError(errors)
+
+    def is_valid(self, query):
+        return not self.errors(query)
+
+    def errors(self, query):
+        """Return the description of every error of a query.
+
+        Args:
+            query (str): REDATAM query or program.
+
+        Returns:
+            list: Errors found, empty if the query is valid.
+        """
+        errors = []
+        try:
+            parsed = parse_program(query)
+        except (ValueError, IndexError):
+            return ["the query can't be parsed"]
+
+        defined = set(parsed["defines"])
+
+        if parsed["selection"]:
+            errors.extend(self._area_errors(*parsed["selection"]))
+
+        if parsed["universe"]:
+            errors.extend(self._universe_errors(parsed["universe"], defined))
+
+        for variable, entity in parsed["defines"].items():
+            if entity not in self._entities:
+                errors.append("{} is not an entity of the dictionary".format(
+                    entity))
+
+        if not parsed["tables"]:
+            errors.append("the query has no TABLE")
+
+        for table in parsed["tables"]:
+            variables = list(table["of"]) + table["by"]
+            if table["type"] == "AREALIST" and variables:
+                errors.extend(self._level_errors(variables.pop(0)))
+            if table["areabreak"]:
+                errors.extend(self._level_errors(table["areabreak"]))
+
+            for variable in variables:
+                if variable not in defined:
+                    errors.extend(self._variable_errors(variable))
+
+        return errors
+
+    def _variable_errors(self, variable):
+        if variable not in self.dictionary:
+            return ["{} is not a variable of the dictionary".format(variable)]
+        return []
+
+    def _level_errors(self, level):
+        if self.geography is not None and \
+                level not in self.geography.code_lengths:
+            return ["{} is not an area level".format(level)]
+        return []
+
+    def _area_errors(self, level, codes):
+        if self.geography is None:
+            return []
+        if level not in self.geography.code_lengths:
+            return ["{} is not an area level".format(level)]
+
+        errors = []
+        known = bool(self.geography.codes(level))
+        for code in codes:
+            if len(code) != self.geography.code_lengths[level] or \
+                    not code.isdigit() or (known and code not in
+                                           self.geography):
+                errors.append("{} is not a code of a {} area".format(
+                    code, level))
+
+        return errors
+
+    def _universe_errors(self, universe, defined):
+        try:
+            tokens = tokenize(universe)
+        except ValueError as e:
+            return ["{}".format(e)]
+
+        errors = []
+        for index, (kind, text) in enumerate(tokens):
+            if kind != "name" or text in defined:
+                continue
+
+            if text not in self.dictionary:
+                errors.extend(self._variable_errors(text))
+                continue
+
+            # variable = category, category <> variable, etc.
+            categories = self.dictionary.categories(text)
+            for operator, operand in [(index + 1, index + 2),
+                                      (index - 1, index - 2)]:
+                if not categories or operand < 0 or operand >= len(tokens):
+                    continue
+                if tokens[operator] in _EQUALITIES and \
+                        tokens[operand][0] in ("number", "string"):
+                    category = tokens[operand][1].strip("\"'")
+                    if category not in categories:
+                        errors.append("{} is not a category of {}".format(
+                            category, text))
+
+        return errors
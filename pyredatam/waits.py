@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+waits.py
+
+Configurable waits for the pages of a REDATAM server to be ready, with a
+timeout for each stage of a query.
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import with_statement
+import time
+
+# seconds to wait for each stage of a browser query, before adding the time
+# that depends on the expected rows of the result
+DEFAULT_TIMEOUTS = {
+    "navigation": 30,  # menus of the portal leading to the processor
+    "frame": 60,  # frames where the processor and its results are loaded
+    "result": 120  # the server runs the query and renders the result
+}
+
+# script timeout of a new WebDriver session, restored after observing
+DEFAULT_SCRIPT_TIMEOUT = 30
+
+# observe the DOM and call back as soon as an element has a text
+TEXT_OBSERVER_SCRIPT = """
+var selector = arguments[0], text = arguments[1];
+var done = arguments[arguments.length - 1];
+function found() {
+    var element = document.querySelector(selector);
+    return element !== null && element.textContent.indexOf(text) !== -1;
+}
+if (found()) {
+    done(true);
+} else {
+    var observer = new MutationObserver(function () {
+        if (found()) {
+            observer.disconnect();
+            done(true);
+        }
+    });
+    observer.observe(document.documentElement,
+                     {childList: true, subtree: true, characterData: true});
+}
+"""
+
+
+# PUBLIC
+class StageTimeoutError(Exception):
+    """A stage of a query didn't finish in time."""
+
+    def __init__(self, stage, timeout):
+        self.stage = stage
+        self.timeout = timeout
+        super(StageTimeoutError, self).__init__(
+            "Stage '{}' didn't finish after {:.1f} seconds".format(
+                stage, timeout))
+
+
+class WaitStrategy(object):
+    """Wait for conditions polling at growing intervals until a timeout.
+
+    Polls start short, so quick pages are detected quickly, and grow
+    exponentially up to max_poll, so slow queries don't poll the browser
+    continuously. The timeout of a stage grows with the rows expected in the
+    result.
+
+    >>> wait = WaitStrategy({"result": 60}, seconds_per_row=0.01)
+    >>> wait.timeout("result", expected_rows=3000)
+    90.0
+    >>> print(wait.until("result", lambda: "ready"))
+    ready
+
+    Args:
+        timeouts (dict): Seconds to wait for each stage, updating the
+            DEFAULT_TIMEOUTS.
+        poll (float): Seconds to wait before the second check.
+        max_poll (float): Max seconds between checks.
+        backoff (float): Factor applied to the interval after each check.
+        seconds_per_row (float): Seconds added to the timeout of the stages
+            for each row expected in the result.
+    """
+
+    def __init__(self, timeouts=None, poll=0.05, max_poll=2.0, backoff=1.5,
+                 seconds_per_row=0.005):
+        self.timeouts = dict(DEFAULT_TIMEOUTS)
+        self.timeouts.update(timeouts or {})
+        self.poll = poll
+        self.max_poll = max_poll
+        self.backoff = backoff
+        self.seconds_per_row = seconds_per_row
+
+    def timeout(self, stage, expected_rows=None):
+        """Return the seconds to wait for a stage."""
+        return float(self.timeouts[stage] +
+                     (expected_rows or 0) * self.seconds_per_row)
+
+    def intervals(self):
+        """Yield the seconds to sleep between checks."""
+        interval = self.poll
+        while True:
+            yield interval
+            interval = min(interval * self.backoff, self.max_poll)
+
+    def until(self, stage, condition, expected_rows=None,
+              ignored_exceptions=(), timeout=None):
+        """Check a condition until it returns a true value.
+
+        Args:
+            stage (str): Stage waited for, one of the timeouts keys.
+            condition (callable): Called without arguments, returns a false
+                value while the stage is not finished.
+            expected_rows (int): Rows expected in the result of the query.
+            ignored_exceptions (tuple): Exceptions raised by condition that
+                count as a false value.
+            timeout (float): Seconds to wait instead of the stage timeout.
+
+        Returns:
+            The value returned by condition.
+
+        Raises:
+            StageTimeoutError: If the condition is not met in time.
+        """
+        if timeout is None:
+            timeout = self.timeout(stage, expected_rows)
+        end = time.time() + timeout
+
+        for interval in self.intervals():
+            try:
+                value = condition()
+                if value:
+                    return value
+            except ignored_exceptions:
+                pass
+
+            remaining = end - time.time()
+            if remaining <= 0:
+                raise StageTimeoutError(stage, timeout)
+            time.sleep(min(interval, remaining))
+
+    def until_text(self, stage, driver, css_selector, text,
+                   expected_rows=None):
+        """Wait for an element of the current frame to have a text.
+
+        A MutationObserver in the browser reports the change as soon as it
+        happens. If the page is replaced while observing it, the remaining
+        time is spent checking the element at growing intervals.
+        """
+        from selenium.common.exceptions import WebDriverException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+
+        timeout = self.timeout(stage, expected_rows)
+        start = time.time()
+        # pooled drivers are reused, so their script timeout is left as it was
+        previous_timeout = _get_script_timeout(driver)
+        try:
+            driver.set_script_timeout(timeout)
+            if driver.execute_async_script(TEXT_OBSERVER_SCRIPT,
+                                           css_selector, text):
+                return True
+        except WebDriverException:
+            pass
+        finally:
+            try:
+                driver.set_script_timeout(previous_timeout)
+            except WebDriverException:
+                pass
+
+        condition = EC.text_to_be_present_in_element(
+            (By.CSS_SELECTOR, css_selector), text)
+        return self.until(stage, lambda: condition(driver),
+                          ignored_exceptions=(WebDriverException,),
+                          timeout=max(timeout - (time.time() - start), 0))
+
+
+# PRIVATE
+def _get_script_timeout(driver):
+    from selenium.common.exceptions import WebDriverException
+
+    try:
+        return driver.timeouts.script
+    except (AttributeError, WebDriverException):
+        # selenium < 4 can't read the timeouts of the driver
+        return DEFAULT_SCRIPT_TIMEOUT
@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+webengine.py
+
+Run REDATAM programs on a RpWebEngine server through plain HTTP requests.
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import with_statement
+import re
+import threading
+import requests
+import lxml.html
+try:
+    from urlparse import urljoin, urlparse, parse_qs
+except ImportError:
+    from urllib.parse import urljoin, urlparse, parse_qs
+
+from .instrumentation import stage
+
+INDEX_FRAMES = ["Index"]
+RESULT_FRAMES = ["Output", "grid"]
+# link of the index frame of the portal to the page of the processor form
+PROCESSOR_LINK = re.compile(r"PROGRED|procesador", re.IGNORECASE)
+MAX_FRAME_DEPTH = 4
+DEFAULT_TIMEOUT = 300
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# link to the result file that precedes the table in the result grid
+EXPORT_LINK_TEXT = "Descargar en formato Excel"
+EXPORT_LINK = re.compile(
+    br"""<a[^>]+href=["']([^"']+)["'][^>]*>\s*""" +
+    EXPORT_LINK_TEXT.encode("utf-8"), re.IGNORECASE)
+
+
+# PUBLIC
+class WebEngineError(Exception):
+    pass
+
+
+class WebEngineClient(object):
+    """Submit REDATAM programs to the processor of a RpWebEngine server.
+
+    The processor form is posted directly and the frames of the response are
+    followed until the result grid is reached, so no browser is needed. A
+    requests.Session is kept open to reuse connections between queries.
+
+    The processor page is found as the selenium backend gets to it, through
+    its link in the "Index" frame of the portal. The action, hidden fields,
+    query textarea and submit button of its form are read from that page the
+    first time a program is run. This was checked only against
+    pyredatam.testing.StubWebEngine, not against the live server, which is
+    why the browser remains the default backend of cpv2010arg.
+
+    Args:
+        url (str): Url of the portal of a REDATAM database (it must have the
+            BASE parameter in its query string).
+        session (requests.Session): Session to use. A new one by default.
+        timeout (float): Seconds to wait for each response of the server.
+        processor_url (str): Url of the page with the processor form. By
+            default, it is found from the portal.
+    """
+
+    def __init__(self, url, session=None, timeout=DEFAULT_TIMEOUT,
+                 processor_url=None):
+        self.url = url
+        self.base = _get_base(url)
+        self.processor_url = processor_url
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self._form = None
+        self._form_lock = threading.Lock()
+
+    def run_program(self, query):
+        """Run a REDATAM program and return the html of its result grid.
+
+        Args:
+            query (str): REDATAM query.
+
+        Returns:
+            str: Data result from query in html format.
+        """
+        with stage("server") as record:
+            r = self._post_program(query)
+            html = self._follow_result_frames(r.url, r.text)
+            record.bytes = len(html)
+
+        return html
+
+    def export_program(self, query, path):
+        """Run a REDATAM program and download the file of its export link.
+
+        The result grid is read only until its "Descargar en formato Excel"
+        link, which comes before the table, and the linked file is streamed
+        to path.
+
+        Args:
+            query (str): REDATAM query.
+            path (str): Path where the exported result is written.
+
+        Returns:
+            str: The path.
+        """
+        with stage("server"):
+            r = self._post_program(query)
+            url, html = r.url, r.text
+
+            for _ in range(MAX_FRAME_DEPTH + 1):
+                href = _find_export_href(html)
+                if href:
+                    break
+
+                frame_src = _find_frame_src(html, RESULT_FRAMES)
+                if not frame_src:
+                    raise WebEngineError(
+                        "Result of {} has no export link".format(r.url))
+                url, html = self._get_until_export_link(urljoin(url,
+                                                                frame_src))
+            else:
+                raise WebEngineError(
+                    "Export link not found after following {} frames from "
+                    "{}".format(MAX_FRAME_DEPTH, r.url))
+
+        return download(self.session, urljoin(url, href), path,
+                        self.timeout)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_program_form(self):
+        """Return the form of the processor, read once from its page.
+
+        Returns:
+            tuple: Method and url of the form action, list of (name, value)
+                of its fields and name of the field of the query.
+        """
+        with self._form_lock:
+            if self._form is None:
+                url = self.processor_url or self._find_processor_url()
+                r = self.session.get(url, timeout=self.timeout)
+                r.raise_for_status()
+                self._form = _parse_program_form(r.text, r.url)
+
+        return self._form
+
+    def _find_processor_url(self):
+        r = self.session.get(self.url, timeout=self.timeout)
+        r.raise_for_status()
+        url, html = r.url, r.text
+
+        index_src = _find_frame_src(html, INDEX_FRAMES)
+        if index_src:
+            r = self.session.get(urljoin(url, index_src),
+                                 timeout=self.timeout)
+            r.raise_for_status()
+            url, html = r.url, r.text
+
+        if html.strip():
+            for link in lxml.html.fromstring(html).xpath("//a[@href]"):
+                if PROCESSOR_LINK.search(link.get("href")) or \
+                        PROCESSOR_LINK.search(link.text_content()):
+                    return urljoin(url, link.get("href"))
+
+        raise WebEngineError(
+            "No link to the processor found from {}, pass its processor_url"
+            .format(self.url))
+
+    def _post_program(self, query):
+        if isinstance(query, bytes):
+            query = query.decode("utf-8", "ignore")
+
+        method, action, fields, query_field = self.get_program_form()
+        data = fields + [(query_field, query)]
+
+        if method == "GET":
+            r = self.session.get(action, params=data, timeout=self.timeout)
+        else:
+            r = self.session.post(action, data=data, timeout=self.timeout)
+        r.raise_for_status()
+        return r
+
+    def _get_until_export_link(self, url):
+        """Get a page, stopping the download once its export link is read."""
+        r = self.session.get(url, timeout=self.timeout, stream=True)
+        try:
+            r.raise_for_status()
+            content = b""
+            for chunk in r.iter_content(DOWNLOAD_CHUNK_SIZE):
+                content += chunk
+                if EXPORT_LINK.search(content):
+                    break
+        finally:
+            r.close()
+
+        return r.url, content.decode(r.encoding or "utf-8", "replace")
+
+    def _follow_result_frames(self, url, html):
+        for _ in range(MAX_FRAME_DEPTH):
+            frame_src = _find_frame_src(html, RESULT_FRAMES)
+            if not frame_src:
+                return html
+
+            r = self.session.get(urljoin(url, frame_src),
+                                 timeout=self.timeout)
+            r.raise_for_status()
+            url, html = r.url, r.text
+
+        raise WebEngineError(
+            "Result grid not found after following {} frames from {}".format(
+                MAX_FRAME_DEPTH, url))
+
+
+def download(session, url, path, timeout=DEFAULT_TIMEOUT):
+    """Stream the content of a url to a file, without holding it in memory.
+
+    Args:
+        session (requests.Session): Session used to get the file.
+        url (str): Url of the file.
+        path (str): Path where the file is written.
+        timeout (float): Seconds to wait for each response of the server.
+
+    Returns:
+        str: The path.
+    """
+    with stage("download") as record:
+        r = session.get(url, timeout=timeout, stream=True)
+        try:
+            r.raise_for_status()
+            record.bytes = 0
+            with open(path, "wb") as f:
+                for chunk in r.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+                    record.bytes += len(chunk)
+        finally:
+            r.close()
+
+    return path
+
+
+# PRIVATE
+def _get_base(url):
+    params = parse_qs(urlparse(url).query)
+    if "BASE" not in params:
+        raise ValueError("{} has no BASE parameter.".format(url))
+    return params["BASE"][0]
+
+
+def _find_frame_src(html, frame_names):
+    """Return the src of the frame that is deepest in frame_names order."""
+
+    if not html.strip():
+        return None
+
+    doc = lxml.html.fromstring(html)
+    for frame_name in reversed(frame_names):
+        for frame in doc.xpath("//frame | //iframe"):
+            if frame.get("name") == frame_name and frame.get("src"):
+                return frame.get("src")
+
+    return None
+
+
+def _parse_program_form(html, url):
+    """Read the form of the processor page, the one with a textarea."""
+    doc = lxml.html.fromstring(html)
+    for form in doc.forms:
+        textareas = form.xpath(".//textarea[@name]")
+        if not textareas:
+            continue
+
+        query_field = textareas[0].get("name")
+        fields = [(name, value) for name, value in form.form_values()
+                  if name != query_field]
+        # form_values leaves out buttons, but the server expects the submit
+        for button in form.xpath(".//input[@type='submit'][@name]"):
+            fields.append((button.get("name"), button.get("value", "")))
+            break
+
+        return (form.method, urljoin(url, form.get("action") or ""), fields,
+                query_field)
+
+    raise WebEngineError("{} has no processor form".format(url))
+
+
+def _find_export_href(html):
+    match = EXPORT_LINK.search(html.encode("utf-8"))
+    return match.group(1).decode("utf-8") if match else None
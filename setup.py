@@ -34,6 +34,13 @@ setup(
                  'pyredatam'},
     include_package_data=True,
     install_requires=requirements,
+    extras_require={
+        "store": ["pyarrow"],
+        "yaml": ["PyYAML"]
+    },
+    entry_points={
+        "console_scripts": ["pyredatam = pyredatam.cli:main"]
+    },
     license="GPLv3+",
     zip_safe=False,
     keywords='pyredatam',
@@ -43,7 +50,8 @@ setup(
         'License :: OSI Approved :: GNU General Public License v3 or later (GPLv3+)',
         'Natural Language :: English',
         "Programming Language :: Python :: 2",
-        'Programming Language :: Python :: 2.7'
+        'Programming Language :: Python :: 2.7',
+        "Programming Language :: Python :: 3"
     ],
     test_suite='tests',
     tests_require=test_requirements
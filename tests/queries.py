@@ -92,3 +92,84 @@ TABLE TABLE1
     AS MEDIAN
     OF PERSONA.P03
 """
+
+PROGRAM1 = """
+RUNDEF Job
+    SELECTION INLINE,
+     PROV 02
+    UNIVERSE 1 = 1
+
+TABLE TABLE1
+    TITLE "El titulo"
+    AS AREALIST
+    OF FRAC, PERSONA.CONDACT
+
+DEFINE FRAC.COUNTER
+    AS COUNT PERSONA
+    TYPE INTEGER
+
+TABLE TABLE2
+    AS AREALIST
+    OF FRAC, FRAC.COUNTER
+
+DEFINE FRAC.COUNTER2
+    AS COUNT HOGAR
+    TYPE INTEGER
+
+TABLE TABLE3
+    AS AREALIST
+    OF FRAC, FRAC.NOMFRAC, FRAC.COUNTER2
+    TOTAL
+
+TABLE TABLE4
+    AS MEDIAN
+    OF PERSONA.P03
+        BY PERSONA.CONDACT
+    AREABREAK PROV
+"""
+
+MEAN1 = """
+RUNDEF Job
+    UNIVERSE 1 = 1
+
+TABLE TABLE1
+    TITLE "El titulo"
+    AS AVERAGE
+    OF PERSONA.P03
+        BY PERSONA.CONDACT
+        BY PERSONA.P02
+        COMPLETENAME
+    AREABREAK PROV
+"""
+
+CROSS1 = """
+RUNDEF Job
+    SELECTION INLINE,
+     PROV 02
+
+TABLE TABLE1
+    AS CROSSTABS
+    OF PERSONA.P02
+        BY PERSONA.CONDACT
+        COMPLETENAME
+    AREABREAK DPTO
+"""
+
+FREQUENCIES1 = """
+RUNDEF Job
+    UNIVERSE 1 = 1
+
+TABLE TABLE1
+    TITLE "El titulo"
+    AS FREQUENCY
+    OF PERSONA.CONDACT
+"""
+
+STATS1 = """
+RUNDEF Job
+
+TABLE TABLE1
+    AS STATISTICS
+    OF PERSONA.P03
+    AREABREAK PROV
+"""
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_aio
+
+Tests for `aio` module.
+"""
+
+from __future__ import unicode_literals
+import time
+import unittest
+import nose
+
+from pyredatam import aio
+from pyredatam.testing import StubWebEngine, arealist_html
+from . import queries
+
+
+@unittest.skipIf(aio.asyncio is None, "asyncio needs Python 3.4+")
+class AsyncRedatamTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = aio.asyncio.new_event_loop()
+        aio.asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        aio.asyncio.set_event_loop(None)
+
+    def test_make_arealist_queries(self):
+        all_queries = [queries.AREALIST1, queries.AREALIST2,
+                       queries.AREALIST3]
+
+        with StubWebEngine(arealist_html(3)) as stub:
+            with aio.AsyncRedatam(2, backend="http", url=stub.url,
+                                  cache=False) as redatam:
+                dfs = self.loop.run_until_complete(aio.asyncio.gather(
+                    *[redatam.make_arealist_query(query)
+                      for query in all_queries]))
+
+        self.assertEqual([len(df) for df in dfs], [3, 3, 3])
+        self.assertEqual(sorted(stub.programs), sorted(all_queries))
+
+    def test_queued_queries_hold_no_thread(self):
+        events = []
+
+        def slow_query(query, url, **kwargs):
+            events.append(("start", query))
+            time.sleep(0.2)
+            events.append(("end", query))
+
+        make_query = aio.cpv2010arg.make_query
+        aio.cpv2010arg.make_query = slow_query
+        try:
+            with aio.AsyncRedatam(2, max_per_server=1) as redatam:
+                first = redatam.make_query("a1", url="a")
+                queued = redatam.make_query("a2", url="a")
+                other = redatam.make_query("b1", url="b")
+                self.loop.call_later(0.05, queued.cancel)
+                self.loop.run_until_complete(aio.asyncio.wait(
+                    [first, queued, other]))
+        finally:
+            aio.cpv2010arg.make_query = make_query
+
+        # b1 doesn't wait for a thread held by a2, and a2 is never made
+        self.assertLess(events.index(("start", "b1")),
+                        events.index(("end", "a1")))
+        self.assertNotIn(("start", "a2"), events)
+        self.assertTrue(queued.cancelled())
+
+    def test_browser_queries_share_a_pool(self):
+        closed = []
+
+        class FakePool(object):
+
+            def __init__(self, size, url):
+                self.size = size
+
+            def close(self):
+                closed.append(self)
+
+        make_pool = aio.cpv2010arg.make_pool
+        aio.cpv2010arg.make_pool = FakePool
+        try:
+            with aio.AsyncRedatam(8) as redatam:
+                pool = redatam.kwargs["pool"]
+            with aio.AsyncRedatam(8, backend="http") as http_redatam:
+                self.assertIsNone(http_redatam.kwargs["pool"])
+        finally:
+            aio.cpv2010arg.make_pool = make_pool
+
+        self.assertEqual(pool.size, 8)
+        self.assertEqual(closed, [pool])
+
+    def test_timeout(self):
+        def slow_query(query, **kwargs):
+            time.sleep(0.5)
+
+        make_query = aio.cpv2010arg.make_query
+        aio.cpv2010arg.make_query = slow_query
+        try:
+            with aio.AsyncRedatam(timeout=0.05) as redatam:
+                self.assertRaises(
+                    aio.asyncio.TimeoutError, self.loop.run_until_complete,
+                    redatam.make_query(queries.AREALIST1))
+        finally:
+            aio.cpv2010arg.make_query = make_query
+
+
+if __name__ == '__main__':
+    nose.run(defaultTest=__name__)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_cache
+
+Tests for `cache` module.
+"""
+
+from __future__ import unicode_literals
+import os
+import time
+import shutil
+import tempfile
+import unittest
+import nose
+
+from pyredatam import cpv2010arg
+from pyredatam.cache import QueryCache, make_key
+from pyredatam.testing import StubWebEngine, arealist_html
+from . import queries
+
+URL = "http://localhost/RpWebEngine.exe/PortalAction"
+
+
+class QueryCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = QueryCache(self.cache_dir, ttl=None, max_size=None)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_get_set(self):
+        self.assertIsNone(self.cache.get(queries.AREALIST1, URL))
+
+        self.cache.set(queries.AREALIST1, URL, "<html>ñ</html>")
+        self.assertEqual(self.cache.get(queries.AREALIST1, URL),
+                         "<html>ñ</html>")
+        self.assertIsNone(self.cache.get(queries.AREALIST1, URL + "?BASE=X"))
+        self.assertIsNone(self.cache.get(queries.AREALIST2, URL))
+
+    def test_key_is_normalized(self):
+        query = queries.AREALIST1.strip()
+        messy_query = "\r\n".join(line + "  " for line in query.splitlines())
+
+        self.assertEqual(make_key(query, URL), make_key(messy_query, URL))
+        self.assertEqual(make_key(query.encode("utf-8"), URL),
+                         make_key(query, URL))
+        self.assertNotEqual(make_key(query, URL),
+                            make_key(queries.AREALIST2, URL))
+
+    def test_ttl(self):
+        self.cache.ttl = 60
+        self.cache.set(queries.AREALIST1, URL, "<html></html>")
+        path = self.cache._path(self.cache.key(queries.AREALIST1, URL))
+
+        old = time.time() - 120
+        os.utime(path, (old, old))
+
+        self.assertIsNone(self.cache.get(queries.AREALIST1, URL))
+        self.assertFalse(os.path.exists(path))
+
+    def test_lru_eviction(self):
+        for age, query in enumerate([queries.AREALIST1, queries.AREALIST2,
+                                     queries.AREALIST3]):
+            self.cache.set(query, URL, "x" * 10)
+            path = self.cache._path(self.cache.key(query, URL))
+            mtime = time.time() - 100 + age
+            os.utime(path, (mtime, mtime))
+
+        # reading the oldest entry makes it the most recently used one
+        self.cache.get(queries.AREALIST1, URL)
+        self.cache.max_size = 25
+        self.assertEqual(self.cache.evict(), 1)
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNotNone(self.cache.get(queries.AREALIST1, URL))
+        self.assertIsNone(self.cache.get(queries.AREALIST2, URL))
+
+    def test_make_query_uses_cache(self):
+        self.cache.set(queries.AREALIST1, cpv2010arg.BASE_URL, "<cached/>")
+
+        html = cpv2010arg.make_query(queries.AREALIST1, cache=self.cache)
+        self.assertEqual(html, "<cached/>")
+
+    def test_make_query_fills_empty_cache(self):
+        with StubWebEngine(arealist_html(3)) as stub:
+            for _ in range(3):
+                cpv2010arg.make_query(queries.AREALIST1, url=stub.url,
+                                      backend="http", cache=self.cache)
+
+        self.assertEqual(len(stub.programs), 1)
+        self.assertEqual(len(self.cache), 1)
+
+    def test_make_query_does_not_cache_errors(self):
+        self.cache.set(queries.AREALIST2, URL, "<cached/>")
+        error = "<html><body>El servidor está ocupado</body></html>"
+
+        with StubWebEngine(error) as stub:
+            for _ in range(2):
+                html = cpv2010arg.make_query(queries.AREALIST1, url=stub.url,
+                                             backend="http", cache=self.cache)
+
+        self.assertEqual(html, error)
+        self.assertEqual(len(stub.programs), 2)
+        self.assertEqual(len(self.cache), 1)
+
+
+if __name__ == '__main__':
+    nose.run(defaultTest=__name__)
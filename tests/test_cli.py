@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_cli
+
+Tests for `cli` module.
+"""
+
+from __future__ import unicode_literals
+import io
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+import nose
+import pandas as pd
+
+from pyredatam import cli
+from pyredatam.testing import StubWebEngine, arealist_html
+from . import queries
+
+
+class CliTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.spec_path = os.path.join(self.temp_dir, "spec.json")
+        self.output_dir = os.path.join(self.temp_dir, "results")
+        self.spec = {
+            "defaults": {"area_filter": {"PROV": ["02", "06"]},
+                         "universe_filter": "1 = 1"},
+            "queries": [
+                {"name": "condact", "type": "arealist", "area_level": "FRAC",
+                 "variables": "PERSONA.CONDACT", "title": "El titulo"},
+                {"name": "hogares", "type": "counter", "area_level": "DPTO",
+                 "entity_count": "HOGAR", "area_filter": {"PROV": "02"}}]}
+        with io.open(self.spec_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(self.spec, ensure_ascii=False))
+
+        self.output = ""
+        self._stdout = sys.stdout
+        sys.stdout = self
+
+    def tearDown(self):
+        sys.stdout = self._stdout
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, text):
+        self.output += text
+
+    @property
+    def lines(self):
+        return self.output.splitlines()
+
+    def test_render_queries(self):
+        rendered = cli.render_queries(cli.load_spec(self.spec_path))
+
+        self.assertEqual(list(rendered), [("condact", "arealist"),
+                                          ("hogares", "counter")])
+        self.assertEqual(rendered["condact", "arealist"],
+                         queries.AREALIST1.strip().replace("03", "06"))
+        self.assertIn("PROV 02\n", rendered["hogares", "counter"])
+
+        self.assertRaises(ValueError, cli.render_queries,
+                          [{"name": "x", "type": "pie"}])
+
+    def test_main(self):
+        with StubWebEngine(arealist_html(5)) as stub:
+            code = cli.main([self.spec_path, "-o", self.output_dir,
+                             "--url", stub.url, "-b", "http", "--no-cache",
+                             "-j", "2"])
+
+        self.assertEqual(code, 0)
+        self.assertEqual(len(stub.programs), 2)
+
+        df = pd.read_csv(os.path.join(self.output_dir, "condact.csv"),
+                         dtype={"Código": str}, encoding="utf-8")
+        self.assertEqual(len(df), 5)
+        self.assertEqual(df["Código"][0], "020010101")
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir,
+                                                    "hogares.csv")))
+
+        # a line for each query and the summary
+        self.assertEqual(len(self.lines), 3)
+        self.assertTrue(self.lines[-1].startswith(
+            "2 queries (0 failed), 10 rows in"))
+
+    def test_failed_query(self):
+        with StubWebEngine("<html>Error de sintaxis</html>") as stub:
+            code = cli.main([self.spec_path, "-o", self.output_dir,
+                             "--url", stub.url, "-b", "http", "--no-cache",
+                             "--retries", "0"])
+
+        self.assertEqual(code, 1)
+        self.assertIn("FAILED", self.lines[0])
+        self.assertIn("Error de sintaxis", self.lines[0])
+
+    def test_selenium_by_default(self):
+        args = cli._get_parser().parse_args([self.spec_path])
+        self.assertEqual(args.backend, "selenium")
+
+    def test_dry_run(self):
+        self.assertEqual(cli.main([self.spec_path, "--dry-run"]), 0)
+        self.assertEqual(self.lines[0], "# condact")
+        self.assertFalse(os.path.exists(self.output_dir))
+
+
+if __name__ == '__main__':
+    nose.run(defaultTest=__name__)
@@ -8,10 +8,26 @@ Tests for `cpv2010arg` module.
 """
 
 from __future__ import unicode_literals
+import io
+import os
+import shutil
+import tempfile
 import unittest
 import nose
+import pandas as pd
+import requests
 
+import pyredatam
 import pyredatam.cpv2010arg
+from pyredatam.cpv2010arg import parse_arealist_to_dataframe
+from pyredatam.cpv2010arg import iter_arealist_rows, iter_arealist_chunks
+from pyredatam.cpv2010arg import parse_crosstab_to_dataframe
+from pyredatam.cpv2010arg import read_export_to_dataframe
+from pyredatam.cpv2010arg import compact_arealist_dataframe
+from pyredatam.cpv2010arg import pad_area_codes
+from pyredatam.testing import StubWebEngine, arealist_html, program_html
+from pyredatam.testing import crosstab_html, arealist_export
+from . import queries
 
 
 class Cpv2010argTestCase(unittest.TestCase):
@@ -19,6 +35,286 @@ class Cpv2010argTestCase(unittest.TestCase):
     def test_feature(self):
         pass
 
+    def test_parse_arealist_to_dataframe(self):
+        html = arealist_html(3)
+        df = parse_arealist_to_dataframe(html)
+
+        self.assertEqual(list(df.columns),
+                         ["Código", "Ocupado", "Desocupado", "Inactivo"])
+        self.assertEqual(list(df["Código"]),
+                         ["020010101", "020010102", "020010103"])
+        self.assertEqual(list(df.iloc[1]), ["020010102", 37, 1046, 2055])
+        self.assertTrue(all(dtype.kind == "i" for dtype in df.dtypes[1:]))
+
+        # thousands separator
+        df = parse_arealist_to_dataframe(arealist_html(300))
+        self.assertEqual(df["Inactivo"][299], (299 * 37 + 2018) % 20000)
+        self.assertEqual(len(df), 300)
+
+    def test_parse_arealist_with_names(self):
+        html = arealist_html(2, ["Nombre", "Casos"]).replace(
+            "<td>0</td>", "<td>Comuna 1</td>", 1)
+        html = html.replace("<td>37</td>", "<td>Comuna 2</td>", 1)
+        df = parse_arealist_to_dataframe(html)
+
+        self.assertEqual(list(df["Nombre"]), ["Comuna 1", "Comuna 2"])
+        self.assertEqual(list(df["Casos"]), [1009, 1046])
+
+    def test_parse_compact_arealist(self):
+        html = arealist_html(300)
+        df = parse_arealist_to_dataframe(html)
+        compact = parse_arealist_to_dataframe(html, compact=True)
+
+        # RADIO codes are not in the ids, so they are kept as int32
+        self.assertEqual(compact["Código"].dtype.name, "int32")
+        self.assertEqual(list(pad_area_codes(compact["Código"], "RADIO")),
+                         list(df["Código"]))
+        self.assertEqual(compact["Ocupado"].dtype.name, "int16")
+        self.assertEqual(list(compact["Ocupado"]), list(df["Ocupado"]))
+        self.assertEqual(compact.memory_usage()["Ocupado"],
+                         df.memory_usage()["Ocupado"] / 4)
+
+        dptos = compact_arealist_dataframe(pd.DataFrame(
+            {"Código": ["02007", "06014"], "Casos": [1, 70000]},
+            columns=["Código", "Casos"]))
+        self.assertEqual(dptos["Código"].dtype.name, "category")
+        self.assertEqual(len(dptos["Código"].cat.categories), 527)
+        self.assertEqual(list(dptos["Código"]), ["02007", "06014"])
+        self.assertEqual(dptos["Código"].cat.codes.dtype.name, "int16")
+        self.assertEqual(dptos["Casos"].dtype.name, "int32")
+
+    def test_parse_empty_arealist(self):
+        df = parse_arealist_to_dataframe(arealist_html(0))
+        self.assertEqual(len(df), 0)
+        self.assertEqual(len(df.columns), 4)
+
+    def test_parse_crosstab_to_dataframe(self):
+        html = crosstab_html(["Varón", "Mujer"], ["Ocupado", "Inactivo"])
+        df = parse_crosstab_to_dataframe(html)
+
+        self.assertEqual(list(df.index), ["Varón", "Mujer"])
+        self.assertEqual(df.index.name, "Categorías")
+        self.assertEqual(list(df.columns), ["Ocupado", "Inactivo", "Total"])
+        self.assertEqual(list(df.loc["Mujer"]), [37, 1046, 1083])
+        self.assertTrue(all(dtype.kind == "i" for dtype in df.dtypes))
+
+        df = parse_crosstab_to_dataframe(html, incl_total=True)
+        self.assertEqual(list(df.index), ["Varón", "Mujer", "Total"])
+
+    def test_parse_crosstab_with_area_break(self):
+        html = crosstab_html(["Varón", "Mujer"], ["Media"], ["02", "06"],
+                             decimals=True)
+        df = parse_crosstab_to_dataframe(html)
+
+        self.assertEqual(df.index.names, ["Código", "Categorías"])
+        self.assertEqual(list(df.index), [("02", "Varón"), ("02", "Mujer"),
+                                          ("06", "Varón"), ("06", "Mujer")])
+        self.assertEqual(df.loc[("06", "Mujer"), "Media"], 0.44)
+        self.assertEqual(df["Media"].dtype.kind, "f")
+
+    def test_make_crosstab_query(self):
+        query = pyredatam.cross_query("PERSONA.P02", "PERSONA.CONDACT",
+                                      area_break="PROV")
+        html = crosstab_html(["Varón", "Mujer"], ["Ocupado"], ["02"])
+
+        with StubWebEngine(html) as stub:
+            df = pyredatam.cpv2010arg.make_cross_query(
+                query, backend="http", url=stub.url, cache=False)
+
+        self.assertEqual(stub.programs, [query])
+        self.assertEqual(list(df["Ocupado"]), [0, 37])
+
+    def test_make_program_query(self):
+        html = program_html([arealist_html(3),
+                             arealist_html(2, ["FRAC.COUNTER"]),
+                             arealist_html(4, ["Nombre", "FRAC.COUNTER2"])])
+
+        with StubWebEngine(html) as stub:
+            dfs = pyredatam.cpv2010arg.make_program_query(
+                queries.PROGRAM1, backend="http", url=stub.url, cache=False)
+
+        self.assertEqual(stub.programs, [queries.PROGRAM1])
+        self.assertEqual([len(df) for df in dfs], [3, 2, 4])
+        self.assertEqual(list(dfs[1].columns), ["Código", "FRAC.COUNTER"])
+        self.assertEqual(list(dfs[2]["FRAC.COUNTER2"]), [1009, 1046, 1083,
+                                                         1120])
+
+        self.assertRaises(ValueError,
+                          pyredatam.cpv2010arg.parse_program_to_dataframes,
+                          html, [parse_arealist_to_dataframe])
+
+    def test_read_export_to_dataframe(self):
+        temp_dir = tempfile.mkdtemp()
+        path = os.path.join(temp_dir, "result.xls")
+        export = arealist_export(4, ["Nombre", "Ocupado"], sep=";")
+        export = export.replace(";1009", ";1.009")  # thousands separator
+
+        try:
+            with io.open(path, "w", encoding="latin-1") as f:
+                f.write(export.replace("Nombre;", "Área;"))
+            df = read_export_to_dataframe(path)
+
+            with io.open(path, "w", encoding="utf-8") as f:
+                f.write(arealist_html(4))
+            from_html = read_export_to_dataframe(path)
+        finally:
+            shutil.rmtree(temp_dir)
+
+        self.assertEqual(list(df.columns), ["Código", "Área", "Ocupado"])
+        self.assertEqual(list(df["Código"]), ["020010101", "020010102",
+                                              "020010103", "020010104"])
+        self.assertEqual(list(df["Ocupado"]), [1009, 1046, 1083, 1120])
+        self.assertEqual(df["Ocupado"].dtype, "int64")
+        self.assertEqual(len(from_html), 4)
+
+    def test_read_excel_export_codes(self):
+        temp_dir = tempfile.mkdtemp()
+        path = os.path.join(temp_dir, "result.xls")
+        empty = float("nan")
+        raw = pd.DataFrame([["AREA # RADIO", empty], ["Código", "Casos"],
+                            [20010101, 5.0], [940140203, 7.0],
+                            ["Procesado con Redatam+SP", empty]])
+
+        def read_excel(path, header, dtype):
+            self.assertEqual(dtype, object)
+            return raw
+
+        read_excel_original = pyredatam.cpv2010arg.pd.read_excel
+        pyredatam.cpv2010arg.pd.read_excel = read_excel
+        try:
+            with open(path, "wb") as f:
+                f.write(b"\xd0\xcf\x11\xe0")
+            df = read_export_to_dataframe(path)
+        finally:
+            pyredatam.cpv2010arg.pd.read_excel = read_excel_original
+            shutil.rmtree(temp_dir)
+
+        self.assertEqual(list(df["Código"]), ["020010101", "940140203"])
+        self.assertEqual(list(df["Casos"]), [5, 7])
+
+    def test_iter_arealist_rows(self):
+        html = arealist_html(5)
+        rows = list(iter_arealist_rows(io.BytesIO(html.encode("utf-8"))))
+
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(list(rows[1].items()),
+                         [("Código", "020010102"), ("Ocupado", 37),
+                          ("Desocupado", 1046), ("Inactivo", 2055)])
+
+    def test_iter_arealist_chunks(self):
+        html = arealist_html(2500)
+        temp_dir = tempfile.mkdtemp()
+        path = os.path.join(temp_dir, "result.html")
+        with io.open(path, "w", encoding="utf-8") as f:
+            f.write(html)
+
+        try:
+            chunks = list(iter_arealist_chunks(path, chunksize=1000))
+        finally:
+            shutil.rmtree(temp_dir)
+
+        self.assertEqual([len(chunk) for chunk in chunks], [1000, 1000, 500])
+        df = pd.concat(chunks, ignore_index=True)
+        pd.testing.assert_frame_equal(
+            df, parse_arealist_to_dataframe(html))
+
+        chunks = list(iter_arealist_chunks(
+            io.BytesIO(arealist_html(0).encode("utf-8"))))
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(len(chunks[0]), 0)
+
+
+class ScrapeDictionaryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.checkpoint_path = os.path.join(self.temp_dir, "dict.partial")
+        self.requested = []
+        self.fail_on = None
+
+        def fake_request(session, url, variables):
+            self.requested.append(list(variables))
+            if self.fail_on in variables:
+                raise IOError("server down")
+            return {variable: [["1", variable + " uno"]]
+                    for variable in variables}
+
+        self._request_categories = pyredatam.cpv2010arg._request_categories
+        pyredatam.cpv2010arg._request_categories = fake_request
+
+    def tearDown(self):
+        pyredatam.cpv2010arg._request_categories = self._request_categories
+        shutil.rmtree(self.temp_dir)
+
+    def get_dictionary(self):
+        return {"HOGAR": {"H{:02d}".format(i): [] for i in range(5)},
+                "PERSONA": {"P{:02d}".format(i): [] for i in range(3)}}
+
+    def test_scrape_categories(self):
+        dictionary = self.get_dictionary()
+        pyredatam.cpv2010arg.scrape_categories(
+            dictionary, ["HOGAR", "PERSONA"], batch_size=2)
+
+        # batches never mix variables of different entities
+        self.assertEqual(sorted(len(batch) for batch in self.requested),
+                         [1, 1, 2, 2, 2])
+        for batch in self.requested:
+            self.assertEqual(len(set(v.split(".")[0] for v in batch)), 1)
+
+        self.assertEqual(dictionary["PERSONA"]["P01"],
+                         [("1", "PERSONA.P01 uno")])
+
+    def test_resume_from_checkpoint(self):
+        self.fail_on = "HOGAR.H04"
+        self.assertRaises(IOError, pyredatam.cpv2010arg.scrape_categories,
+                          self.get_dictionary(), ["HOGAR", "PERSONA"],
+                          checkpoint_path=self.checkpoint_path, batch_size=2,
+                          max_workers=1, retries=0)
+        self.assertTrue(os.path.exists(self.checkpoint_path))
+
+        self.fail_on = None
+        self.requested = []
+        dictionary = self.get_dictionary()
+        pyredatam.cpv2010arg.scrape_categories(
+            dictionary, ["HOGAR", "PERSONA"],
+            checkpoint_path=self.checkpoint_path, batch_size=2)
+
+        self.assertIn(["HOGAR.H04"], self.requested)
+        self.assertNotIn(["HOGAR.H00", "HOGAR.H01"], self.requested)
+        self.assertEqual(dictionary["HOGAR"]["H04"], [("1", "HOGAR.H04 uno")])
+        self.assertEqual(dictionary["HOGAR"]["H00"], [("1", "HOGAR.H00 uno")])
+
+    def test_request_categories(self):
+        html = """<html><head><meta charset="utf-8"></head>
+<body><textarea id="redInput">
+Nombre : P02
+Entidad : PERSONA
+ 1. Varón
+ 2. Mujer
+
+Nombre : P03
+Entidad : PERSONA
+</textarea></body></html>"""
+
+        class FakeSession(object):
+
+            def post(self, url, data):
+                self.data = data
+                response = requests.Response()
+                response.status_code = 200
+                response._content = html.encode("utf-8")
+                return response
+
+        session = FakeSession()
+        categories = self._request_categories(
+            session, "http://redatam", ["PERSONA.P02", "PERSONA.P03"])
+
+        self.assertEqual(session.data["VARIABLE"],
+                         ["PERSONA.P02", "PERSONA.P03"])
+        self.assertEqual(categories, {"PERSONA.P02": [("1", "Varón"),
+                                                      ("2", "Mujer")],
+                                      "PERSONA.P03": []})
+
 
 if __name__ == '__main__':
     nose.run(defaultTest=__name__)
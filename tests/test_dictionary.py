@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_dictionary
+
+Tests for `dictionary` module.
+"""
+
+from __future__ import unicode_literals
+import os
+import shutil
+import tempfile
+import unittest
+import nose
+import pandas as pd
+
+from pyredatam import cpv2010arg
+from pyredatam.dictionary import VariableDictionary, diff_dictionaries
+from pyredatam.utils import get_data_dir
+
+
+class VariableDictionaryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dictionary = cpv2010arg.get_variable_dictionary()
+
+    def test_memoized(self):
+        self.assertIs(cpv2010arg.get_variable_dictionary(), self.dictionary)
+
+        # get_dictionary returns copies that can be modified safely
+        raw = cpv2010arg.get_dictionary()
+        raw["PERSONA"]["CONDACT"].append(["4", "Otro"])
+        raw = cpv2010arg.get_dictionary()
+        self.assertEqual(len(raw["PERSONA"]["CONDACT"]), 3)
+
+    def test_lookups(self):
+        self.assertIn("PERSONA", self.dictionary.entities())
+        self.assertIn("PERSONA.CONDACT", self.dictionary.variables("PERSONA"))
+        self.assertIn("PERSONA.CONDACT", self.dictionary)
+        self.assertNotIn("PERSONA.CONDAC", self.dictionary)
+
+        self.assertEqual(list(self.dictionary.categories("PERSONA.P02")),
+                         ["1", "2"])
+        self.assertEqual(self.dictionary.label("PERSONA.P02", "2"), "Mujer")
+        self.assertEqual(self.dictionary.label("PERSONA.P02", 1.0), "Varón")
+
+    def test_decode_categories(self):
+        df = pd.DataFrame({"CONDACT": [1, 3, 2, 9], "casos": [4, 5, 6, 7]})
+        decoded = self.dictionary.decode_categories(df, "PERSONA.CONDACT")
+
+        self.assertEqual(list(decoded["CONDACT"]),
+                         ["Ocupado", "Inactivo", "Desocupado", 9])
+        self.assertEqual(list(df["CONDACT"]), [1, 3, 2, 9])
+
+    def test_decode_categories_as_categorical(self):
+        df = pd.DataFrame({"CONDACT": [1, 3, 2, 9] * 1000})
+        decoded = self.dictionary.decode_categories(df, "PERSONA.CONDACT",
+                                                    categorical=True)
+
+        self.assertEqual(decoded["CONDACT"].dtype.name, "category")
+        self.assertEqual(decoded["CONDACT"].cat.codes.dtype.name, "int8")
+        self.assertEqual(list(decoded["CONDACT"][:4]),
+                         ["Ocupado", "Inactivo", "Desocupado", 9])
+
+    def test_snapshot(self):
+        temp_dir = tempfile.mkdtemp()
+        json_path = os.path.join(get_data_dir(), "cpv2010arg_diccionario.json")
+        snapshot_path = os.path.join(temp_dir, "dictionary.pickle")
+
+        try:
+            dictionary = VariableDictionary.from_json(json_path, snapshot_path)
+            self.assertTrue(os.path.exists(snapshot_path))
+
+            from_snapshot = VariableDictionary.from_json(json_path,
+                                                         snapshot_path)
+            self.assertEqual(from_snapshot.raw, dictionary.raw)
+            self.assertEqual(from_snapshot.label("PERSONA.P02", "1"), "Varón")
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_diff_dictionaries(self):
+        new = {entity: dict(variables)
+               for entity, variables in self.dictionary.raw.items()}
+        new["PERSONA"] = dict(new["PERSONA"], P02=[("1", "Varón")],
+                              P99=[])
+        del new["HOGAR"]
+
+        changes = diff_dictionaries(self.dictionary.raw, new)
+
+        self.assertEqual(changes["added"], ["PERSONA.P99"])
+        self.assertEqual(changes["changed"], ["PERSONA.P02"])
+        self.assertEqual(changes["removed"],
+                         sorted(self.dictionary.variables("HOGAR")))
+        self.assertEqual(diff_dictionaries(self.dictionary.raw,
+                                           self.dictionary.raw),
+                         {"added": [], "removed": [], "changed": []})
+
+
+if __name__ == '__main__':
+    nose.run(defaultTest=__name__)
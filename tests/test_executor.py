@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_executor
+
+Tests for `executor` module.
+"""
+
+from __future__ import unicode_literals
+import time
+import threading
+import unittest
+import nose
+
+from pyredatam import cpv2010arg
+from pyredatam.executor import run_concurrently
+from pyredatam.testing import StubWebEngine, arealist_html
+from . import queries
+
+
+class RunConcurrentlyTestCase(unittest.TestCase):
+
+    def test_ordered(self):
+        def slow_square(x):
+            time.sleep(0.01 * (5 - x))
+            return x * x
+
+        results = list(run_concurrently(slow_square, range(5)))
+        self.assertEqual(results, [(i, i * i) for i in range(5)])
+
+        results = list(run_concurrently(slow_square, range(5), ordered=False))
+        self.assertEqual(sorted(results), [(i, i * i) for i in range(5)])
+        self.assertNotEqual(results[0], (0, 0))
+
+    def test_retries(self):
+        calls = []
+
+        def flaky(x):
+            calls.append(x)
+            if len(calls) < 3:
+                raise IOError("server busy")
+            return x
+
+        results = list(run_concurrently(flaky, [7], retries=2, backoff=0))
+        self.assertEqual(results, [(0, 7)])
+        self.assertEqual(len(calls), 3)
+
+    def test_errors(self):
+        def fail(x):
+            raise IOError("server down")
+
+        results = run_concurrently(fail, [1], retries=0)
+        self.assertRaises(IOError, list, results)
+
+        results = list(run_concurrently(fail, [1], retries=0,
+                                        return_exceptions=True))
+        self.assertIsInstance(results[0][1], IOError)
+
+    def test_max_per_key(self):
+        running = {"a": 0, "b": 0}
+        max_running = {"a": 0, "b": 0}
+        lock = threading.Lock()
+
+        def work(key):
+            with lock:
+                running[key] += 1
+                max_running[key] = max(max_running[key], running[key])
+            time.sleep(0.01)
+            with lock:
+                running[key] -= 1
+
+        list(run_concurrently(work, ["a", "b"] * 6, max_workers=8,
+                              limit_key=lambda key: key, max_per_key=2))
+        self.assertEqual(max_running, {"a": 2, "b": 2})
+
+
+class MakeQueriesTestCase(unittest.TestCase):
+
+    def test_make_queries(self):
+        with StubWebEngine(arealist_html(4)) as stub:
+            all_queries = [queries.AREALIST1, queries.AREALIST2,
+                           {"query": queries.AREALIST3}]
+            dfs = cpv2010arg.make_queries(
+                all_queries, backend="http", url=stub.url, cache=False,
+                parser=cpv2010arg.parse_arealist_to_dataframe)
+
+        self.assertEqual([len(df) for df in dfs], [4, 4, 4])
+        self.assertEqual(sorted(stub.programs),
+                         sorted([queries.AREALIST1, queries.AREALIST2,
+                                 queries.AREALIST3]))
+
+    def test_browser_queries_share_a_pool(self):
+        pools = []
+
+        class FakePool(object):
+
+            def __init__(self, size, url):
+                self.size = size
+                self.closed = False
+                pools.append(self)
+
+            def close(self):
+                self.closed = True
+
+        def make_query(query, pool=None, **kwargs):
+            return pool
+
+        originals = cpv2010arg.make_pool, cpv2010arg.make_query
+        cpv2010arg.make_pool, cpv2010arg.make_query = FakePool, make_query
+        try:
+            results = cpv2010arg.make_queries(
+                [queries.AREALIST1, queries.AREALIST2], max_workers=2)
+            http_results = cpv2010arg.make_queries(
+                [queries.AREALIST1], max_workers=2, backend="http")
+        finally:
+            cpv2010arg.make_pool, cpv2010arg.make_query = originals
+
+        self.assertEqual(len(pools), 1)
+        self.assertEqual(results, pools * 2)
+        self.assertEqual(pools[0].size, 2)
+        self.assertTrue(pools[0].closed)
+        self.assertEqual(http_results, [None])
+
+
+if __name__ == '__main__':
+    nose.run(defaultTest=__name__)
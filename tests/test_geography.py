@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_geography
+
+Tests for `geography` module.
+"""
+
+from __future__ import unicode_literals
+import unittest
+import nose
+
+import pyredatam
+from pyredatam import cpv2010arg
+
+
+class GeographyIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.geography = cpv2010arg.get_geography()
+
+    def test_memoized(self):
+        self.assertIs(cpv2010arg.get_geography(), self.geography)
+
+    def test_lookups(self):
+        self.assertEqual(self.geography.name("14"), "Córdoba")
+        self.assertEqual(self.geography.code("cordoba"), "14")
+        self.assertEqual(self.geography.code("Córdoba - Tulumba"), "14175")
+        self.assertEqual(self.geography.code("TULUMBA", "DPTO"), "14175")
+        self.assertRaises(KeyError, self.geography.code, "Atlantis")
+        self.assertRaises(KeyError, self.geography.code, "Capital")
+
+        self.assertIn("14175", self.geography)
+        self.assertNotIn("14999", self.geography)
+
+    def test_hierarchy(self):
+        self.assertEqual(self.geography.level("14175"), "DPTO")
+        self.assertEqual(self.geography.level("141750101"), "RADIO")
+        self.assertEqual(self.geography.parent("14175"), "14")
+        self.assertEqual(self.geography.parent("141750101"), "1417501")
+        self.assertIsNone(self.geography.parent("14"))
+
+        children = self.geography.children("14")
+        self.assertEqual(len(children), 26)
+        self.assertTrue(all(child.startswith("14") for child in children))
+        self.assertRaises(ValueError, self.geography.children, "14", "FRAC")
+
+    def test_search(self):
+        self.assertEqual(self.geography.search("san lu", "PROV"), ["74"])
+        self.assertIn("14175", self.geography.search("Tulumb"))
+        self.assertEqual(self.geography.search("Cordova", "PROV",
+                                               fuzzy=True), ["14"])
+
+    def test_expand_area_filter(self):
+        area_filter = {"DPTO": ["Tierra del Fuego, Antártida e Islas del "
+                                "Atlántico Sur", "14175"]}
+        self.assertEqual(self.geography.expand_area_filter(area_filter),
+                         {"DPTO": ["94007", "94014", "94021", "94028",
+                                   "14175"]})
+
+        self.assertEqual(self.geography.expand_area_filter({"PROV": "Jujuy"}),
+                         {"PROV": ["38"]})
+
+    def test_arealist_query_with_geography(self):
+        query = pyredatam.arealist_query("FRAC", "PERSONA.CONDACT",
+                                         {"PROV": ["Catamarca", "Jujuy"]},
+                                         geography=self.geography)
+        self.assertIn("     PROV 10, 38", query)
+
+
+if __name__ == '__main__':
+    nose.run(defaultTest=__name__)
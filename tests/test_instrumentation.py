@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_instrumentation
+
+Tests for `instrumentation` module.
+"""
+
+from __future__ import unicode_literals
+import logging
+import unittest
+import nose
+
+from pyredatam import cpv2010arg
+from pyredatam.instrumentation import stage, trace, add_listener, \
+    remove_listener, Counters, LoggingListener
+from pyredatam.testing import StubWebEngine, arealist_html
+from . import queries
+
+
+class InstrumentationTestCase(unittest.TestCase):
+
+    def test_trace_http_query(self):
+        with StubWebEngine(arealist_html(5)) as stub:
+            with trace() as query_trace:
+                cpv2010arg.make_arealist_query(queries.AREALIST1, cache=False,
+                                               backend="http", url=stub.url)
+
+        self.assertEqual([event.stage for event in query_trace.events],
+                         ["server", "parse"])
+        server, parse = query_trace.events
+        self.assertEqual(server.bytes, len(stub.result_html))
+        self.assertEqual(parse.rows, 5)
+        self.assertFalse(server.failed)
+        self.assertAlmostEqual(query_trace.total(),
+                               sum(query_trace.durations().values()))
+
+    def test_failed_stage(self):
+        counters = Counters()
+        add_listener(counters)
+        try:
+            with trace() as query_trace:
+                with self.assertRaises(ValueError):
+                    with stage("parse"):
+                        raise ValueError()
+        finally:
+            remove_listener(counters)
+
+        self.assertTrue(query_trace.events[0].failed)
+        self.assertEqual(counters.values["parse"]["failures"], 1)
+        self.assertIn('pyredatam_stage_calls_total{stage="parse"} 1',
+                      counters.render())
+
+    def test_trace_is_per_thread_block(self):
+        with trace() as query_trace:
+            pass
+        with stage("parse"):
+            pass
+
+        self.assertEqual(query_trace.events, [])
+
+    def test_failing_listener_does_not_break_query(self):
+        def broken(event):
+            raise RuntimeError()
+
+        counters = Counters()
+        listeners = [broken, LoggingListener(level=logging.DEBUG), counters]
+        for listener in listeners:
+            add_listener(listener)
+        logging.disable(logging.CRITICAL)
+        try:
+            with stage("parse") as record:
+                record.rows = 1
+        finally:
+            logging.disable(logging.NOTSET)
+            for listener in listeners:
+                remove_listener(listener)
+
+        self.assertEqual(counters.values["parse"]["rows"], 1)
+
+
+if __name__ == '__main__':
+    nose.run(defaultTest=__name__)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_jobs
+
+Tests for `jobs` module.
+"""
+
+from __future__ import unicode_literals
+import os
+import shutil
+import tempfile
+import unittest
+import nose
+import pandas as pd
+from collections import OrderedDict
+
+from pyredatam import cpv2010arg
+from pyredatam.jobs import JobManifest, JobError
+from pyredatam.testing import StubWebEngine, arealist_html
+
+
+class JobManifestTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "job.json")
+        self.queries = OrderedDict(
+            ("PROV_{:02d}".format(i), "QUERY {}".format(i))
+            for i in range(2, 8))
+        self.fetched = []
+        self.fail_on = set()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def fetch(self, query):
+        self.fetched.append(query)
+        if query in self.fail_on:
+            raise IOError("server down")
+        return pd.DataFrame({"query": [query]})
+
+    def test_resume_failed_shards(self):
+        manifest = JobManifest(self.path)
+        self.assertEqual(sorted(manifest.plan(self.queries)),
+                         sorted(self.queries))
+
+        self.fail_on = {"QUERY 3", "QUERY 6"}
+        with self.assertRaises(JobError) as context:
+            manifest.run(self.fetch, retries=0)
+        self.assertEqual(sorted(context.exception.errors),
+                         ["PROV_03", "PROV_06"])
+        self.assertEqual(sorted(manifest.failed()), ["PROV_03", "PROV_06"])
+        self.assertRaises(ValueError, manifest.read)
+
+        # a new process loads the manifest and runs only the failed shards
+        self.fail_on = set()
+        self.fetched = []
+        manifest = JobManifest(self.path)
+        self.assertEqual(sorted(manifest.run(self.fetch)),
+                         ["PROV_03", "PROV_06"])
+        self.assertEqual(sorted(self.fetched), ["QUERY 3", "QUERY 6"])
+
+        self.assertEqual([df["query"][0] for df in manifest.read()],
+                         list(self.queries.values()))
+
+    def test_changed_and_missing_shards(self):
+        manifest = JobManifest(self.path)
+        manifest.plan(self.queries)
+        manifest.run(self.fetch)
+        self.assertEqual(manifest.pending(), [])
+
+        queries = OrderedDict(self.queries, PROV_02="QUERY 2 CHANGED")
+        del queries["PROV_07"]
+        self.assertEqual(manifest.plan(queries), ["PROV_02"])
+        self.assertEqual(len(manifest), 5)
+
+        os.remove(os.path.join(manifest.results_dir,
+                               manifest.shards["PROV_04"]["result"]))
+        manifest.invalidate(["PROV_05"])
+        self.assertEqual(sorted(manifest.pending()),
+                         ["PROV_02", "PROV_04", "PROV_05"])
+
+        self.fetched = []
+        manifest.run(self.fetch)
+        self.assertEqual(sorted(self.fetched),
+                         ["QUERY 2 CHANGED", "QUERY 4", "QUERY 5"])
+
+    def test_shards_with_the_same_query(self):
+        manifest = JobManifest(self.path)
+        manifest.plan(OrderedDict([("a", "QUERY"), ("b", "QUERY")]))
+        manifest.run(self.fetch)
+
+        manifest.invalidate(["a"])
+        self.assertEqual(manifest.pending(), ["a"])
+        manifest.plan(OrderedDict([("a", "QUERY")]))
+        self.assertEqual(manifest.pending(), ["a"])
+
+        manifest.run(self.fetch)
+        self.assertEqual(manifest.read()[0]["query"][0], "QUERY")
+
+    def test_make_job_arealist_query(self):
+        with StubWebEngine(arealist_html(3)) as stub:
+            kwargs = {"backend": "http", "url": stub.url, "cache": False}
+            df = cpv2010arg.make_job_arealist_query(
+                self.path, "DPTO", ["PERSONA.CONDACT"], {"PROV": ["02", "06"]},
+                shard_level="PROV", **kwargs)
+            self.assertEqual(len(stub.programs), 2)
+            self.assertEqual(len(df), 6)
+
+            again = cpv2010arg.make_job_arealist_query(
+                self.path, "DPTO", ["PERSONA.CONDACT"], {"PROV": ["02", "06"]},
+                shard_level="PROV", **kwargs)
+            self.assertEqual(len(stub.programs), 2)
+            pd.testing.assert_frame_equal(again, df)
+
+        self.assertEqual(list(JobManifest(self.path).shards),
+                         ["PROV_02-02", "PROV_06-06"])
+
+        self.assertRaises(ValueError, cpv2010arg.make_job_arealist_query,
+                          self.path, "PROV", ["PERSONA.CONDACT"],
+                          shard_level="DPTO")
+
+
+if __name__ == '__main__':
+    nose.run(defaultTest=__name__)
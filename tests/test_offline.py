@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_offline
+
+Tests for `offline` module.
+"""
+
+from __future__ import unicode_literals
+import shutil
+import tempfile
+import unittest
+import nose
+import pandas as pd
+
+import pyredatam
+from pyredatam import cpv2010arg, store
+from pyredatam.offline import OfflineEngine, evaluate_universe
+from pyredatam.dictionary import VariableDictionary
+from . import queries
+
+
+def get_entities():
+    hogar = pd.DataFrame({
+        "HOGAR": [1, 2, 3, 4],
+        "RADIO": ["020010101", "020010102", "020070201", "060070101"],
+        "NHOG": [1, 1, 2, 1]})
+    persona = pd.DataFrame({
+        "HOGAR": [1, 1, 2, 3, 3, 3, 4],
+        "RADIO": ["020010101", "020010101", "020010102", "020070201",
+                  "020070201", "020070201", "060070101"],
+        "CONDACT": [1, 3, 1, 2, 1, 3, 1],
+        "P03": [40, 10, 30, 25, 50, 70, 35]})
+    return {"HOGAR": hogar, "PERSONA": persona}
+
+
+class OfflineEngineTestCase(unittest.TestCase):
+
+    def setUp(self):
+        dictionary = VariableDictionary({"PERSONA": {"CONDACT": [
+            ["1", "Ocupado"], ["2", "Desocupado"], ["3", "Inactivo"]]}})
+        self.engine = OfflineEngine(get_entities(), cpv2010arg.AREA_LEVELS,
+                                    geography=cpv2010arg.get_geography(),
+                                    dictionary=dictionary)
+
+    def test_arealist(self):
+        df = self.engine.run(queries.AREALIST1)
+
+        self.assertEqual(list(df.columns),
+                         ["Código", "Ocupado", "Desocupado", "Inactivo"])
+        self.assertEqual(list(df["Código"]), ["0200101", "0200702"])
+        self.assertEqual(list(df["Ocupado"]), [2, 1])
+        self.assertEqual(list(df["Desocupado"]), [0, 1])
+
+        query = pyredatam.arealist_query("PROV", "PERSONA.CONDACT",
+                                         universe_filter="PERSONA.P03 >= 14")
+        df = self.engine.run(query)
+        self.assertEqual(list(df["Código"]), ["02", "06"])
+        self.assertEqual(list(df["Inactivo"]), [1, 0])
+
+    def test_counter(self):
+        df = self.engine.run(queries.COUNTER2)
+
+        self.assertEqual(list(df.columns),
+                         ["Código", "Nombre", "DPTO.COUNTER"])
+        self.assertEqual(list(df["Código"]), ["02001", "02007", "Total"])
+        self.assertEqual(list(df["DPTO.COUNTER"]), [1, 1, 2])
+
+        query = pyredatam.counter_query(
+            "PROV", "PERSONA", universe_filter="HOGAR.NHOG = 1 AND "
+            "(PERSONA.CONDACT = 1 OR PERSONA.CONDACT = 2)")
+        df = self.engine.run(query)
+        self.assertEqual(list(df["PROV.COUNTER"]), [2, 1])
+
+    def test_median(self):
+        df = self.engine.run(queries.MEDIAN3)
+        self.assertEqual(df["Mediana"].iloc[0], 35)
+
+        query = pyredatam.median_query("PERSONA.P03", "PERSONA.CONDACT",
+                                       incl_name=True, area_break="PROV")
+        df = self.engine.run(query)
+        self.assertEqual(df.loc[("02", "Ocupado"), "Mediana"], 40)
+        self.assertEqual(df.loc[("06", "Ocupado"), "Mediana"], 35)
+
+        query = pyredatam.mean_query("PERSONA.P03", "PERSONA.CONDACT")
+        df = self.engine.run(query)
+        self.assertEqual(df.loc[1, "Media"], (40 + 30 + 50 + 35) / 4.0)
+
+    def test_program(self):
+        program = pyredatam.program_query([
+            {"type": "arealist", "area_level": "DPTO",
+             "variables": "PERSONA.CONDACT"},
+            {"type": "counter", "area_level": "DPTO",
+             "entity_count": "HOGAR"}], {"PROV": "02"})
+
+        df_condact, df_hogares = self.engine.run_program(program)
+        self.assertEqual(list(df_hogares["DPTO.COUNTER"]), [2, 1])
+        self.assertEqual(df_condact["Ocupado"].sum(), 3)
+
+    def test_evaluate_universe(self):
+        values = pd.Series([1, 2, 3])
+        mask = evaluate_universe("NOT (PERSONA.X = 2) AND PERSONA.X <> 3",
+                                 lambda variable: values)
+        self.assertEqual(list(mask), [True, False, False])
+
+        self.assertRaises(ValueError, evaluate_universe, "1 = ", None)
+        self.assertRaises(ValueError, evaluate_universe, "1 = 1 2", None)
+
+    @unittest.skipIf(store.pyarrow is None, "pyarrow is not installed")
+    def test_make_offline_engine(self):
+        data_dir = tempfile.mkdtemp()
+        try:
+            for entity, df in get_entities().items():
+                df.to_parquet("{}/{}.parquet".format(data_dir, entity))
+            engine = cpv2010arg.make_offline_engine(data_dir)
+            df = engine.run(queries.COUNTER1)
+        finally:
+            shutil.rmtree(data_dir)
+
+        self.assertEqual(list(df["RADIO.COUNTER"]), [2, 1, 3])
+
+
+if __name__ == '__main__':
+    nose.run(defaultTest=__name__)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_pool
+
+Tests for `pool` module.
+"""
+
+from __future__ import unicode_literals
+import threading
+import unittest
+import nose
+
+from pyredatam import cpv2010arg
+from pyredatam.pool import WebDriverPool, PoolTimeoutError
+
+URL = "http://localhost/RpWebEngine.exe/PortalAction"
+
+
+class FakeDriver(object):
+
+    def __init__(self):
+        self.parked = 0
+        self.quitted = False
+        self.dead = False
+
+    @property
+    def current_url(self):
+        if self.dead:
+            raise Exception("browser is gone")
+        return URL
+
+    def quit(self):
+        self.quitted = True
+
+
+def park(driver, url):
+    driver.parked += 1
+
+
+class WebDriverPoolTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = WebDriverPool(URL, park, size=2, max_uses=3,
+                                  driver_factory=FakeDriver, visible=True)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_reuse(self):
+        with self.pool.driver() as driver:
+            first = driver
+        with self.pool.driver() as driver:
+            self.assertIs(driver, first)
+
+        self.assertEqual(len(self.pool), 1)
+        # parked when started and when acquired again, not when released
+        self.assertEqual(first.parked, 2)
+
+    def test_park_failure_on_acquire(self):
+        with self.pool.driver() as driver:
+            first = driver
+
+        def fail_park(driver, url):
+            raise Exception("navigation failed")
+
+        self.pool.prepare = fail_park
+        self.assertRaises(Exception, self.pool.acquire)
+        self.assertTrue(first.quitted)
+        self.assertEqual(len(self.pool), 0)
+
+    def test_pool_of_another_url(self):
+        self.assertRaises(ValueError, cpv2010arg.make_query, "RUNDEF Job",
+                          url=cpv2010arg.BASE_URL, pool=self.pool,
+                          cache=False)
+        self.assertEqual(len(self.pool), 0)
+
+    def test_recycle_after_max_uses(self):
+        for _ in range(3):
+            with self.pool.driver() as driver:
+                first = driver
+
+        self.assertTrue(first.quitted)
+        with self.pool.driver() as driver:
+            self.assertIsNot(driver, first)
+
+    def test_broken_driver_is_replaced(self):
+        try:
+            with self.pool.driver() as driver:
+                first = driver
+                raise ValueError()
+        except ValueError:
+            pass
+
+        self.assertTrue(first.quitted)
+        self.assertEqual(len(self.pool), 0)
+
+    def test_health_check(self):
+        with self.pool.driver() as driver:
+            first = driver
+        first.dead = True
+
+        with self.pool.driver() as driver:
+            self.assertIsNot(driver, first)
+        self.assertTrue(first.quitted)
+
+    def test_size_limit(self):
+        self.pool.warm()
+        self.assertEqual(len(self.pool), 2)
+
+        drivers = [self.pool.acquire(), self.pool.acquire()]
+        self.assertRaises(PoolTimeoutError, self.pool.acquire, 0.01)
+
+        threading.Timer(0.05, self.pool.release, [drivers[0]]).start()
+        self.assertIs(self.pool.acquire(1), drivers[0])
+
+
+if __name__ == '__main__':
+    nose.run(defaultTest=__name__)
@@ -8,11 +8,22 @@ Tests for `pyredatam` module.
 """
 
 from __future__ import unicode_literals
+import os
+import sys
+import textwrap
+import subprocess
 import unittest
 import nose
+try:
+    from unittest import mock
+except ImportError:
+    mock = None
 
 import pyredatam
-import queries
+from pyredatam.dictionary import VariableDictionary
+from pyredatam.geography import GeographyIndex
+from pyredatam.utils import LazyModule
+from . import queries
 
 
 class RedatamTestCase(unittest.TestCase):
@@ -104,6 +115,145 @@ class RedatamTestCase(unittest.TestCase):
                                        universe_filter, title)
         self.assertEqual(query, queries.MEDIAN3.strip())
 
+    def test_mean_query(self):
+
+        # Test case MEAN1
+        query = pyredatam.mean_query("PERSONA.P03", "PERSONA.CONDACT",
+                                     "PERSONA.P02", True, "PROV", None,
+                                     "1 = 1", "El titulo")
+        self.assertEqual(query, queries.MEAN1.strip())
+
+    def test_cross_query(self):
+
+        # Test case CROSS1
+        query = pyredatam.cross_query("PERSONA.P02", "PERSONA.CONDACT", True,
+                                      "DPTO", {"PROV": "02"})
+        self.assertEqual(query, queries.CROSS1.strip())
+
+    def test_frequencies_query(self):
+
+        # Test case FREQUENCIES1
+        query = pyredatam.frequencies_query("PERSONA.CONDACT",
+                                            universe_filter="1 = 1",
+                                            title="El titulo")
+        self.assertEqual(query, queries.FREQUENCIES1.strip())
+
+    def test_stats_query(self):
+
+        # Test case STATS1
+        query = pyredatam.stats_query("PERSONA.P03", area_break="PROV")
+        self.assertEqual(query, queries.STATS1.strip())
+
+    def test_program_query(self):
+
+        # Test case PROGRAM1
+        tables = [{"type": "arealist", "area_level": "FRAC",
+                   "variables": "PERSONA.CONDACT", "title": "El titulo"},
+                  {"type": "counter", "area_level": "FRAC",
+                   "entity_count": "PERSONA"},
+                  {"type": "counter", "area_level": "FRAC",
+                   "entity_count": "HOGAR", "incl_area_name": True,
+                   "incl_total": True},
+                  {"type": "median", "variable": "PERSONA.P03",
+                   "by_var1": "PERSONA.CONDACT", "area_break": "PROV"}]
+        query = pyredatam.program_query(tables, {"PROV": "02"}, "1 = 1")
+        self.assertEqual(query, queries.PROGRAM1.strip())
+
+        self.assertRaises(ValueError, pyredatam.program_query,
+                          [{"type": "pie", "variable": "PERSONA.P03"}])
+
+
+class PreparedQueryTestCase(unittest.TestCase):
+
+    def test_render(self):
+        prepared = pyredatam.PreparedQuery("arealist", area_level="FRAC",
+                                           variables=["PERSONA.CONDACT"])
+        self.assertEqual(prepared.render({"PROV": ["02", "03"]}, "1 = 1",
+                                         "El titulo"),
+                         queries.AREALIST1.strip())
+        self.assertEqual(prepared.render(), queries.AREALIST2.strip())
+        self.assertEqual(prepared({"PROV": "02"}), queries.AREALIST3.strip())
+
+        prepared = pyredatam.PreparedQuery("counter", area_level="DPTO",
+                                           entity_count="FRAC",
+                                           incl_area_name=True,
+                                           incl_total=True)
+        self.assertEqual(prepared.render({"PROV": "02"}, "1 = 1",
+                                         "El titulo"),
+                         queries.COUNTER2.strip())
+
+        prepared = pyredatam.PreparedQuery("median", variable="PERSONA.P03")
+        self.assertEqual(prepared.render(), queries.MEDIAN3.strip())
+
+    def test_variables_are_not_modified(self):
+        variables = ["PERSONA.CONDACT"]
+        pyredatam.arealist_query("FRAC", variables, incl_area_name=True)
+        pyredatam.PreparedQuery("arealist", area_level="FRAC",
+                                variables=variables, incl_area_name=True)
+        self.assertEqual(variables, ["PERSONA.CONDACT"])
+
+    def test_validation(self):
+        dictionary = VariableDictionary({"PERSONA": {"CONDACT": []}})
+        geography = GeographyIndex({"PROV": {"02": "Capital"}},
+                                   [("PROV", 2), ("DPTO", 5)])
+
+        self.assertRaises(ValueError, pyredatam.PreparedQuery, "arealist",
+                          dictionary, area_level="FRAC",
+                          variables="PERSONA.CONDAC")
+        self.assertRaises(ValueError, pyredatam.PreparedQuery, "counter",
+                          dictionary, area_level="FRAC",
+                          entity_count="HOGAR")
+
+        prepared = pyredatam.PreparedQuery(
+            "arealist", dictionary, geography, area_level="FRAC",
+            variables="PERSONA.CONDACT")
+        self.assertIn("PROV 02", prepared.render({"PROV": "Capital"}))
+        self.assertRaises(ValueError, prepared.render, {"PROV": "03"})
+
+
+class LazyImportTestCase(unittest.TestCase):
+
+    def test_import_without_backends(self):
+        code = textwrap.dedent("""
+            import sys
+            import pyredatam
+
+            def loaded():
+                return " ".join(module for module in BACKENDS
+                                if module in sys.modules)
+
+            pyredatam.arealist_query("DPTO", "PERSONA.CONDACT")
+            print(loaded())
+            pyredatam.PreparedQuery("arealist", area_level="DPTO",
+                                    variables="PERSONA.CONDACT",
+                                    geography=pyredatam.get_geography())
+            import pyredatam.cli
+            print(loaded())
+            pyredatam.cpv2010arg.make_query
+            print(loaded())
+            """).replace("BACKENDS", repr(
+                [str("pandas"), str("numpy"), str("lxml"), str("selenium"),
+                 str("pyvirtualdisplay"), str("requests"), str("bs4")]))
+        root_dir = os.path.dirname(os.path.dirname(os.path.abspath(
+            __file__)))
+
+        output = subprocess.check_output([sys.executable, "-c", code],
+                                         cwd=root_dir).decode("utf-8")
+
+        # the query builders, the areas and the cli need no backend, but
+        # pandas is loaded with the module making the queries
+        self.assertEqual(output.splitlines()[:2], ["", ""])
+        self.assertIn("pandas", output.splitlines()[2])
+
+    @unittest.skipIf(mock is None, "unittest.mock needs Python 3.3+")
+    def test_patch_through_lazy_module(self):
+        lazy = LazyModule("pyredatam.cpv2010arg")
+        make_query = lazy.make_query
+
+        with mock.patch.object(lazy, "make_query") as patched:
+            self.assertIs(pyredatam.cpv2010arg.make_query, patched)
+        self.assertIs(pyredatam.cpv2010arg.make_query, make_query)
+
 
 if __name__ == '__main__':
     nose.run(defaultTest=__name__)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_sharding
+
+Tests for `sharding` module and sharded queries of `cpv2010arg`.
+"""
+
+from __future__ import unicode_literals
+import unittest
+import nose
+import pandas as pd
+
+from pyredatam import cpv2010arg
+from pyredatam.sharding import merge_arealist_results
+from pyredatam.testing import StubWebEngine, arealist_html
+
+
+class ShardingTestCase(unittest.TestCase):
+
+    def test_plan_area_shards(self):
+        shards = cpv2010arg.plan_area_shards()
+        self.assertEqual(len(shards), 24)
+        self.assertEqual(shards[0], {"PROV": ["02"]})
+
+        shards = cpv2010arg.plan_area_shards({"PROV": "94"}, "PROV", 1)
+        self.assertEqual(shards, [{"PROV": ["94"]}])
+
+        area_filter = {"DPTO": ["02001", "06007", "06014", "94007"]}
+        shards = cpv2010arg.plan_area_shards(area_filter, "PROV", 2)
+        self.assertEqual(shards, [{"DPTO": ["02001", "06007", "06014"]},
+                                  {"DPTO": ["94007"]}])
+
+        self.assertRaises(ValueError, cpv2010arg.plan_area_shards,
+                          {"PROV": "02"}, "RADIO")
+        self.assertRaises(ValueError, cpv2010arg.plan_area_shards,
+                          {"PROV": "02"}, "BARRIO")
+
+    def test_merge_arealist_results(self):
+        df1 = pd.DataFrame({"Código": ["02", "06"], "Casos": [1, 2]},
+                           columns=["Código", "Casos"])
+        df2 = pd.DataFrame({"Código": ["10"], "Casos": [4]},
+                           columns=["Código", "Casos"])
+
+        df = merge_arealist_results([df1, df2], incl_total=True)
+        self.assertEqual(list(df["Código"]), ["02", "06", "10", "Total"])
+        self.assertEqual(list(df["Casos"]), [1, 2, 4, 7])
+
+    def test_merge_compact_results(self):
+        dfs = [cpv2010arg.compact_arealist_dataframe(pd.DataFrame(
+            {"Código": codes, "Casos": [50, 60]},
+            columns=["Código", "Casos"])) for codes in [["02", "06"],
+                                                        ["10", "14"]]]
+        self.assertEqual(dfs[0]["Casos"].dtype, "int8")
+
+        df = merge_arealist_results(dfs, incl_total=True)
+        self.assertEqual(df["Código"].dtype.name, "category")
+        self.assertEqual(list(df["Código"]),
+                         ["02", "06", "10", "14", "Total"])
+        self.assertEqual(df["Casos"].dtype, "int16")
+        self.assertEqual(df["Casos"].iloc[-1], 220)
+
+        fracs = [cpv2010arg.compact_arealist_dataframe(pd.DataFrame(
+            {"Código": [code], "Casos": [5]}, columns=["Código", "Casos"]))
+            for code in ["0200101", "0600702"]]
+        df = merge_arealist_results(fracs, incl_total=True)
+        self.assertEqual(list(df["Código"]), [200101, 600702, "Total"])
+        self.assertEqual(list(df["Casos"]), [5, 5, 10])
+
+    def test_make_sharded_counter_query(self):
+        with StubWebEngine(arealist_html(2, ["DPTO.COUNTER"])) as stub:
+            df = cpv2010arg.make_sharded_counter_query(
+                "DPTO", "PERSONA", {"PROV": ["02", "06"]}, incl_total=True,
+                backend="http", url=stub.url, cache=False)
+
+        self.assertEqual(len(stub.programs), 2)
+        self.assertIn("PROV 02", stub.programs[0] + stub.programs[1])
+        self.assertTrue(all("TOTAL" not in program
+                            for program in stub.programs))
+
+        self.assertEqual(len(df), 5)
+        self.assertEqual(df["DPTO.COUNTER"].iloc[-1],
+                         2 * (0 + 37))
+
+    def test_shards_finer_than_areas(self):
+        self.assertRaises(ValueError, cpv2010arg.make_sharded_arealist_query,
+                          "PROV", "PERSONA.CONDACT", shard_level="DPTO")
+        self.assertRaises(ValueError, cpv2010arg.make_sharded_counter_query,
+                          "PROV", "PERSONA", shard_level="DPTO")
+
+
+if __name__ == '__main__':
+    nose.run(defaultTest=__name__)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_store
+
+Tests for `store` module.
+"""
+
+from __future__ import unicode_literals
+import os
+import time
+import shutil
+import tempfile
+import unittest
+import nose
+import pandas as pd
+
+from pyredatam import cpv2010arg, store
+from pyredatam.testing import StubWebEngine, arealist_html
+
+
+@unittest.skipIf(store.pyarrow is None, "pyarrow is not installed")
+class ResultStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.store_dir = tempfile.mkdtemp()
+        self.store = store.ResultStore(self.store_dir)
+        self.df = pd.DataFrame(
+            {"Código": ["02001", "02002"], "Casos": [1, 2]},
+            columns=["Código", "Casos"])
+
+    def tearDown(self):
+        shutil.rmtree(self.store_dir)
+
+    def test_put_get(self):
+        self.assertIsNone(self.store.get("casos", "PROV", "02"))
+
+        for file_format in store.FORMATS:
+            result_store = store.ResultStore(self.store_dir, file_format)
+            result_store.put("casos", "PROV", "02", self.df)
+            pd.testing.assert_frame_equal(
+                result_store.get("casos", "PROV", "02"), self.df)
+
+        self.assertEqual(self.store.partitions("casos"), [("PROV", "02")])
+        self.assertEqual(self.store.delete("casos"), 1)
+        self.assertEqual(self.store.partitions("casos"), [])
+
+    def test_refresh_only_missing_and_stale(self):
+        fetched = []
+
+        def fetch(area_code):
+            fetched.append(area_code)
+            return self.df
+
+        df = self.store.refresh("casos", "PROV", ["02", "06"], fetch)
+        self.assertEqual(sorted(fetched), ["02", "06"])
+        self.assertEqual(len(df), 4)
+
+        self.store.refresh("casos", "PROV", ["02", "06", "10"], fetch)
+        self.assertEqual(fetched[2:], ["10"])
+
+        self.store.max_age = 60
+        old = time.time() - 120
+        os.utime(self.store._path("casos", "PROV", "06"), (old, old))
+        self.assertEqual(self.store.missing("casos", "PROV", ["02", "06"]),
+                         ["06"])
+        self.store.refresh("casos", "PROV", ["02", "06"], fetch)
+        self.assertEqual(fetched[3:], ["06"])
+
+    def test_partition_of_another_query_is_stale(self):
+        for file_format in store.FORMATS:
+            result_store = store.ResultStore(self.store_dir, file_format)
+            result_store.put("casos", "PROV", "02", self.df, "abc")
+            self.assertEqual(result_store.get_key("casos", "PROV", "02"),
+                             "abc")
+            pd.testing.assert_frame_equal(
+                result_store.get("casos", "PROV", "02"), self.df)
+
+            self.assertEqual(result_store.missing(
+                "casos", "PROV", ["02"], {"02": "abc"}), [])
+            self.assertEqual(result_store.missing(
+                "casos", "PROV", ["02"], {"02": "def"}), ["02"])
+
+    def test_make_stored_arealist_query(self):
+        with StubWebEngine(arealist_html(2)) as stub:
+            df = cpv2010arg.make_stored_arealist_query(
+                self.store, "condact_frac", "FRAC", "PERSONA.CONDACT",
+                {"PROV": ["02", "06"]}, backend="http", url=stub.url,
+                cache=False)
+            self.assertEqual(len(df), 4)
+
+            df = cpv2010arg.make_stored_arealist_query(
+                self.store, "condact_frac", "FRAC", "PERSONA.CONDACT",
+                {"PROV": ["02", "06"]}, backend="http", url=stub.url,
+                cache=False)
+
+        self.assertEqual(len(stub.programs), 2)
+        self.assertEqual(len(df), 4)
+        self.assertEqual(self.store.partitions("condact_frac"),
+                         [("PROV", "02"), ("PROV", "06")])
+
+    def test_stored_query_changed(self):
+        with StubWebEngine(arealist_html(2)) as stub:
+            for variables in ["PERSONA.CONDACT", "PERSONA.CONDACT",
+                              "PERSONA.P02"]:
+                cpv2010arg.make_stored_arealist_query(
+                    self.store, "frac", "FRAC", variables,
+                    {"PROV": ["02"]}, backend="http", url=stub.url,
+                    cache=False)
+
+        self.assertEqual(len(stub.programs), 2)
+        self.assertIn("PERSONA.P02", stub.programs[1])
+
+    def test_stored_partitions_finer_than_areas(self):
+        self.assertRaises(ValueError, cpv2010arg.make_stored_arealist_query,
+                          self.store, "prov", "PROV", "PERSONA.CONDACT",
+                          shard_level="DPTO")
+
+
+if __name__ == '__main__':
+    nose.run(defaultTest=__name__)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_validation
+
+Tests for `validation` module and validated queries of `cpv2010arg`.
+"""
+
+from __future__ import unicode_literals
+import unittest
+import nose
+
+import pyredatam
+from pyredatam import cpv2010arg
+from pyredatam.validation import QueryValidationError
+from pyredatam.testing import StubWebEngine
+from . import queries
+
+
+class QueryValidatorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.validator = cpv2010arg.get_validator()
+
+    def test_valid_queries(self):
+        # AREALIST1 selects PROV 03, which doesn't exist, and PROGRAM1 asks
+        # for FRAC.NOMFRAC, but fractions have no names
+        for query in [queries.AREALIST2, queries.AREALIST3, queries.COUNTER1,
+                      queries.COUNTER2, queries.MEDIAN1, queries.MEAN1,
+                      queries.CROSS1]:
+            self.assertEqual(self.validator.errors(query), [])
+
+    def test_unknown_variables(self):
+        query = pyredatam.arealist_query("FRAC", ["PERSONA.CONDAC"])
+        self.assertEqual(self.validator.errors(query),
+                         ["PERSONA.CONDAC is not a variable of the "
+                          "dictionary"])
+
+        query = pyredatam.counter_query("BARRIO", "PERSONAS")
+        self.assertEqual(len(self.validator.errors(query)), 2)
+
+    def test_unknown_areas(self):
+        query = pyredatam.arealist_query("DPTO", "PERSONA.CONDACT",
+                                         {"PROV": ["02", "03", "2"]})
+        self.assertEqual(self.validator.errors(query),
+                         ["03 is not a code of a PROV area",
+                          "2 is not a code of a PROV area"])
+
+        query = pyredatam.arealist_query("RADIO", "PERSONA.CONDACT",
+                                         {"FRAC": ["0200101"]})
+        self.assertTrue(self.validator.is_valid(query))
+
+    def test_universe(self):
+        query = pyredatam.arealist_query(
+            "DPTO", "PERSONA.CONDACT", universe_filter="PERSONA.P03 > 14 "
+            "AND (PERSONA.CONDACT = 1 OR 9 <> PERSONA.CONDACT)")
+        self.assertEqual(self.validator.errors(query),
+                         ["9 is not a category of PERSONA.CONDACT"])
+
+        query = pyredatam.arealist_query(
+            "DPTO", "PERSONA.CONDACT", universe_filter="PERSONA.EDAD > 14")
+        self.assertRaises(QueryValidationError, self.validator.validate,
+                          query)
+
+    def test_make_query_validate(self):
+        query = pyredatam.arealist_query("DPTO", "PERSONA.CONDAC")
+
+        with StubWebEngine() as stub:
+            self.assertRaises(QueryValidationError,
+                              cpv2010arg.make_arealist_query, query,
+                              backend="http", url=stub.url, cache=False,
+                              validate=True)
+        self.assertEqual(stub.programs, [])
+
+    def test_error_page(self):
+        html = "<html><body><p>Error: variable desconocida</p></body></html>"
+        with StubWebEngine(html) as stub:
+            with self.assertRaises(cpv2010arg.ResultError) as context:
+                cpv2010arg.make_arealist_query(queries.AREALIST1, cache=False,
+                                               backend="http", url=stub.url)
+
+        self.assertIn("variable desconocida", str(context.exception))
+        self.assertRaises(cpv2010arg.ResultError,
+                          cpv2010arg.parse_crosstab_to_dataframe, html)
+
+
+if __name__ == '__main__':
+    nose.run(defaultTest=__name__)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_waits
+
+Tests for `waits` module.
+"""
+
+from __future__ import unicode_literals
+import itertools
+import unittest
+import nose
+import pyvirtualdisplay
+from selenium.common.exceptions import WebDriverException
+
+from pyredatam import cpv2010arg
+from pyredatam.waits import WaitStrategy, StageTimeoutError
+from . import queries
+
+
+class FakeElement(object):
+
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeDriver(object):
+    """Driver whose link gets its text after some checks."""
+
+    def __init__(self, checks):
+        self.checks = checks
+        self.script_timeouts = []
+
+    def set_script_timeout(self, timeout):
+        self.script_timeouts.append(timeout)
+
+    def execute_async_script(self, script, *args):
+        raise WebDriverException("page was replaced")
+
+    def find_element(self, by, value):
+        self.checks -= 1
+        if self.checks > 0:
+            return FakeElement("Procesando")
+        return FakeElement("Descargar en formato Excel")
+
+
+class WaitStrategyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.wait = WaitStrategy({"result": 0.2}, poll=0.001, max_poll=0.01,
+                                 backoff=2, seconds_per_row=0.001)
+
+    def test_intervals(self):
+        intervals = list(itertools.islice(self.wait.intervals(), 6))
+        self.assertEqual(intervals, [0.001, 0.002, 0.004, 0.008, 0.01, 0.01])
+
+    def test_until(self):
+        results = iter([None, False, "done"])
+        self.assertEqual(self.wait.until("result", lambda: next(results)),
+                         "done")
+
+    def test_ignored_exceptions(self):
+        def condition():
+            raise KeyError()
+
+        self.assertRaises(KeyError, self.wait.until, "result", condition)
+        self.assertRaises(StageTimeoutError, self.wait.until, "result",
+                          condition, ignored_exceptions=(KeyError,))
+
+    def test_timeout(self):
+        with self.assertRaises(StageTimeoutError) as context:
+            self.wait.until("result", lambda: False, expected_rows=100)
+
+        self.assertEqual(context.exception.stage, "result")
+        self.assertAlmostEqual(context.exception.timeout, 0.3)
+        self.assertEqual(self.wait.timeout("frame"), 60)
+
+    def test_until_text_falls_back_to_polling(self):
+        driver = FakeDriver(checks=3)
+        self.assertTrue(self.wait.until_text(
+            "result", driver, "a", "Descargar en formato Excel"))
+        self.assertEqual(driver.checks, 0)
+        # the script timeout of the driver is restored
+        self.assertEqual(driver.script_timeouts, [0.2, 30])
+
+    def test_browser_quits_on_timeout(self):
+        drivers = []
+
+        class FakeDisplay(object):
+
+            def __init__(self, visible=False):
+                pass
+
+            def start(self):
+                pass
+
+            def stop(self):
+                pass
+
+        def firefox():
+            drivers.append(FakeDriver(checks=1))
+            drivers[-1].quit = lambda: drivers.remove(drivers[-1])
+            return drivers[-1]
+
+        def go_to_processor(driver, url, wait=None):
+            raise StageTimeoutError("navigation", 30)
+
+        patches = [(pyvirtualdisplay, "Display", FakeDisplay),
+                   (cpv2010arg, "firefox", firefox),
+                   (cpv2010arg, "_go_to_processor", go_to_processor)]
+        originals = [(obj, attr, getattr(obj, attr))
+                     for obj, attr, _ in patches]
+        try:
+            for obj, attr, value in patches:
+                setattr(obj, attr, value)
+            self.assertRaises(StageTimeoutError, cpv2010arg.make_query,
+                              queries.AREALIST1, cache=False)
+        finally:
+            for obj, attr, value in originals:
+                setattr(obj, attr, value)
+
+        self.assertEqual(drivers, [])
+
+    def test_estimate_rows(self):
+        self.assertEqual(cpv2010arg._estimate_rows(queries.AREALIST2), 5400)
+        self.assertEqual(cpv2010arg._estimate_rows(queries.AREALIST1), 450)
+        self.assertEqual(cpv2010arg._estimate_rows(queries.COUNTER1), 2183)
+        self.assertIsNone(cpv2010arg._estimate_rows("TABLE TABLE1"))
+
+
+if __name__ == '__main__':
+    nose.run(defaultTest=__name__)
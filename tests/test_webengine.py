@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_webengine
+
+Tests for `webengine` module.
+"""
+
+from __future__ import unicode_literals
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import nose
+import pandas as pd
+
+from pyredatam import cpv2010arg
+from pyredatam.webengine import WebEngineClient, WebEngineError
+from pyredatam.testing import StubWebEngine, arealist_html, arealist_export
+from . import queries
+
+
+class WebEngineClientTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.stub = StubWebEngine(arealist_html(5),
+                                  arealist_export(5)).start()
+
+    def tearDown(self):
+        self.stub.stop()
+
+    def test_run_program(self):
+        with WebEngineClient(self.stub.url) as client:
+            self.assertEqual(client.base, "CPV2010B")
+
+            html = client.run_program(queries.AREALIST1)
+            self.assertEqual(html, self.stub.result_html)
+            self.assertEqual(self.stub.programs, [queries.AREALIST1])
+
+    def test_program_form_read_from_processor(self):
+        with StubWebEngine(program_path="/argbin/RpWebEngine.exe/Run",
+                           query_field="QUERY") as stub:
+            with WebEngineClient(stub.url) as client:
+                method, action, fields, query_field = \
+                    client.get_program_form()
+                self.assertEqual((method, query_field), ("POST", "QUERY"))
+                self.assertEqual(action,
+                                 stub.root_url + "/argbin/RpWebEngine.exe/Run")
+                self.assertIn(("BASE", "CPV2010B"), fields)
+
+                client.run_program(queries.AREALIST1)
+                client.run_program(queries.AREALIST2)
+
+        self.assertEqual(stub.programs, [queries.AREALIST1,
+                                         queries.AREALIST2])
+
+    def test_processor_not_found(self):
+        client = WebEngineClient(self.stub.root_url + "/other?BASE=CPV2010B")
+        with client:
+            self.assertRaises(WebEngineError, client.run_program,
+                              queries.AREALIST1)
+
+    def test_make_query_http_backend(self):
+        df = cpv2010arg.make_arealist_query(queries.AREALIST1, cache=False,
+                                            backend="http",
+                                            url=self.stub.url)
+        self.assertEqual(len(df), 5)
+
+    def test_export_program(self):
+        temp_dir = tempfile.mkdtemp()
+        path = os.path.join(temp_dir, "result.xls")
+
+        try:
+            with WebEngineClient(self.stub.url) as client:
+                self.assertEqual(client.export_program(queries.AREALIST1,
+                                                       path), path)
+            with io.open(path, "r", encoding="utf-8") as f:
+                self.assertEqual(f.read(), self.stub.result_export)
+        finally:
+            shutil.rmtree(temp_dir)
+
+        self.assertEqual(self.stub.programs, [queries.AREALIST1])
+
+    def test_make_query_download(self):
+        df = cpv2010arg.make_arealist_query(queries.AREALIST1, backend="http",
+                                            url=self.stub.url, download=True)
+        pd.testing.assert_frame_equal(
+            df, cpv2010arg.parse_arealist_to_dataframe(self.stub.result_html))
+
+    def test_url_without_base(self):
+        self.assertRaises(ValueError, WebEngineClient, self.stub.root_url)
+
+    def test_unknown_backend(self):
+        self.assertRaises(ValueError, cpv2010arg.make_query,
+                          queries.AREALIST1, backend="telnet")
+
+
+if __name__ == '__main__':
+    nose.run(defaultTest=__name__)